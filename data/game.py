@@ -1,5 +1,6 @@
 from __future__ import annotations
 from typing import TYPE_CHECKING
+from collections import namedtuple
 
 import pygame
 from loguru import logger
@@ -7,18 +8,22 @@ from loguru import logger
 from graphics.stack import ScreenStack
 from graphics.graphics import PygameAbstraction
 from data.options import Options
-from engine.exceptions import InvalidPGNStringException
-from engine.move import Move
+from engine.worker import INFO_MESSAGE, MOVE_REQUEST, RESULT_MESSAGE, SEARCH_REQUEST, EngineWorker, unpack_move
 
 if TYPE_CHECKING:
     from engine.simul_game import Game
 
+# What a request to the engine worker was: its kind, the text typed for it and the key of the position it was made in.
+PendingRequest = namedtuple('PendingRequest', ['kind', 'text', 'key'])
+
 class GameInstance(object):
     
     def __init__(self, simul_game:Game, options: Options):
 
         self.simul_game = simul_game
         self.options = options
+        self.engine: EngineWorker = EngineWorker(options.book_path)
+        self.pending: dict[int, PendingRequest] = {}
         self.graphics: PygameAbstraction = PygameAbstraction(*self.options.resolution, "Chess", fullscreen=options.fullscreen)
         self.screens: ScreenStack = ScreenStack()
         self.running = True
@@ -30,16 +35,44 @@ class GameInstance(object):
                 self.running = False
                 break
 
-    def play_move(self, PGN: str) -> bool:
-        try:
-            move = self.simul_game.PGN2Move(PGN)
-            assert isinstance(move, Move)
-            logger.debug(move)
-            self.simul_game.perfom_move(move)
-            return True
-        except InvalidPGNStringException as e:
-            logger.warning("Invalid PGN Exception")
-            return False
+    def play_move(self, PGN: str) -> int:
+        """
+        Hands a move in SAN to the engine worker to be checked, it is played once the answer arrives.
+        Returns the id of the request.
+        """
+
+        request = self.engine.validate(self.simul_game, PGN)
+        self.pending[request] = PendingRequest(MOVE_REQUEST, PGN, self.simul_game.key)
+        return request
+
+    def think(self, **limits) -> int:
+        """
+        Starts the engine worker searching for a move for the side to move, played once the search ends.
+        Takes the limits of `engine.search.best_move` and returns the id of the request.
+        """
+
+        request = self.engine.search(self.simul_game, **limits)
+        self.pending[request] = PendingRequest(SEARCH_REQUEST, '', self.simul_game.key)
+        return request
+
+    def poll_engine(self):
+        """
+        Collects what the engine worker sent since the last frame, plays the moves it answered with
+        and passes every message on to the top screen. A move found for a position the game has since left is not played.
+        """
+
+        for message in self.engine.poll():
+            request = self.pending[message.id]
+            if message.kind != INFO_MESSAGE:
+                del self.pending[message.id]
+            played = None
+            if message.kind == RESULT_MESSAGE and request.key == self.simul_game.key:
+                code = message.payload if request.kind == MOVE_REQUEST else message.payload.move
+                if code:
+                    played = unpack_move(self.simul_game, code)
+                    logger.debug(played)
+                    self.simul_game.perfom_move(played)
+            self.screens.get_top().handle_engine(request, message, played, self)
 
     def main_loop(self):
 
@@ -52,5 +85,8 @@ class GameInstance(object):
             
             self.events_handler()
             self.screens.get_top().handle_events(self.events, self)
+            self.poll_engine()
 
             self.graphics.render_everything(self, self.screens)
+
+        self.engine.close()
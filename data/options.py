@@ -11,3 +11,5 @@ class Options(object):
     def __init__(self, **kwargs) -> None:
         self.resolution: tuple[int, int] = kwargs.get("resolution", STARTING_RESOLUTION)
         self.fullscreen: bool = kwargs.get("fullscreen", True)
+        self.engine_movetime: float = kwargs.get("engine_movetime", 2.0)
+        self.book_path: str | None = kwargs.get("book_path", None)
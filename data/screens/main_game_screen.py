@@ -6,13 +6,17 @@ import pygame
 
 if TYPE_CHECKING:
     from graphics.graphics import PygameAbstraction
-    from data.game import GameInstance
+    from data.game import GameInstance, PendingRequest
     from data.options import Options
+    from engine.move import Move
+    from engine.worker import EngineMessage
 
 from graphics.screen import Screen
 from data.components.main_game_comps import BoardComponent, TerminalComponent
 from data.constants import BLACK
 from graphics.constants import CODE_FORMATTING
+from engine.search import STOP_BOOK
+from engine.worker import ERROR_MESSAGE, INFO_MESSAGE, MOVE_REQUEST
 from misc.lib import Rectangle
 
 class MainGameScreen(Screen):
@@ -49,20 +53,41 @@ class MainGameScreen(Screen):
                 if event.key == pygame.K_SLASH:
                     logger.debug(game_inst.simul_game.side)
                 if event.key == pygame.K_RETURN:
-                    temp = game_inst.play_move(self.terminal_comp.command)
-                    logger.debug(temp)
-                    if not temp:
-                        self.terminal_comp.raw_text += "Invalid move\n"
-                    else:
-                        self.terminal_comp.raw_text += f"{CODE_FORMATTING['GREEN']}{self.terminal_comp.command}{CODE_FORMATTING['COLOR_RESET']}\n"
+                    # "go" asks the engine for a move, optionally followed by the seconds it may take, and "stop" cuts its search short.
+                    # Anything else is a move for the engine worker to check, the answer comes back through `handle_engine`.
+                    words = self.terminal_comp.command.split()
+                    if words and words[0] == 'go':
+                        game_inst.think(movetime=float(words[1]) if len(words) > 1 and words[1].replace('.', '', 1).isdigit() else self.options.engine_movetime)
+                        self.terminal_comp.raw_text += f"{CODE_FORMATTING['CYAN']}Thinking...{CODE_FORMATTING['COLOR_RESET']}\n"
+                        self.terminal_comp.text.update_text(self.terminal_comp.raw_text)
+                    elif words == ['stop']:
+                        game_inst.engine.cancel()
+                    elif words:
+                        game_inst.play_move(self.terminal_comp.command)
                     self.terminal_comp.command = ''
-                    self.terminal_comp.text.update_text(self.terminal_comp.raw_text)
                     self.terminal_comp.command_text.update_text(self.terminal_comp.command)
                 if event.key == pygame.K_BACKSPACE:
                     self.terminal_comp.command = self.terminal_comp.command[:-1]
                     self.terminal_comp.command_text.update_text(self.terminal_comp.command)
 
 
+    def handle_engine(self, request: PendingRequest, message: EngineMessage, played: Move | None, game_inst: GameInstance):
+        if message.kind == INFO_MESSAGE:
+            info = message.payload
+            self.terminal_comp.raw_text += f"depth {info.depth} score {info.score} nodes {info.nodes} {' '.join(info.pv)}\n"
+        elif message.kind == ERROR_MESSAGE:
+            logger.warning(message.payload)
+            self.terminal_comp.raw_text += "Invalid move\n" if request.kind == MOVE_REQUEST else f"{CODE_FORMATTING['RED']}{message.payload}{CODE_FORMATTING['COLOR_RESET']}\n"
+        elif played is None:
+            self.terminal_comp.raw_text += "Position changed, engine answer dropped\n" if request.key != game_inst.simul_game.key else "No move to play\n"
+        elif request.kind == MOVE_REQUEST:
+            self.terminal_comp.raw_text += f"{CODE_FORMATTING['GREEN']}{request.text}{CODE_FORMATTING['COLOR_RESET']}\n"
+        else:
+            result = message.payload
+            source = "book" if result.reason == STOP_BOOK else f"depth {result.depth}, {result.nodes} nodes in {result.seconds:.2f}s"
+            self.terminal_comp.raw_text += f"{CODE_FORMATTING['GREEN']}{played.uci()}{CODE_FORMATTING['COLOR_RESET']} ({source})\n"
+        self.terminal_comp.text.update_text(self.terminal_comp.raw_text)
+
     def render(self, game_inst: GameInstance):
         for comp in self.components:
             comp.render(self, game_inst)
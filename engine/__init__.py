@@ -1,7 +1,12 @@
+from .bitboard import *
 from .board import *
 from .consts import *
 from .exceptions import *
 from .simul_game import *
+from .zobrist import *
 from .move_gen import *
 from .move import *
-from .piece import *
\ No newline at end of file
+from .piece import *
+from .eval import *
+from .search import *
+from .transposition import *
\ No newline at end of file
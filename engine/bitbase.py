@@ -0,0 +1,308 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+import argparse
+import mmap
+import multiprocessing
+import os
+import sys
+import time
+
+from loguru import logger
+
+if TYPE_CHECKING:
+    from engine.simul_game import Game
+
+from engine.bitboard import PAWN_SLOT, QUEEN_SLOT, ROOK_SLOT, SQUARE_MASKS, KING_SLOT, iter_bits, lsb
+from engine.consts import BITBASE_DRAW, BITBASE_LOSS, BITBASE_PIECES, BITBASE_WIN, PieceSide
+from engine.piece import king_step, pawn_captures, queen, rook
+
+# Win/draw bitbases for a king and one piece against a bare king. A position is indexed by the side to move (the strong side,
+# the one with the piece, or the weak side), the strong king, the weak king and the piece, squares counted from a1 as everywhere
+# else. The strong side plays up the board, positions where it is dark are looked up with their ranks mirrored.
+# A set bit means the strong side wins: with the strong side to move it has a winning move, with the weak side to move it is lost.
+STRONG: int = 0
+WEAK: int = 1
+POSITIONS: int = 2 * 64 * 64 * 64
+
+# The piece of every signature, by slot offset. KPK is built from KQK and KRK, where its pawn promotes.
+SIGNATURES: dict[str, int] = {'KRK': ROOK_SLOT, 'KQK': QUEEN_SLOT, 'KPK': PAWN_SLOT}
+PROMOTIONS: tuple[str, ...] = ('KQK', 'KRK')
+
+DEFAULT_DIRECTORY: str = 'assets/bitbases'
+DEFAULT_WORKERS: int = os.cpu_count() or 1
+# Positions resolved in one round of the backward pass are handed to the pool in index ranges of at most this many.
+ROUND_CHUNK: int = 8192
+
+
+def position_index(turn: int, strong_king: int, weak_king: int, piece: int) -> int:
+    """Index of a position in a bitbase, `turn` being `STRONG` or `WEAK`."""
+    return turn << 18 | strong_king << 12 | weak_king << 6 | piece
+
+def piece_attacks(kind: int, square: int, occupied: int) -> int:
+    """Squares the strong piece attacks from a square, the pawn capturing up the board."""
+    if kind == PAWN_SLOT:
+        return pawn_captures[PieceSide.LIGHT].targets[square]
+    return (queen if kind == QUEEN_SLOT else rook).attacks(square, occupied)
+
+def is_valid(kind: int, turn: int, strong_king: int, weak_king: int, piece: int) -> bool:
+    """Returns `True` for a position that can occur: three distinct squares, kings apart, no pawn on the back ranks and no weak king left in check."""
+    if strong_king == weak_king or piece == strong_king or piece == weak_king or king_step.targets[strong_king] & SQUARE_MASKS[weak_king]:
+        return False
+    if kind == PAWN_SLOT and not 8 <= piece < 56:
+        return False
+    return turn == WEAK or not piece_attacks(kind, piece, SQUARE_MASKS[strong_king] | SQUARE_MASKS[weak_king]) & SQUARE_MASKS[weak_king]
+
+def weak_moves(kind: int, strong_king: int, weak_king: int, piece: int) -> tuple[int, bool, bool]:
+    """
+    Looks at the moves of the weak king: returns how many do not take the piece, whether it can take it (a draw) and whether it is in check.
+    """
+
+    occupied = SQUARE_MASKS[strong_king] | SQUARE_MASKS[piece]
+    attacked = king_step.targets[strong_king] | piece_attacks(kind, piece, occupied)
+    targets = king_step.targets[weak_king] & ~attacked & ~SQUARE_MASKS[strong_king]
+    captures = bool(targets & SQUARE_MASKS[piece])
+    in_check = bool(piece_attacks(kind, piece, occupied | SQUARE_MASKS[weak_king]) & SQUARE_MASKS[weak_king])
+    return (targets & ~SQUARE_MASKS[piece]).bit_count(), captures, in_check
+
+def setup_chunk(task: tuple[int, list[int]]) -> tuple[list[int], bytes, bytes, list[int]]:
+    """
+    Runs in a worker process: classifies every position whose strong king stands on one of the given squares.
+    Returns the squares, then for each of them, both sides to move in turn, a validity byte and a move count per position,
+    and the indices of the positions where the weak side is mated. A weak king that can take the piece gets one move
+    more than it has quiet moves, so that its count never runs out.
+    """
+
+    kind, squares = task
+    valid = bytearray(2 * 64 * 64 * len(squares))
+    counts = bytearray(2 * 64 * 64 * len(squares))
+    mates: list[int] = []
+    offset = 0
+    for strong_king in squares:
+        for turn in (STRONG, WEAK):
+            for weak_king in range(64):
+                for piece in range(64):
+                    if is_valid(kind, turn, strong_king, weak_king, piece):
+                        valid[offset] = 1
+                        if turn == WEAK:
+                            count, captures, in_check = weak_moves(kind, strong_king, weak_king, piece)
+                            counts[offset] = count + captures
+                            if not count and not captures and in_check:
+                                mates.append(position_index(WEAK, strong_king, weak_king, piece))
+                    offset += 1
+    return squares, bytes(valid), bytes(counts), mates
+
+def strong_predecessors(kind: int, strong_king: int, weak_king: int, piece: int) -> list[int]:
+    """Positions with the strong side to move from which one of its moves reaches the given position."""
+    occupied = SQUARE_MASKS[strong_king] | SQUARE_MASKS[weak_king] | SQUARE_MASKS[piece]
+    positions = [position_index(STRONG, origin, weak_king, piece) for origin in iter_bits(king_step.targets[strong_king] & ~occupied)]
+    if kind == PAWN_SLOT:
+        origin = piece - 8
+        if origin >= 8 and not occupied & SQUARE_MASKS[origin]:
+            positions.append(position_index(STRONG, strong_king, weak_king, origin))
+            if 24 <= piece < 32 and not occupied & SQUARE_MASKS[origin - 8]:
+                positions.append(position_index(STRONG, strong_king, weak_king, origin - 8))
+    else:
+        for origin in iter_bits(piece_attacks(kind, piece, occupied) & ~occupied):
+            positions.append(position_index(STRONG, strong_king, weak_king, origin))
+    return positions
+
+def weak_predecessors(strong_king: int, weak_king: int, piece: int) -> list[int]:
+    """Positions with the weak side to move from which a move of its king reaches the given position."""
+    occupied = SQUARE_MASKS[strong_king] | SQUARE_MASKS[piece]
+    return [position_index(WEAK, strong_king, origin, piece) for origin in iter_bits(king_step.targets[weak_king] & ~occupied)]
+
+def split_index(index: int) -> tuple[int, int, int, int]:
+    """The side to move, strong king, weak king and piece of a position index."""
+    return index >> 18, index >> 12 & 63, index >> 6 & 63, index & 63
+
+def strong_chunk(task: tuple[int, list[int]]) -> list[int]:
+    """Runs in a worker process: the strong positions that can reach any of the given lost weak positions, repeats included."""
+    kind, indices = task
+    positions: list[int] = []
+    for index in indices:
+        _, strong_king, weak_king, piece = split_index(index)
+        positions.extend(strong_predecessors(kind, strong_king, weak_king, piece))
+    return positions
+
+def weak_chunk(indices: list[int]) -> list[int]:
+    """Runs in a worker process: the weak positions that can reach any of the given won strong positions, once per move that does."""
+    positions: list[int] = []
+    for index in indices:
+        _, strong_king, weak_king, piece = split_index(index)
+        positions.extend(weak_predecessors(strong_king, weak_king, piece))
+    return positions
+
+def index_ranges(indices: list[int]) -> list[list[int]]:
+    """Sorts position indices and cuts them into consecutive ranges of at most `ROUND_CHUNK`, one task each."""
+    indices.sort()
+    return [indices[start:start + ROUND_CHUNK] for start in range(0, len(indices), ROUND_CHUNK)]
+
+def generate(name: str, pool: multiprocessing.pool.Pool, promotions: dict[str, bytes] | None = None) -> bytes:
+    """
+    Builds a bitbase by retrograde analysis and returns it packed, one bit per position.
+    Positions are classified in parallel over the pool, the wins then spread backwards from the mates one move at a time:
+    a strong position that can reach a lost weak position wins, a weak position is lost once every move it has reaches a win.
+    The backward pass runs in rounds until one resolves nothing new. Each round, the pool finds the predecessors of the positions
+    the last round resolved, split into index ranges, and this process merges them into the table.
+
+    Parameters:
+    - `name`: One of `SIGNATURES`.
+    - `pool`: Worker processes that classify the positions and look for predecessors.
+    - `promotions`: For KPK, the packed KQK and KRK bitbases the pawn promotes into.
+    """
+
+    kind = SIGNATURES[name]
+    valid = bytearray(POSITIONS)
+    counts = bytearray(POSITIONS)
+    lost: list[int] = []
+    for squares, chunk_valid, chunk_counts, mates in pool.map(setup_chunk, [(kind, [square]) for square in range(64)]):
+        offset = 0
+        for strong_king in squares:
+            for turn in (STRONG, WEAK):
+                start = position_index(turn, strong_king, 0, 0)
+                valid[start:start + 4096] = chunk_valid[offset:offset + 4096]
+                counts[start:start + 4096] = chunk_counts[offset:offset + 4096]
+                offset += 4096
+        lost.extend(mates)
+
+    wins = bytearray(POSITIONS)
+    for index in lost:
+        wins[index] = 1
+    won: list[int] = []
+
+    if kind == PAWN_SLOT:
+        # A pawn on the seventh rank wins at once when promoting leaves a lost KQK or KRK position.
+        for strong_king in range(64):
+            for weak_king in range(64):
+                for piece in range(48, 56):
+                    index = position_index(STRONG, strong_king, weak_king, piece)
+                    promotion = piece + 8
+                    if valid[index] and promotion != strong_king and promotion != weak_king:
+                        reached = position_index(WEAK, strong_king, weak_king, promotion)
+                        if any(packed[reached >> 3] >> (reached & 7) & 1 for packed in promotions.values()):
+                            wins[index] = 1
+                            won.append(index)
+
+    while lost or won:
+        for positions in pool.map(strong_chunk, [(kind, indices) for indices in index_ranges(lost)]):
+            for previous in positions:
+                if valid[previous] and not wins[previous]:
+                    wins[previous] = 1
+                    won.append(previous)
+        lost = []
+        # Every new win takes one move off each weak position that can reach it, the ones left without a move are lost.
+        for positions in pool.map(weak_chunk, index_ranges(won)):
+            for previous in positions:
+                if valid[previous] and not wins[previous]:
+                    counts[previous] -= 1
+                    if not counts[previous]:
+                        wins[previous] = 1
+                        lost.append(previous)
+        won = []
+
+    packed = bytearray(POSITIONS // 8)
+    for index in range(POSITIONS):
+        if wins[index]:
+            packed[index >> 3] |= 1 << (index & 7)
+    return bytes(packed)
+
+def generate_all(directory: str = DEFAULT_DIRECTORY, workers: int = DEFAULT_WORKERS) -> None:
+    """Builds every bitbase into `directory`, KQK and KRK first since KPK promotes into them."""
+    os.makedirs(directory, exist_ok=True)
+    built: dict[str, bytes] = {}
+    with multiprocessing.get_context().Pool(workers) as pool:
+        for name in SIGNATURES:
+            start = time.perf_counter()
+            built[name] = generate(name, pool, {promotion: built[promotion] for promotion in PROMOTIONS if promotion in built})
+            with open(bitbase_path(directory, name), 'wb') as file:
+                file.write(built[name])
+            wins = sum(byte.bit_count() for byte in built[name])
+            logger.info(f"{name}: {wins} won positions in {time.perf_counter() - start:.1f}s")
+
+def bitbase_path(directory: str, name: str) -> str:
+    """File a bitbase is stored in."""
+    return os.path.join(directory, name.lower() + '.bin')
+
+
+class Bitbases(object):
+    """
+    The bitbases found in a directory, memory-mapped and probed by position. Missing ones are skipped,
+    so that an engine without generated bitbases simply never gets an answer.
+    """
+
+    def __init__(self, directory: str = DEFAULT_DIRECTORY):
+        self.files: list = []
+        # Packed bits by the slot offset of the strong piece.
+        self.maps: dict[int, mmap.mmap] = {}
+        for name, kind in SIGNATURES.items():
+            path = bitbase_path(directory, name)
+            if os.path.exists(path) and os.path.getsize(path) == POSITIONS // 8:
+                file = open(path, 'rb')
+                self.files.append(file)
+                self.maps[kind] = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __enter__(self) -> Bitbases:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __bool__(self) -> bool:
+        return bool(self.maps)
+
+    def close(self) -> None:
+        """Unmaps every bitbase."""
+        for bits in self.maps.values():
+            bits.close()
+        for file in self.files:
+            file.close()
+        self.maps = {}
+        self.files = []
+
+    def probe(self, game: Game) -> int | None:
+        """
+        Returns `BITBASE_WIN`, `BITBASE_DRAW` or `BITBASE_LOSS` for the side to move of a game,
+        `None` when its material is not that of a loaded bitbase.
+        """
+
+        board = game.board
+        if not self.maps or board.occupied.bit_count() != BITBASE_PIECES:
+            return None
+        bitboards = board.bitboards
+        for strong in (PieceSide.LIGHT, PieceSide.DARK):
+            base = strong.value * 6
+            for kind, bits in self.maps.items():
+                if bitboards[base + kind]:
+                    weak = strong.other()
+                    # The strong side plays up the board in the bitbase, a dark one is looked at in the mirror.
+                    flip = 0 if strong == PieceSide.LIGHT else 56
+                    strong_king = lsb(bitboards[base + KING_SLOT]) ^ flip
+                    weak_king = lsb(bitboards[weak.value * 6 + KING_SLOT]) ^ flip
+                    piece = lsb(bitboards[base + kind]) ^ flip
+                    turn = STRONG if game.side == strong else WEAK
+                    index = position_index(turn, strong_king, weak_king, piece)
+                    if not bits[index >> 3] >> (index & 7) & 1:
+                        return BITBASE_DRAW
+                    return BITBASE_WIN if turn == STRONG else BITBASE_LOSS
+        return None
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Generate or probe the KPK, KRK and KQK bitbases.")
+    parser.add_argument('--directory', default=DEFAULT_DIRECTORY, help=f"where the bitbases are stored (default {DEFAULT_DIRECTORY})")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help=f"worker processes for generation (default {DEFAULT_WORKERS}, the number of cores)")
+    parser.add_argument('--probe', metavar='FEN', help="probe a position instead of generating")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level='INFO', format="{message}")
+
+    if args.probe:
+        from engine.simul_game import Game
+        with Bitbases(args.directory) as bitbases:
+            result = bitbases.probe(Game.fromFEN(args.probe))
+        print({BITBASE_WIN: 'win', BITBASE_DRAW: 'draw', BITBASE_LOSS: 'loss', None: 'not in the bitbases'}[result])
+        sys.exit(0)
+
+    generate_all(args.directory, args.workers)
@@ -0,0 +1,65 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Generator
+    from engine.piece import Piece
+
+from engine.consts import PieceSide
+
+# Squares are indexed file first from a1 (0) to h8 (63), the same order `Board.pieces` is laid out in.
+# The engine passes squares around as these integers, names are only for FEN, PGN and the UI.
+Square = int
+FILES: str = 'abcdefgh'
+RANKS: str = '12345678'
+SQUARE_NAMES: list[str] = [file + rank for rank in RANKS for file in FILES]
+SQUARE_INDICES: dict[str, Square] = {name: index for index, name in enumerate(SQUARE_NAMES)}
+SQUARE_MASKS: list[int] = [1 << index for index in range(64)]
+# Squares laid out 16 to a rank, so that stepping off the board in any direction sets one of the 0x88 bits.
+SQUARES_0x88: list[int] = [index + (index & ~7) for index in range(64)]
+OFF_BOARD_0x88: int = 0x88
+
+EMPTY_BB: int = 0
+FULL_BB: int = (1 << 64) - 1
+
+# Order of the piece bitboards of one side, a side's bitboards start at `PieceSide.value * 6`.
+PIECE_LETTERS: str = 'pnbrqk'
+PAWN_SLOT, KNIGHT_SLOT, BISHOP_SLOT, ROOK_SLOT, QUEEN_SLOT, KING_SLOT = range(6)
+PIECE_SLOTS: dict[tuple[str, PieceSide], int] = {
+    (letter, side): side.value * 6 + offset for side in (PieceSide.DARK, PieceSide.LIGHT) for offset, letter in enumerate(PIECE_LETTERS)
+}
+
+
+def square_file(index: Square) -> int:
+    """File of a square, 0 for the a-file."""
+    return index & 7
+
+def square_rank(index: Square) -> int:
+    """Rank of a square, 0 for the first rank."""
+    return index >> 3
+
+def offset_square(index: Square, d_file: int, d_rank: int) -> Square:
+    """Returns the square reached by moving `d_file` files and `d_rank` ranks from a square, -1 if it is off the board."""
+    target = SQUARES_0x88[index] + d_file + 16 * d_rank
+    if target & OFF_BOARD_0x88 or target < 0:
+        return -1
+    return (target + (target & 7)) >> 1
+
+def piece_slot(piece: Piece) -> int:
+    """Returns the index of the bitboard holding the given piece, -1 for an empty square."""
+    return piece.slot
+
+def lsb(bb: int) -> int:
+    """Index of the least significant set bit of a non empty bitboard."""
+    return (bb & -bb).bit_length() - 1
+
+def msb(bb: int) -> int:
+    """Index of the most significant set bit of a non empty bitboard."""
+    return bb.bit_length() - 1
+
+def iter_bits(bb: int) -> Generator[int, None, None]:
+    """Yields the index of every set bit of a bitboard from a1 to h8."""
+    while bb:
+        low = bb & -bb
+        yield low.bit_length() - 1
+        bb ^= low
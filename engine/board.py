@@ -1,33 +1,76 @@
 from __future__ import annotations
 from typing import TYPE_CHECKING
-import re
 
 if TYPE_CHECKING:
     pass
 
+from engine.bitboard import SQUARE_INDICES, SQUARE_MASKS
 from engine.exceptions import InvalidSquareException
-from engine.piece import Piece
-from misc.utils import is_valid_square
+from engine.piece import EMPTY_PIECE, Piece
 
 class Board(object):
+    """
+    Bitboard backed board. Every piece kind has its own 64-bit set, with one occupancy set per side and one for the whole board.
+    `pieces` mirrors the bitboards square by square so that the piece standing on a square can be read without scanning.
+    """
 
     def __init__(self, pieces: list[Piece]):
-        self.pieces: list[Piece] = pieces
+        self.pieces: list[Piece] = list(pieces)
+        self.bitboards: list[int] = [0] * 12
+        self.occupancy: list[int] = [0, 0]
+        self.occupied: int = 0
+        for index, piece in enumerate(self.pieces):
+            slot = piece.slot
+            if slot >= 0:
+                mask = SQUARE_MASKS[index]
+                self.bitboards[slot] |= mask
+                self.occupancy[piece.side.value] |= mask
+                self.occupied |= mask
 
-    def __getitem__(self, key) -> Piece:
-        if not is_valid_square(key):
-            raise InvalidSquareException(f"{key} is not a valid square!")
-        index = (ord(key[0]) - ord('a')) + (int(key[1])-1) * 8
-        return self.pieces[index]
+    @staticmethod
+    def index_of(key: int | str) -> int:
+        """Returns the index of a square given either as an index or in algebraic notation."""
+        if type(key) is int:
+            if 0 <= key < 64:
+                return key
+        else:
+            index = SQUARE_INDICES.get(key)
+            if index is not None:
+                return index
+        raise InvalidSquareException(f"{key} is not a valid square!")
+
+    def __getitem__(self, key: int | str) -> Piece:
+        return self.pieces[self.index_of(key)]
 
-    def __setitem__(self, key, obj) -> None:
-        if not is_valid_square(key):
-            raise InvalidSquareException()
+    def __setitem__(self, key: int | str, obj: Piece) -> None:
         if type(obj) != Piece:
             raise ValueError("Not a Piece object")
-        index = (ord(key[0]) - ord('a')) + (int(key[1]) - 1) * 8
-        self.pieces[index] = obj
+        index = self.index_of(key)
+        self.remove_piece(index)
+        self.put_piece(index, obj)
+
+    def put_piece(self, index: int, piece: Piece) -> None:
+        """Places a piece on an empty square."""
+        self.pieces[index] = piece
+        slot = piece.slot
+        if slot >= 0:
+            mask = SQUARE_MASKS[index]
+            self.bitboards[slot] |= mask
+            self.occupancy[piece.side.value] |= mask
+            self.occupied |= mask
+
+    def remove_piece(self, index: int) -> Piece:
+        """Clears a square and returns whatever stood on it."""
+        piece = self.pieces[index]
+        slot = piece.slot
+        if slot >= 0:
+            mask = ~SQUARE_MASKS[index]
+            self.bitboards[slot] &= mask
+            self.occupancy[piece.side.value] &= mask
+            self.occupied &= mask
+            self.pieces[index] = EMPTY_PIECE
+        return piece
 
     @staticmethod
     def empty() -> Board:
-        return Board([Piece.empty()]*64)
\ No newline at end of file
+        return Board([EMPTY_PIECE]*64)
@@ -33,4 +33,11 @@ class MoveKind(Enum):
     VECTOR=1
     JUMP=2
     COMPLEX=3
-    SPECIAL=4
\ No newline at end of file
+    SPECIAL=4
+
+# Bitbase results for the side to move, kept here so that the search can use them without importing `engine.bitbase`.
+BITBASE_WIN: int = 1
+BITBASE_DRAW: int = 0
+BITBASE_LOSS: int = -1
+# Pieces on the board, kings included, of every position the bitbases cover.
+BITBASE_PIECES: int = 3
\ No newline at end of file
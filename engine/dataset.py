@@ -0,0 +1,172 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+from collections import namedtuple
+import argparse
+import os
+import re
+import sys
+import time
+
+import numpy as np
+from loguru import logger
+
+if TYPE_CHECKING:
+    from typing import Generator, Iterable
+
+from engine.bitboard import PIECE_LETTERS
+from engine.exceptions import InvalidFENStringException
+from engine.simul_game import FEN_PATTERN
+
+# Positions are encoded in chunks of at most this many, which bounds the memory used however long the input is.
+CHUNK_SIZE: int = 65536
+PLANES: int = 12
+# Piece letters by plane, planes following piece slots: the dark pieces first, in `PIECE_LETTERS` order, then the light ones.
+PLANE_LETTERS: str = PIECE_LETTERS + PIECE_LETTERS.upper()
+# Square code of every byte of a FEN board: its plane, `PLANES` for an empty square, 255 for anything that is not a square.
+SQUARE_CODES: np.ndarray = np.full(256, 255, dtype=np.uint8)
+SQUARE_CODES[np.frombuffer(PLANE_LETTERS.encode(), dtype=np.uint8)] = np.arange(PLANES)
+SQUARE_CODES[ord('.')] = PLANES
+# Letter of every square code, the way back.
+CODE_LETTERS: np.ndarray = np.frombuffer((PLANE_LETTERS + '.').encode(), dtype=np.uint8)
+# Digits of a FEN rank spelled out as that many empty squares.
+EXPAND_EMPTY: dict[int, str] = {ord(str(count)): '.' * count for count in range(1, 9)}
+EMPTY_RUN: re.Pattern[str] = re.compile(r'\.+')
+# Columns of `features`: the side to move, the four castling rights in `KQkq` order and the file of the en-passant square, one-hot.
+FEATURES: int = 1 + 4 + 8
+
+# A chunk of positions. Square `index` of position `n` (a1 = 0, h8 = 63) is `planes[n, :, index >> 3, index & 7]`, so the rows
+# of a plane are ranks from the first. `side` is 1 when the light side moves, `en_passant` the en-passant square or -1.
+PositionBatch = namedtuple('PositionBatch', ['planes', 'side', 'castling', 'en_passant', 'half_moves', 'num_moves'])
+
+
+def parse_board(FEN: str) -> str:
+    """Spells out the board of a FEN as 64 characters from a1 to h8, `.` for an empty square."""
+    ranks = FEN.split(None, 1)[0].split('/')
+    board = ''.join(rank.translate(EXPAND_EMPTY) for rank in reversed(ranks))
+    if len(ranks) != 8 or any(len(rank.translate(EXPAND_EMPTY)) != 8 for rank in ranks):
+        raise InvalidFENStringException()
+    return board
+
+def encode_chunk(FENs: list[str]) -> PositionBatch:
+    """
+    Encodes a list of FENs at once. Each FEN is checked and split with string operations only,
+    the boards of the whole chunk are then turned into planes by NumPy in one go.
+    A FEN without its two move counters is taken to have `0 1`.
+    """
+
+    count = len(FENs)
+    boards: list[str] = []
+    side = np.zeros(count, dtype=np.uint8)
+    castling = np.zeros((count, 4), dtype=np.uint8)
+    en_passant = np.full(count, -1, dtype=np.int8)
+    half_moves = np.zeros(count, dtype=np.int32)
+    num_moves = np.ones(count, dtype=np.int32)
+    for index, FEN in enumerate(FENs):
+        FEN = FEN.strip()
+        parts = FEN.split()
+        if len(parts) == 4:
+            FEN += ' 0 1'
+            parts += ['0', '1']
+        if FEN_PATTERN.match(FEN) is None:
+            raise InvalidFENStringException(FEN)
+        boards.append(parse_board(FEN))
+        side[index] = parts[1] == 'w'
+        castling[index] = [right in parts[2] for right in 'KQkq']
+        if parts[3] != '-':
+            en_passant[index] = ord(parts[3][0]) - ord('a') + (int(parts[3][1]) - 1) * 8
+        half_moves[index] = int(parts[4])
+        num_moves[index] = int(parts[5])
+
+    codes = SQUARE_CODES[np.frombuffer(''.join(boards).encode(), dtype=np.uint8)].reshape(count, 64)
+    if (codes == 255).any():
+        raise InvalidFENStringException()
+    planes = (codes[:, None, :] == np.arange(PLANES, dtype=np.uint8)[None, :, None]).astype(np.uint8).reshape(count, PLANES, 8, 8)
+    return PositionBatch(planes, side, castling, en_passant, half_moves, num_moves)
+
+def encode_FENs(FENs: Iterable[str], chunk_size: int = CHUNK_SIZE) -> Generator[PositionBatch, None, None]:
+    """
+    Encodes any number of FENs, yielding a `PositionBatch` for every `chunk_size` of them so that only one chunk is ever held in memory.
+    Blank lines are skipped, which lets an open file of one FEN per line be passed as is.
+    """
+
+    chunk: list[str] = []
+    for FEN in FENs:
+        if FEN.strip():
+            chunk.append(FEN)
+            if len(chunk) == chunk_size:
+                yield encode_chunk(chunk)
+                chunk = []
+    if chunk:
+        yield encode_chunk(chunk)
+
+def encode_file(path: str, chunk_size: int = CHUNK_SIZE) -> Generator[PositionBatch, None, None]:
+    """Encodes a file of one FEN per line in chunks, see `encode_FENs`."""
+    with open(path, encoding='utf-8') as file:
+        yield from encode_FENs(file, chunk_size)
+
+def features(batch: PositionBatch) -> np.ndarray:
+    """The side to move, castling rights and en-passant file of a batch as a `(N, FEATURES)` array of floats, ready to sit beside the planes."""
+    count = len(batch.side)
+    columns = np.zeros((count, FEATURES), dtype=np.float32)
+    columns[:, 0] = batch.side
+    columns[:, 1:5] = batch.castling
+    has_en_passant = batch.en_passant >= 0
+    columns[np.flatnonzero(has_en_passant), 5 + (batch.en_passant[has_en_passant] & 7)] = 1
+    return columns
+
+def decode_batch(batch: PositionBatch) -> list[str]:
+    """
+    Turns a `PositionBatch` back into FENs, the reverse of `encode_chunk`.
+    Raises `ValueError` when a square holds more than one piece.
+    """
+
+    count = len(batch.side)
+    planes = np.asarray(batch.planes, dtype=np.uint8).reshape(count, PLANES, 64)
+    if (planes.sum(axis=1) > 1).any():
+        raise ValueError('A square holds more than one piece.')
+    codes = np.where(planes.any(axis=1), planes.argmax(axis=1), PLANES)
+    # Ranks from the eighth down, as FEN lists them.
+    letters = CODE_LETTERS[codes].reshape(count, 8, 8)[:, ::-1].tobytes().decode()
+
+    FENs: list[str] = []
+    for index in range(count):
+        board = letters[index * 64:(index + 1) * 64]
+        placement = '/'.join(EMPTY_RUN.sub(lambda run: str(len(run.group())), board[rank:rank + 8]) for rank in range(0, 64, 8))
+        castling = ''.join(right for right, allowed in zip('KQkq', batch.castling[index]) if allowed) or '-'
+        square = int(batch.en_passant[index])
+        en_passant = '-' if square < 0 else 'abcdefgh'[square & 7] + str((square >> 3) + 1)
+        FENs.append(f"{placement} {'w' if batch.side[index] else 'b'} {castling} {en_passant} {batch.half_moves[index]} {batch.num_moves[index]}")
+    return FENs
+
+def save_batch(path: str, batch: PositionBatch) -> None:
+    """Writes a batch to a compressed `.npz` file, one array per field."""
+    np.savez_compressed(path, **batch._asdict())
+
+def load_batch(path: str) -> PositionBatch:
+    """Reads a batch written by `save_batch`."""
+    with np.load(path) as arrays:
+        return PositionBatch(*(arrays[field] for field in PositionBatch._fields))
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Encode a file of one FEN per line into chunks of piece planes and position features.")
+    parser.add_argument('path', help="file of FENs, one per line")
+    parser.add_argument('--out', help="directory to write a chunk_NNNNN.npz file per chunk to (default only time the encoding)")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help=f"positions per chunk (default {CHUNK_SIZE})")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level='INFO', format="{message}")
+
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+    start = time.perf_counter()
+    positions = 0
+    for number, batch in enumerate(encode_file(args.path, args.chunk_size)):
+        positions += len(batch.side)
+        if args.out:
+            save_batch(os.path.join(args.out, f'chunk_{number:05}.npz'), batch)
+        logger.info(f"chunk {number}: {positions} positions")
+    seconds = time.perf_counter() - start
+    print(f"{positions} positions in {seconds:.2f}s ({positions / seconds if seconds > 0 else 0:.0f} positions/s)")
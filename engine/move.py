@@ -1,28 +1,162 @@
 from __future__ import annotations
 from typing import TYPE_CHECKING, Callable
+from array import array
 
 
 if TYPE_CHECKING:
     from engine.simul_game import Game
+    from engine.board import Board
     from engine.piece import Piece
 
+from engine.bitboard import SQUARE_NAMES, Square
 from engine.consts import MoveTypes
-from engine.piece import PieceTypes, letter2type
+from engine.piece import EMPTY_PIECE, PROMOTION_TYPES, Piece, PieceTypes, letter2type
+
+# Packed moves fit 16 bits: the origin square in bits 0-5, the destination in bits 6-11 and a flag in bits 12-15.
+# Flags below 8 are the value of the move type, promotions add the index of the new piece in `PROMOTION_TYPES` to 8.
+TO_SHIFT: int = 6
+FLAG_SHIFT: int = 12
+SQUARE_MASK: int = 63
+QUIET_FLAG: int = MoveTypes.MOVE.value
+CAPTURE_FLAG: int = MoveTypes.CAPTURE.value
+EN_PASSANT_FLAG: int = MoveTypes.EN_PASSANT.value
+KING_CASTLE_FLAG: int = MoveTypes.KING_CASTLE.value
+QUEEN_CASTLE_FLAG: int = MoveTypes.QUEEN_CASTLE.value
+PROMOTION_FLAG: int = 8
+# a1 to a1 can never be played, so the zero code stands for the game over move.
+NULL_MOVE: int = 0
+# More than any position can have, the most known is 218.
+MAX_MOVES: int = 256
+# Kinds of moves a generator can be asked for: captures and promotions, the rest, or both.
+TACTICAL_MOVES: int = 1
+QUIET_MOVES: int = 2
+ALL_MOVES: int = TACTICAL_MOVES | QUIET_MOVES
+
+
+def pack_move(start: int, end: int, flag: int) -> int:
+    """Packs the squares and the flag of a move into its 16-bit code."""
+    return start | end << TO_SHIFT | flag << FLAG_SHIFT
+
+def move_buffer() -> array:
+    """Returns a zeroed buffer large enough to hold the packed moves of any position."""
+    return array('H', bytes(2 * MAX_MOVES))
 
 class Move(object):
+    __slots__ = ('move_type', 'start', 'piece', 'end', '_is_checking', '_is_mating', 'promotion_piece', 'game', 'ply', 'key')
 
-    def __init__(self, move_type: MoveTypes, start: str, piece: Piece, end: str, /, is_checking: bool=False, is_mating: bool=False, promotion_piece: PieceTypes=PieceTypes.EMPTY, annex: Callable[[Game, str, str], None]= lambda game, start_pos, end_pos: None):
+    def __init__(self, move_type: MoveTypes, start: Square, piece: Piece, end: Square, /, is_checking: bool | None=None, is_mating: bool | None=None, promotion_piece: PieceTypes=PieceTypes.EMPTY):
         self.move_type = move_type
-        self.annex = annex
-        self.start: str = start
+        self.start: Square = start
         self.piece: Piece = piece
-        self.end: str = end
-        self.is_checking = is_checking
-        self.is_mating = is_mating
+        self.end: Square = end
+        self._is_checking: bool | None = is_checking
+        self._is_mating: bool | None = is_mating
         self.promotion_piece = promotion_piece
+        self.game: Game | None = None
+        self.ply: int = 0
+        self.key: int = 0
+
+    def bind(self, game: Game) -> Move:
+        """
+        Remembers the position the move was generated in, so that whether it checks or mates can be worked out the first time it is asked.
+
+        Parameters:
+        - `game`: The game, in the position the move is to be played from.
+        """
+
+        self.game = game
+        self.ply = len(game.moves)
+        self.key = game.key
+        return self
+
+    def at_origin(self, query: Callable[[Game], bool]) -> bool | None:
+        """
+        Answers a question about the move in the position it was generated in, `None` when that position cannot be reached anymore.
+        If the move has since been played, the game is taken back to the position before it for the question and then replayed.
+
+        Parameters:
+        - `query`: Called with the game standing in the origin position.
+        """
+
+        game = self.game
+        if game is None:
+            return None
+        if len(game.moves) == self.ply and game.key == self.key:
+            return query(game)
+        if len(game.moves) > self.ply and game.key_history[self.ply] == self.key and game.moves[self.ply] == self.pack():
+            undone: list[int] = [game.pop_code() for _ in range(len(game.moves) - self.ply)]
+            try:
+                return query(game)
+            finally:
+                for code in reversed(undone):
+                    game.push_code(code)
+        return None
+
+    @property
+    def is_checking(self) -> bool:
+        """Whether the move gives check, computed on first access. Unbound moves that were not told otherwise do not check."""
+        if self._is_checking is None:
+            self._is_checking = self.at_origin(lambda game: game.does_check(self))
+            if self._is_checking is None:
+                return False
+        return self._is_checking
+
+    @is_checking.setter
+    def is_checking(self, value: bool) -> None:
+        self._is_checking = value
+
+    @property
+    def is_mating(self) -> bool:
+        """Whether the move gives mate, computed on first access. Unbound moves that were not told otherwise do not mate."""
+        if self._is_mating is None:
+            if self._is_checking is False:
+                self._is_mating = False
+            else:
+                self._is_mating = self.at_origin(lambda game: game.does_mate(self))
+                if self._is_mating is None:
+                    return False
+        return self._is_mating
+
+    @is_mating.setter
+    def is_mating(self, value: bool) -> None:
+        self._is_mating = value
+
+    def pack(self) -> int:
+        """Returns the 16-bit code of the move, see `pack_move`."""
+        match self.move_type:
+            case MoveTypes.GAME_OVER:
+                return NULL_MOVE
+            case MoveTypes.PROMOTION:
+                flag = PROMOTION_FLAG + PROMOTION_TYPES.index(self.promotion_piece)
+            case _:
+                flag = self.move_type.value
+        return self.start | self.end << TO_SHIFT | flag << FLAG_SHIFT
+
+    @staticmethod
+    def unpack(code: int, board: Board) -> Move:
+        """
+        Builds the move a 16-bit code stands for.
+
+        Parameters:
+        - `code`: The packed move.
+        - `board`: The board the move is to be played on, which tells the piece being moved.
+        """
+
+        if code == NULL_MOVE:
+            return Move(MoveTypes.GAME_OVER, 0, EMPTY_PIECE, 0)
+        start = code & SQUARE_MASK
+        end = code >> TO_SHIFT & SQUARE_MASK
+        flag = code >> FLAG_SHIFT
+        if flag >= PROMOTION_FLAG:
+            return Move(MoveTypes.PROMOTION, start, board.pieces[start], end, promotion_piece=PROMOTION_TYPES[flag - PROMOTION_FLAG])
+        return Move(MoveTypes(flag), start, board.pieces[start], end)
+
+    def uci(self) -> str:
+        """Returns the move in coordinate notation, e.g. `e2e4` or `e7e8q`."""
+        return SQUARE_NAMES[self.start] + SQUARE_NAMES[self.end] + (self.promotion_piece.value.letter if self.move_type == MoveTypes.PROMOTION else '')
 
     def __str__(self) -> str:
-        s = self.move_type.name + " " + self.piece.side.name + " " + (PieceTypes)(letter2type(self.piece.type.letter)).name +  " " + self.start + " -> " + self.end + " "
+        s = self.move_type.name + " " + self.piece.side.name + " " + (PieceTypes)(letter2type(self.piece.type.letter)).name +  " " + SQUARE_NAMES[self.start] + " -> " + SQUARE_NAMES[self.end] + " "
         match self.move_type:
             case MoveTypes.MOVE | MoveTypes.CAPTURE:
                 s += "Check:" + ("Yes" if self.is_checking else "No") + " Mate:" + ("Yes" if self.is_mating else "No")
@@ -4,7 +4,10 @@ from itertools import product
 
 if TYPE_CHECKING:
     from engine.simul_game import Game
+    from engine.move import Move
+    from engine.piece import Piece
 
+from engine.bitboard import SQUARE_MASKS, Square, offset_square
 from engine.consts import MoveKind, MoveTypes, PieceSide
 from misc.utils import mini_chain
 
@@ -60,6 +63,16 @@ from misc.utils import mini_chain
         # l.append(pos[0] + str(int(pos[1]) - 2 + 4 * side.value))
     # return l
 
+def step_mask(index: int, offset: tuple[int, int], limit: int) -> int:
+    """Returns the mask of the squares reached by repeating an offset from a square at most `limit` times without leaving the board."""
+    mask = 0
+    for _ in range(limit):
+        index = offset_square(index, *offset)
+        if index < 0:
+            break
+        mask |= SQUARE_MASKS[index]
+    return mask
+
 class MoveGenerator(object):
 
     def __init__(self) -> None:
@@ -69,11 +82,17 @@ class MoveGenerator(object):
         self.offsets: list[tuple[int, int]]
         self.can_capture: bool
         self.only_capture: bool
-        self.moves_conds: dict[MoveGenerator, Callable[[Game, str], bool]]
+        self.moves_conds: dict[MoveGenerator, Callable[[Game, Square], bool]]
         self.offset: tuple[int, int]
         self.move_type: MoveTypes
         self.extra_info: dict
-        self.annex: Callable[[Game, str, str], None]
+        self.compiled: bool = False
+        self.directions: list[tuple[int, int]]
+        self.rays: list[list[int]]
+        self.ray_positive: list[bool]
+        self.targets: list[int]
+        self.specializer: Callable[[MoveGenerator, PieceSide], Callable[[Game, Square, Piece, bool], list[Move]]] | None = None
+        self.specialized: dict[PieceSide, Callable[[Game, Square, Piece, bool], list[Move]]] = {}
 
     @staticmethod
     def vector_move(vectors: list[tuple[int, int]], limit: int) -> MoveGenerator:
@@ -95,15 +114,19 @@ class MoveGenerator(object):
         return self
 
     @staticmethod
-    def complex_move(moves_conds: dict[MoveGenerator, Callable[[Game, str], bool]]) -> MoveGenerator:
-        """To handle complex type move generators"""
+    def complex_move(moves_conds: dict[MoveGenerator, Callable[[Game, Square], bool]], specializer: Callable[[MoveGenerator, PieceSide], Callable[[Game, Square, Piece, bool], list[Move]]] | None = None) -> MoveGenerator:
+        """
+        To handle complex type move generators.
+        `specializer` optionally builds, once per side, a single function producing the same moves as all the conditional generators together.
+        """
         self = MoveGenerator()
         self.move_kind = MoveKind.COMPLEX
         self.moves_conds = moves_conds
+        self.specializer = specializer
         return self
 
     @staticmethod
-    def special_move(offset: tuple[int, int], move_type: MoveTypes, can_capture: bool, only_capture: bool=False, extra_info: dict = {}, annex: Callable[[Game, str, str], None]=lambda game, start_pos, end_pos: None) -> MoveGenerator:
+    def special_move(offset: tuple[int, int], move_type: MoveTypes, can_capture: bool, only_capture: bool=False, extra_info: dict = {}) -> MoveGenerator:
         """To handle special type move generators"""
         self = MoveGenerator()
         self.move_kind = MoveKind.SPECIAL
@@ -112,9 +135,60 @@ class MoveGenerator(object):
         self.can_capture = can_capture
         self.only_capture = only_capture
         self.extra_info = extra_info
-        self.annex = annex
         return self
 
+    def compile(self) -> MoveGenerator:
+        """
+        One time conversion of the declarative definition into per-square lookup tables.
+        Vector generators get a ray mask per direction and square, jump generators a target mask per square.
+        Both keep the union of everything reachable from a square on an empty board in `targets`.
+        Complex generators compile every generator they hold.
+        """
+
+        match self.move_kind:
+            case MoveKind.VECTOR:
+                self.directions = [vector for vector in self.vectors if vector != (0, 0)]
+                self.ray_positive = [d_rank > 0 or (d_rank == 0 and d_file > 0) for d_file, d_rank in self.directions]
+                self.rays = [[step_mask(index, vector, self.limit) for index in range(64)] for vector in self.directions]
+                self.targets = [0] * 64
+                for index in range(64):
+                    for rays in self.rays:
+                        self.targets[index] |= rays[index]
+            case MoveKind.JUMP:
+                self.targets = [0] * 64
+                for index in range(64):
+                    for offset in self.offsets:
+                        self.targets[index] |= step_mask(index, offset, 1)
+            case MoveKind.COMPLEX:
+                for move_gen in self.moves_conds:
+                    move_gen.compile()
+        self.compiled = True
+        return self
+
+    def specialize(self, side: PieceSide) -> Callable[[Game, Square, Piece, bool], list[Move]] | None:
+        """Returns the move function specialized for one side, building it on first use. `None` when the generator has no specializer."""
+        generate = self.specialized.get(side)
+        if generate is None and self.specializer is not None:
+            generate = self.specialized[side] = self.specializer(self, side)
+        return generate
+
+    def attacks(self, index: int, occupied: int) -> int:
+        """
+        Returns the mask of squares a compiled vector or jump generator reaches from a square.
+        Rays stop at, and include, the first occupied square.
+        """
+
+        if self.move_kind == MoveKind.JUMP or self.limit == 1:
+            return self.targets[index]
+        attacks = 0
+        for rays, positive in zip(self.rays, self.ray_positive):
+            ray = rays[index]
+            blockers = ray & occupied
+            if blockers:
+                ray &= ~rays[(blockers & -blockers).bit_length() - 1 if positive else blockers.bit_length() - 1]
+            attacks |= ray
+        return attacks
+
     def __str__(self) -> str:
         s = self.move_kind.name + " "
         match self.move_kind:
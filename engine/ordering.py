@@ -0,0 +1,152 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+from array import array
+
+if TYPE_CHECKING:
+    from typing import Generator
+    from engine.simul_game import Game
+
+from engine.move import FLAG_SHIFT, KING_CASTLE_FLAG, PROMOTION_FLAG, QUEEN_CASTLE_FLAG, QUIET_FLAG, QUIET_MOVES, TACTICAL_MOVES, TO_SHIFT, SQUARE_MASK, move_buffer
+
+# Victim values for MVV-LVA, indexed by slot offset (pawn, knight, bishop, rook, queen, king). An en-passant capture takes a pawn.
+VICTIM_VALUES: list[int] = [1, 3, 3, 5, 9, 0]
+# Promotion flags in `PROMOTION_TYPES` order (queen, bishop, rook, knight): queen promotions go before every capture,
+# under-promotions after them.
+PROMOTION_SCORES: list[int] = [1000, -300, -200, -100]
+# Butterfly history is indexed by the low 12 bits of a move, its origin and destination.
+BUTTERFLY_SIZE: int = 64 * 64
+BUTTERFLY_MASK: int = BUTTERFLY_SIZE - 1
+# History scores are halved once any of them passes this, so that recent cutoffs weigh more.
+HISTORY_LIMIT: int = 1 << 20
+
+
+class MoveOrdering(object):
+    """
+    Yields the legal moves of a position in the order most likely to cause an early cutoff, generating them in stages:
+    the transposition table move, then captures and promotions by MVV-LVA, then killers, then the remaining quiet moves by history,
+    and last the captures that static exchange evaluation says lose material.
+    Quiet moves are only generated if no earlier move cut the search off. Killers and history are kept across the positions of a search,
+    and across the searches of a game when the same ordering is passed to each: `age` runs between iterations, `clear` once the game is over.
+    """
+
+    def __init__(self, max_ply: int):
+        self.killers: list[list[int]] = [[0, 0] for _ in range(max_ply + 1)]
+        self.history: list[array] = [array('l', [0]) * BUTTERFLY_SIZE for _ in range(2)]
+        self.tactical_buffers: list[array] = [move_buffer() for _ in range(max_ply + 1)]
+        self.quiet_buffers: list[array] = [move_buffer() for _ in range(max_ply + 1)]
+
+    def clear(self) -> None:
+        """Forgets every killer and history score, for a new game."""
+        for killers in self.killers:
+            killers[0] = killers[1] = 0
+        for history in self.history:
+            for index in range(BUTTERFLY_SIZE):
+                history[index] = 0
+
+    def age(self) -> None:
+        """
+        Halves the history, called between iterations so that the cutoffs of the latest one weigh the most.
+        Killers are kept: they are only tried once found among the quiet moves of the position, a stale one costs nothing.
+        """
+
+        for history in self.history:
+            for index in range(BUTTERFLY_SIZE):
+                history[index] >>= 1
+
+    def tactical_score(self, game: Game, code: int) -> int:
+        """MVV-LVA score of a capture or promotion: the most valuable victim first, the least valuable attacker among equals."""
+        pieces = game.board.pieces
+        start = code & SQUARE_MASK
+        victim = pieces[code >> TO_SHIFT & SQUARE_MASK].slot
+        score = 10 * VICTIM_VALUES[victim % 6] if victim >= 0 else 10 * VICTIM_VALUES[0]
+        flag = code >> FLAG_SHIFT
+        if flag >= PROMOTION_FLAG:
+            score += PROMOTION_SCORES[flag - PROMOTION_FLAG]
+        return score - pieces[start].slot % 6
+
+    def is_losing(self, game: Game, code: int) -> bool:
+        """
+        Returns `True` for a capture or promotion that loses material once the exchange on its square is played out.
+        Taking a piece at least as valuable as the one capturing cannot lose, and is told apart without running `game.see_code`.
+        """
+
+        pieces = game.board.pieces
+        victim = pieces[code >> TO_SHIFT & SQUARE_MASK].slot
+        if code >> FLAG_SHIFT < PROMOTION_FLAG and VICTIM_VALUES[victim % 6 if victim >= 0 else 0] >= VICTIM_VALUES[pieces[code & SQUARE_MASK].slot % 6]:
+            return False
+        return game.see_code(code) < 0
+
+    def captures(self, game: Game, ply: int, legality: tuple[int, int, int, dict[int, int]] | None = None) -> list[int]:
+        """Returns the packed legal captures and promotions of the side to move by MVV-LVA, the moves quiescence search looks at."""
+        if legality is None:
+            legality = game.legality()
+        buffer = self.tactical_buffers[ply]
+        return sorted(buffer[:game.generate_codes(buffer, legality, TACTICAL_MOVES)], key=lambda code: self.tactical_score(game, code), reverse=True)
+
+    def moves(self, game: Game, ply: int, table_move: int = 0, legality: tuple[int, int, int, dict[int, int]] | None = None) -> Generator[int, None, None]:
+        """
+        Yields the packed legal moves of the side to move, best candidates first.
+
+        Parameters:
+        - `game`: The game in the position to search.
+        - `ply`: Distance from the root, selects the killers and buffers.
+        - `table_move`: Best move stored for the position, tried first when legal, before any move is generated.
+        - `legality`: The result of `game.legality()`, computed when not given.
+        """
+
+        if legality is None:
+            legality = game.legality()
+        if table_move:
+            # Checked on its own so that it is searched before anything is generated, whether it captures or not.
+            if game.is_pseudo_legal_code(table_move) and game.is_legal_code(table_move, legality):
+                yield table_move
+            else:
+                table_move = 0
+        buffer = self.tactical_buffers[ply]
+        tactical = buffer[:game.generate_codes(buffer, legality, TACTICAL_MOVES)]
+        tactical = sorted(tactical, key=lambda code: self.tactical_score(game, code), reverse=True)
+        losing: list[int] = []
+        for code in tactical:
+            if code != table_move:
+                if self.is_losing(game, code):
+                    losing.append(code)
+                else:
+                    yield code
+
+        buffer = self.quiet_buffers[ply]
+        quiet = buffer[:game.generate_codes(buffer, legality, QUIET_MOVES)]
+        killers = [code for code in self.killers[ply] if code and code != table_move and code in quiet]
+        yield from killers
+        history = self.history[game.side.value]
+        quiet = sorted(quiet, key=lambda code: history[code & BUTTERFLY_MASK], reverse=True)
+        for code in quiet:
+            if code != table_move and code not in killers:
+                yield code
+        yield from losing
+
+    def is_quiet(self, code: int) -> bool:
+        """Returns `True` for a move that neither captures nor promotes, the moves killers and history are kept for."""
+        return code >> FLAG_SHIFT in (QUIET_FLAG, KING_CASTLE_FLAG, QUEEN_CASTLE_FLAG)
+
+    def cutoff(self, game: Game, ply: int, code: int, depth: int) -> None:
+        """
+        Records a quiet move that caused a beta cutoff as a killer of its ply and rewards it in the history of the side to move.
+
+        Parameters:
+        - `game`: The game, in the position the move was played from.
+        - `ply`: Distance from the root.
+        - `code`: The move that caused the cutoff.
+        - `depth`: Remaining depth of the search the cutoff happened in.
+        """
+
+        if not self.is_quiet(code):
+            return
+        killers = self.killers[ply]
+        if killers[0] != code:
+            killers[1] = killers[0]
+            killers[0] = code
+        history = self.history[game.side.value]
+        history[code & BUTTERFLY_MASK] += depth * depth
+        if history[code & BUTTERFLY_MASK] > HISTORY_LIMIT:
+            for index in range(BUTTERFLY_SIZE):
+                history[index] >>= 1
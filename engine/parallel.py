@@ -0,0 +1,189 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+from collections import namedtuple
+import argparse
+import multiprocessing
+import os
+import time
+
+from loguru import logger
+
+if TYPE_CHECKING:
+    pass
+
+from engine.move import Move
+from engine.ordering import MoveOrdering
+from engine.search import DEFAULT_DEPTH, MAX_PLY, MATE_SCORE, Search
+from engine.simul_game import Game
+from engine.transposition import DEFAULT_MEGABYTES, SharedTranspositionTable, TranspositionTable
+
+# Root splitting: the legal moves of the root are dealt out to worker processes, each of which runs its own iterative deepening
+# over its share, with a transposition table shared by all of them or a private one each. Workers only ever receive a position as FEN,
+# the keys of the earlier positions that still count for repetitions, their root moves as packed integers and the name of the
+# shared table, and send back plain tuples.
+DEFAULT_WORKERS: int = os.cpu_count() or 1
+
+SearchTask = namedtuple('SearchTask', ['FEN', 'keys', 'codes', 'depth', 'nodes', 'movetime', 'hash_megabytes', 'table_name'])
+WorkerReport = namedtuple('WorkerReport', ['iterations', 'stopped', 'nodes', 'seconds'])
+ParallelResult = namedtuple('ParallelResult', ['move', 'score', 'depth', 'nodes', 'seconds', 'nps', 'pv', 'workers', 'worker_nodes'])
+SpeedupReport = namedtuple('SpeedupReport', ['single', 'parallel', 'speedup'])
+
+
+def encode_position(game: Game) -> tuple[str, list[int]]:
+    """
+    Compact, picklable form of a game's position: its FEN and the keys of the positions since the last capture or pawn move,
+    which are all a search needs from the history to see repetitions.
+    """
+
+    keys = game.key_history[-(game.half_moves + 1):-1] if game.half_moves else []
+    return game.conv2FEN(), keys
+
+def decode_position(FEN: str, keys: list[int]) -> Game:
+    """Rebuilds a game from `encode_position`, with the earlier positions counted for repetitions."""
+    game = Game.fromFEN(FEN)
+    for key in keys:
+        game.key_counts[key] = game.key_counts.get(key, 0) + 1
+    return game
+
+# Shared tables a worker process has attached to, by name, so that it attaches once rather than on every search.
+_attached: dict[str, SharedTranspositionTable] = {}
+
+def search_worker(task: SearchTask) -> WorkerReport:
+    """Runs in a worker process: searches the root moves of a task and reports every iteration it completed."""
+    game = decode_position(task.FEN, task.keys)
+    if task.table_name is None:
+        table = TranspositionTable(task.hash_megabytes)
+    else:
+        if task.table_name not in _attached:
+            _attached[task.table_name] = SharedTranspositionTable.attach(task.table_name)
+        table = _attached[task.table_name]
+    search = Search(game, task.nodes, task.movetime, table)
+    start = time.perf_counter()
+    search.iterate(task.depth, task.codes)
+    return WorkerReport(search.iterations, search.stopped, search.nodes, time.perf_counter() - start)
+
+def merge_reports(reports: list[WorkerReport]) -> tuple[int, int, int, list[int]] | None:
+    """
+    Picks the best root move out of the worker reports: the best score among the workers at the deepest depth every worker reached.
+    A worker that finished on its own (all its iterations done, or a mate found) counts as having reached any depth.
+    Returns the depth, move, score and principal variation, `None` when no worker completed an iteration.
+    """
+
+    reached = [report.iterations[-1][0] if report.iterations else 0 for report in reports if report.stopped]
+    depth = min(reached) if reached else max((report.iterations[-1][0] for report in reports if report.iterations), default=0)
+    best: tuple[int, int, int, list[int]] | None = None
+    for report in reports:
+        iterations = [iteration for iteration in report.iterations if iteration[0] <= depth]
+        if iterations and (best is None or iterations[-1][2] > best[2]):
+            best = iterations[-1]
+    return None if best is None else (depth,) + best[1:]
+
+
+class ParallelSearch(object):
+    """
+    Searches positions across a pool of worker processes by splitting the root moves between them.
+    The pool and the shared transposition table are set up once and reused for every search until `close` is called,
+    the object can also be used as a context manager.
+    """
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, hash_megabytes: float = DEFAULT_MEGABYTES, shared: bool = True):
+        self.workers: int = max(1, workers)
+        self.hash_megabytes: float = hash_megabytes
+        self.table: SharedTranspositionTable | None = SharedTranspositionTable(hash_megabytes) if shared else None
+        self.pool = multiprocessing.get_context().Pool(self.workers)
+
+    def __enter__(self) -> ParallelSearch:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Stops the worker processes and frees the shared table."""
+        self.pool.terminate()
+        self.pool.join()
+        if self.table is not None:
+            self.table.close()
+            self.table.unlink()
+            self.table = None
+
+    def search(self, game: Game, depth: int | None = None, nodes: int | None = None, movetime: float | None = None) -> ParallelResult:
+        """
+        Searches a game for the best move of the side to move, limits as in `engine.search.best_move`.
+        A node limit is shared out evenly between the workers, a time limit applies to each of them.
+        Returns the move (`None` when there is no legal move), its score, the depth completed by every worker, the nodes searched by all of them,
+        the wall time taken, the aggregate nodes per second, the principal variation in coordinate notation, the workers used and their node counts.
+
+        Parameters:
+        - `game`: The game to search, only read.
+        - `depth`: Deepest iteration to run.
+        - `nodes`: Number of nodes, across all workers, after which the search stops.
+        - `movetime`: Seconds after which the search stops.
+        """
+
+        if depth is None:
+            depth = DEFAULT_DEPTH if nodes is None and movetime is None else MAX_PLY
+        start = time.perf_counter()
+        legality = game.legality()
+        root_moves = list(MoveOrdering(0).moves(game, 0, 0, legality))
+        if not root_moves:
+            return ParallelResult(None, -MATE_SCORE if legality[1] else 0, 0, 0, 0.0, 0.0, [], 0, [])
+
+        # Dealt round-robin from the ordered list so that every worker gets some of the likely best moves.
+        shares = [share for share in (root_moves[index::self.workers] for index in range(self.workers)) if share]
+        FEN, keys = encode_position(game)
+        worker_nodes = None if nodes is None else max(1, nodes // len(shares))
+        table_name = None
+        if self.table is not None:
+            self.table.new_search()
+            table_name = self.table.name
+        tasks = [SearchTask(FEN, keys, share, min(depth, MAX_PLY), worker_nodes, movetime, self.hash_megabytes, table_name) for share in shares]
+        reports = self.pool.map(search_worker, tasks)
+        seconds = time.perf_counter() - start
+
+        total = sum(report.nodes for report in reports)
+        merged = merge_reports(reports)
+        if merged is None:
+            completed, code, score, pv = 0, root_moves[0], 0, [root_moves[0]]
+        else:
+            completed, code, score, pv = merged
+        move = Move.unpack(code, game.board).bind(game)
+        line = Search(game, table=TranspositionTable(0)).line(pv)
+        logger.debug(f"{len(shares)} workers depth {completed} score {score} nodes {total} nps {total / seconds if seconds > 0 else 0:.0f} pv {' '.join(line)}")
+        return ParallelResult(move, score, completed, total, seconds, total / seconds if seconds > 0 else 0.0, line, len(shares), [report.nodes for report in reports])
+
+
+def parallel_best_move(game: Game, workers: int = DEFAULT_WORKERS, depth: int | None = None, nodes: int | None = None, movetime: float | None = None, shared: bool = True) -> ParallelResult:
+    """Searches a game with a pool of `workers` processes started for this search only, see `ParallelSearch.search`."""
+    with ParallelSearch(workers, shared=shared) as search:
+        return search.search(game, depth, nodes, movetime)
+
+def measure_speedup(FEN: str, workers: int, depth: int, shared: bool = True) -> SpeedupReport:
+    """
+    Searches a position to a fixed depth with one worker, then with `workers`, and returns both results
+    with the speedup: the wall time of the first over that of the second. Starting the pools is not timed.
+    """
+
+    game = Game.fromFEN(FEN)
+    with ParallelSearch(1, shared=shared) as search:
+        single = search.search(game, depth)
+    with ParallelSearch(workers, shared=shared) as search:
+        parallel = search.search(game, depth)
+    return SpeedupReport(single, parallel, single.seconds / parallel.seconds if parallel.seconds > 0 else 0.0)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Time a search split across worker processes against a single worker.")
+    parser.add_argument('--fen', default='rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1', help="position to search (default the start position)")
+    parser.add_argument('--depth', type=int, default=DEFAULT_DEPTH, help=f"depth to search to (default {DEFAULT_DEPTH})")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help=f"worker processes (default {DEFAULT_WORKERS}, the number of cores)")
+    parser.add_argument('--private', action='store_true', help="give every worker its own transposition table instead of a shared one")
+    args = parser.parse_args()
+
+    logger.remove()
+
+    report = measure_speedup(args.fen, args.workers, args.depth, not args.private)
+    for result in (report.single, report.parallel):
+        print(f"{result.workers:>3} workers  {result.move.uci() if result.move else '-':<6} score {result.score:>6}  depth {result.depth}  {result.nodes:>9} nodes  {result.seconds:8.3f}s  {result.nps:>9.0f} nps")
+    print(f"\nspeedup {report.speedup:.2f}x with {report.parallel.workers} workers")
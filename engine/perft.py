@@ -0,0 +1,122 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+from collections import namedtuple
+import argparse
+import sys
+import time
+
+from loguru import logger
+
+if TYPE_CHECKING:
+    pass
+
+from engine.simul_game import Game
+from engine.transposition import TranspositionTable
+
+PerftPosition = namedtuple('PerftPosition', ['name', 'FEN', 'nodes'])
+
+# Known leaf counts keyed by depth. The first six are the usual reference positions, the rest stress
+# en passant, castling and promotion edge cases.
+PERFT_SUITE: list[PerftPosition] = [
+    PerftPosition('start', 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1', {1: 20, 2: 400, 3: 8902, 4: 197281, 5: 4865609, 6: 119060324}),
+    PerftPosition('kiwipete', 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1', {1: 48, 2: 2039, 3: 97862, 4: 4085603, 5: 193690690}),
+    PerftPosition('position 3', '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1', {1: 14, 2: 191, 3: 2812, 4: 43238, 5: 674624, 6: 11030083}),
+    PerftPosition('position 4', 'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1', {1: 6, 2: 264, 3: 9467, 4: 422333, 5: 15833292}),
+    PerftPosition('position 4 mirrored', 'r2q1rk1/pP1p2pp/Q4n2/bbp1p3/Np6/1B3NBn/pPPP1PPP/R3K2R b KQ - 0 1', {1: 6, 2: 264, 3: 9467, 4: 422333, 5: 15833292}),
+    PerftPosition('position 5', 'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8', {1: 44, 2: 1486, 3: 62379, 4: 2103487, 5: 89941194}),
+    PerftPosition('position 6', 'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10', {1: 46, 2: 2079, 3: 89890, 4: 3894594, 5: 164075551}),
+    PerftPosition('illegal en passant 1', '3k4/3p4/8/K1P4r/8/8/8/8 b - - 0 1', {1: 18, 2: 92, 3: 1670, 4: 10138, 6: 1134888}),
+    PerftPosition('illegal en passant 2', '8/8/4k3/8/2p5/8/B2P2K1/8 w - - 0 1', {1: 13, 2: 102, 3: 1266, 4: 10276, 6: 1015133}),
+    PerftPosition('en passant gives check', '8/8/1k6/2b5/2pP4/8/5K2/8 b - d3 0 1', {1: 15, 2: 126, 3: 1928, 4: 13931, 6: 1440467}),
+    PerftPosition('short castle gives check', '5k2/8/8/8/8/8/8/4K2R w K - 0 1', {1: 15, 2: 66, 3: 1198, 4: 6399, 6: 661072}),
+    PerftPosition('long castle gives check', '3k4/8/8/8/8/8/8/R3K3 w Q - 0 1', {1: 16, 2: 71, 3: 1286, 4: 7418, 6: 803711}),
+    PerftPosition('castling rights', 'r3k2r/1b4bq/8/8/8/8/7B/R3K2R w KQkq - 0 1', {1: 26, 2: 1141, 3: 27826, 4: 1274206}),
+    PerftPosition('castling prevented', 'r3k2r/8/3Q4/8/8/5q2/8/R3K2R b KQkq - 0 1', {1: 44, 2: 1494, 3: 50509, 4: 1720476}),
+    PerftPosition('promote out of check', '2K2r2/4P3/8/8/8/8/8/3k4 w - - 0 1', {1: 11, 2: 133, 3: 1442, 4: 19174, 6: 3821001}),
+    PerftPosition('discovered check', '8/8/1P2K3/8/2n5/1q6/8/5k2 b - - 0 1', {1: 29, 2: 165, 3: 5160, 4: 31961, 5: 1004658}),
+    PerftPosition('promote to give check', '4k3/1P6/8/8/8/8/K7/8 w - - 0 1', {1: 9, 2: 40, 3: 472, 4: 2661, 6: 217342}),
+    PerftPosition('underpromote to check', '8/P1k5/K7/8/8/8/8/8 w - - 0 1', {1: 6, 2: 27, 3: 273, 4: 1329, 6: 92683}),
+    PerftPosition('self stalemate', 'K1k5/8/P7/8/8/8/8/8 w - - 0 1', {1: 2, 2: 6, 3: 13, 4: 63, 6: 2217}),
+    PerftPosition('stalemate and checkmate 1', '8/k1P5/8/1K6/8/8/8/8 w - - 0 1', {1: 10, 2: 25, 3: 268, 4: 926, 7: 567584}),
+    PerftPosition('stalemate and checkmate 2', '8/8/2k5/5q2/5n2/8/5K2/8 b - - 0 1', {1: 37, 2: 183, 3: 6559, 4: 23527}),
+]
+
+PerftResult = namedtuple('PerftResult', ['name', 'depth', 'nodes', 'expected', 'seconds'])
+
+
+def run_perft(FEN: str, depth: int, name: str = '', expected: int | None = None, hash_megabytes: float = 0) -> PerftResult:
+    """
+    Times a perft of a position.
+
+    Parameters:
+    - `FEN`: The position to expand.
+    - `depth`: Number of plies to expand.
+    - `name`: Label of the position in the report.
+    - `expected`: The known node count, if any.
+    - `hash_megabytes`: Size of the transposition table counting transpositions once, none when 0.
+    """
+
+    game = Game.fromFEN(FEN)
+    table = TranspositionTable(hash_megabytes) if hash_megabytes > 0 else None
+    start = time.perf_counter()
+    nodes = game.perft(depth, table=table)
+    return PerftResult(name or FEN, depth, nodes, expected, time.perf_counter() - start)
+
+def run_suite(max_depth: int, names: list[str] | None = None, hash_megabytes: float = 0) -> list[PerftResult]:
+    """
+    Runs every suite position at the deepest known depth not above `max_depth`.
+
+    Parameters:
+    - `max_depth`: Deepest depth to run a position at.
+    - `names`: Only run the positions with these names.
+    - `hash_megabytes`: Size of the transposition table of each run, none when 0.
+    """
+
+    results: list[PerftResult] = []
+    for position in PERFT_SUITE:
+        if names and position.name not in names:
+            continue
+        depths = [depth for depth in position.nodes if depth <= max_depth]
+        if depths:
+            depth = max(depths)
+            results.append(run_perft(position.FEN, depth, position.name, position.nodes[depth], hash_megabytes))
+    return results
+
+def format_result(result: PerftResult) -> str:
+    """Single report line of a perft run with its verdict and nodes per second."""
+    verdict = '' if result.expected is None else ('OK' if result.nodes == result.expected else f'FAIL expected {result.expected}')
+    nps = result.nodes / result.seconds if result.seconds > 0 else 0.0
+    return f"{result.name:<28} depth {result.depth}  {result.nodes:>10} nodes  {result.seconds:8.3f}s  {nps:>10.0f} nps  {verdict}"
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Validate and time move generation with perft.")
+    parser.add_argument('--depth', type=int, default=3, help="deepest depth to run (default 3)")
+    parser.add_argument('--fen', help="run a single position instead of the suite")
+    parser.add_argument('--position', action='append', help="only run the named suite position, may be repeated")
+    parser.add_argument('--divide', action='store_true', help="with --fen, split the count by root move")
+    parser.add_argument('--hash', type=float, default=0, help="megabytes of transposition table for hashed perft (default 0, off)")
+    args = parser.parse_args()
+
+    logger.remove()
+
+    if args.fen:
+        if args.divide:
+            game = Game.fromFEN(args.fen)
+            counts = game.divide(args.depth, TranspositionTable(args.hash) if args.hash > 0 else None)
+            for uci, nodes in sorted(counts.items()):
+                print(f"{uci}: {nodes}")
+            print(f"\nMoves: {len(counts)}\nNodes: {sum(counts.values())}")
+        else:
+            print(format_result(run_perft(args.fen, args.depth, hash_megabytes=args.hash)))
+        sys.exit(0)
+
+    results = run_suite(args.depth, args.position, args.hash)
+    for result in results:
+        print(format_result(result))
+    total_nodes = sum(result.nodes for result in results)
+    total_seconds = sum(result.seconds for result in results)
+    failures = sum(result.nodes != result.expected for result in results)
+    print(f"\n{len(results) - failures}/{len(results)} passed, {total_nodes} nodes in {total_seconds:.3f}s ({total_nodes / total_seconds if total_seconds > 0 else 0:.0f} nps)")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,205 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+from collections import namedtuple
+import argparse
+import re
+import sys
+import time
+
+from loguru import logger
+
+if TYPE_CHECKING:
+    from typing import Generator, Iterable
+
+from engine.exceptions import InvalidPGNStringException
+from engine.simul_game import Game
+
+START_FEN: str = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+TAG_PATTERN: re.Pattern[str] = re.compile(r'\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+TOKEN_PATTERN: re.Pattern[str] = re.compile(r'''
+    (?P<comment>\{[^}]*\}?)
+  | (?P<rest_comment>;.*)
+  | (?P<nag>\$\d+)
+  | (?P<suffix>[?!]{1,2})
+  | (?P<open>\()
+  | (?P<close>\))
+  | (?P<result>1-0|0-1|1/2-1/2|\*)
+  | (?P<number>\d+\.+)
+  | (?P<san>[^\s{}();$?!.]+)
+''', re.VERBOSE)
+RESULTS: tuple[str, ...] = ('1-0', '0-1', '1/2-1/2', '*')
+# Move suffixes and the numeric annotation glyphs they stand for.
+SUFFIX_NAGS: dict[str, int] = {'!': 1, '?': 2, '!!': 3, '??': 4, '!?': 5, '?!': 6}
+# Games between two throughput reports while replaying.
+REPORT_EVERY: int = 1000
+
+ReplayedGame = namedtuple('ReplayedGame', ['record', 'game'])
+
+
+class PGNMove(object):
+    """A move of the move text as written, with the annotations, comments and alternative lines that follow it."""
+
+    __slots__ = ('san', 'nags', 'comments', 'variations')
+
+    def __init__(self, san: str):
+        self.san: str = san
+        self.nags: list[int] = []
+        self.comments: list[str] = []
+        # Each variation replaces this move, starting from the position before it.
+        self.variations: list[list[PGNMove]] = []
+
+    def __repr__(self) -> str:
+        return f'PGNMove({self.san!r})'
+
+
+class PGNGame(object):
+    """One game of a PGN file: its tag pairs, the main line with everything attached to it and the result."""
+
+    __slots__ = ('tags', 'moves', 'comments', 'result')
+
+    def __init__(self, tags: dict[str, str], moves: list[PGNMove], comments: list[str], result: str):
+        self.tags: dict[str, str] = tags
+        self.moves: list[PGNMove] = moves
+        # Comments written before the first move.
+        self.comments: list[str] = comments
+        self.result: str = result
+
+    def mainline(self) -> list[str]:
+        """The moves of the main line in SAN."""
+        return [move.san for move in self.moves]
+
+    def start(self) -> Game:
+        """The game in its starting position, the one of the `FEN` tag when there is one."""
+        return Game.fromFEN(self.tags.get('FEN', START_FEN))
+
+    def replay(self) -> Game:
+        """Plays the main line from the starting position and returns the game after its last move."""
+        game = self.start()
+        for number, move in enumerate(self.moves):
+            code = game.san_to_code(move.san)
+            if code is None:
+                raise InvalidPGNStringException(f'Move {number + 1} ({move.san}) is not a move.')
+            game.push_code(code)
+        return game
+
+    def __repr__(self) -> str:
+        return f"PGNGame({self.tags.get('White', '?')} - {self.tags.get('Black', '?')}, {len(self.moves)} moves, {self.result})"
+
+
+def parse_movetext(text: str) -> tuple[list[PGNMove], list[str], str]:
+    """
+    Splits the move text of a game into its main line, the comments before its first move and its result.
+    Variations nest under the move they replace, comments and annotation glyphs go to the move they follow.
+    """
+
+    mainline: list[PGNMove] = []
+    leading: list[str] = []
+    result = '*'
+    # Lines being read, innermost last, each with the comments found before its first move.
+    lines: list[tuple[list[PGNMove], list[str]]] = [(mainline, leading)]
+    for token in TOKEN_PATTERN.finditer(text):
+        kind = token.lastgroup
+        moves, comments = lines[-1]
+        if kind == 'san':
+            moves.append(PGNMove(token.group()))
+        elif kind == 'comment' or kind == 'rest_comment':
+            comment = token.group()[1:].rstrip('}').strip()
+            (moves[-1].comments if moves else comments).append(comment)
+        elif kind == 'nag' or kind == 'suffix':
+            if moves:
+                moves[-1].nags.append(int(token.group()[1:]) if kind == 'nag' else SUFFIX_NAGS.get(token.group(), 0))
+        elif kind == 'open':
+            variation: list[PGNMove] = []
+            if moves:
+                moves[-1].variations.append(variation)
+            lines.append((variation, []))
+        elif kind == 'close':
+            if len(lines) > 1:
+                lines.pop()
+        elif kind == 'result' and len(lines) == 1:
+            result = token.group()
+    return mainline, leading, result
+
+def read_games(source: str | Iterable[str]) -> Generator[PGNGame, None, None]:
+    """
+    Yields the games of a PGN file one at a time, reading it line by line so that only the game being read is ever held in memory.
+
+    Parameters:
+    - `source`: Path of the file, or any iterable of its lines such as an open file.
+    """
+
+    if isinstance(source, str):
+        with open(source, encoding='utf-8', errors='replace') as file:
+            yield from read_games(file)
+        return
+
+    tags: dict[str, str] = {}
+    movetext: list[str] = []
+    # Braces left open by the move text so far, while a comment spans lines its text is not looked at.
+    open_comments = 0
+    for line in source:
+        if line.startswith('%'):
+            continue
+        stripped = line.strip()
+        if open_comments:
+            movetext.append(stripped)
+            open_comments += stripped.count('{') - stripped.count('}')
+            continue
+        if stripped.startswith('['):
+            if movetext:
+                yield PGNGame(tags, *parse_movetext('\n'.join(movetext)))
+                tags, movetext = {}, []
+            match = TAG_PATTERN.match(stripped)
+            if match is not None:
+                tags[match.group(1)] = match.group(2).replace('\\"', '"').replace('\\\\', '\\')
+        elif stripped:
+            movetext.append(stripped)
+            open_comments = max(0, stripped.count('{') - stripped.count('}'))
+        elif movetext and movetext[-1].split()[-1] in RESULTS:
+            # A blank line after a result ends the game, even when the next one has no tags.
+            yield PGNGame(tags, *parse_movetext('\n'.join(movetext)))
+            tags, movetext = {}, []
+    if tags or movetext:
+        yield PGNGame(tags, *parse_movetext('\n'.join(movetext)))
+
+def replay_games(source: str | Iterable[str], report_every: int = REPORT_EVERY) -> Generator[ReplayedGame, None, None]:
+    """
+    Yields every game of a PGN file with its main line played out, the `Game` being left after the last move.
+    Games with a move that cannot be played are logged and skipped. Throughput is logged every `report_every` games.
+    """
+
+    start = time.perf_counter()
+    games = skipped = 0
+    for record in read_games(source):
+        try:
+            game = record.replay()
+        except (InvalidPGNStringException, ValueError) as e:
+            skipped += 1
+            logger.warning(f"Skipping {record}: {e}")
+            continue
+        games += 1
+        if report_every and games % report_every == 0:
+            seconds = time.perf_counter() - start
+            logger.info(f"{games} games replayed, {skipped} skipped, {games / seconds:.1f} games/s")
+        yield ReplayedGame(record, game)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Read, and optionally replay, every game of a PGN file and report the throughput.")
+    parser.add_argument('path', help="PGN file to read")
+    parser.add_argument('--replay', action='store_true', help="play every main line through the engine")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level='INFO', format="{message}")
+
+    start = time.perf_counter()
+    games = moves = 0
+    for item in (replay_games(args.path) if args.replay else read_games(args.path)):
+        record = item.record if args.replay else item
+        games += 1
+        moves += len(record.moves)
+    seconds = time.perf_counter() - start
+    print(f"{games} games, {moves} moves in {seconds:.2f}s ({games / seconds if seconds > 0 else 0:.1f} games/s, {moves / seconds if seconds > 0 else 0:.0f} moves/s)")
@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, Callable, Optional
 from enum import Enum
 
 from itertools import product
@@ -7,77 +7,140 @@ from loguru import logger
 
 if TYPE_CHECKING:
     from engine.simul_game import Game
+    from engine.move import Move
 
+from engine.bitboard import PIECE_LETTERS, PIECE_SLOTS, SQUARE_INDICES, SQUARE_MASKS, ROOK_SLOT, Square, iter_bits, offset_square, square_rank
 from engine.consts import PieceSide, PieceType
 from engine.move_gen import MoveGenerator
 from engine.consts import MoveTypes
 
-from misc.utils import mini_chain, is_valid_square
+from misc.utils import mini_chain
 
 
+# Rook displacement of a castling move keyed by the square the king starts from.
+CASTLING_ROOK_MOVES: dict[MoveTypes, dict[int, tuple[int, int]]] = {
+    MoveTypes.KING_CASTLE: {SQUARE_INDICES['e1']: (SQUARE_INDICES['h1'], SQUARE_INDICES['f1']), SQUARE_INDICES['e8']: (SQUARE_INDICES['h8'], SQUARE_INDICES['f8'])},
+    MoveTypes.QUEEN_CASTLE: {SQUARE_INDICES['e1']: (SQUARE_INDICES['a1'], SQUARE_INDICES['d1']), SQUARE_INDICES['e8']: (SQUARE_INDICES['a8'], SQUARE_INDICES['d8'])},
+}
+# Squares whose king or rook leaving (or being captured) removes each right of the `KQkq` castling tuple.
+CASTLING_RIGHTS_SQUARES: tuple[tuple[int, int], ...] = tuple(tuple(SQUARE_INDICES[name] for name in pair) for pair in (('e1', 'h1'), ('e1', 'a1'), ('e8', 'h8'), ('e8', 'a8')))
+CASTLING_SQUARES: frozenset[int] = frozenset(index for pair in CASTLING_RIGHTS_SQUARES for index in pair)
+# Squares that must be empty between king and rook, and squares the king stands on or crosses, for each castling move.
+CASTLING_EMPTY: dict[tuple[MoveTypes, int], int] = {
+    (move_type, king): sum(SQUARE_MASKS[index] for index in range(min(king, rook) + 1, max(king, rook)))
+    for move_type, rooks in CASTLING_ROOK_MOVES.items() for king, (rook, _) in rooks.items()
+}
+CASTLING_TRANSIT: dict[tuple[MoveTypes, int], tuple[int, int, int]] = {
+    (move_type, king): (king, rook_end, 2 * rook_end - king)
+    for move_type, rooks in CASTLING_ROOK_MOVES.items() for king, (_, rook_end) in rooks.items()
+}
 
-def disable_castling(game: Game, start_pos: str, end_pos: str) -> None:
-    """Small function to disable the ability to castle if the rook or king has moved"""
-    offset: int = game.board[start_pos].side.value * -2
-    if start_pos[0] == 'a':
-        game.castling = game.castling[:4+offset] + (False,) + game.castling[5+offset:]
-    elif start_pos[0] == 'h':
-        game.castling = game.castling[:3+offset] + (False,) + game.castling[4+offset:]
-    else:
-        s_index = 2 + offset
-        game.castling = game.castling[:s_index+1] + (False, False) + game.castling[s_index+2:]
-
-def remove_pawn(game: Game, start_pos: str, end_pos: str):
-    """Removal of pawn after performing an en-passant"""
-    pawn_pos = end_pos[0] + str(int(end_pos[1]))
-    opp_pawn_piece = game.board[pawn_pos] 
-    game.materials[opp_pawn_piece.side.other().value].append(opp_pawn_piece)
-    game.board[pawn_pos] = Piece.empty()
-
+def specialize_king(move_gen: MoveGenerator, side: PieceSide) -> Callable[[Game, Square, Piece, bool], list[Move]]:
+    """Builds the move function of the king of one side: steps read from the compiled step table and the castling moves of that side only."""
+    from engine.move import Move
+
+    home: int = SQUARE_INDICES['e1' if side == PieceSide.LIGHT else 'e8']
+    rights: int = 0 if side == PieceSide.LIGHT else 2
+    rook_slot: int = side.value * 6 + ROOK_SLOT
+    enemy: int = side.other().value
+    castles = [
+        (move_type, rights + right, SQUARE_MASKS[CASTLING_ROOK_MOVES[move_type][home][0]], CASTLING_EMPTY[(move_type, home)], CASTLING_TRANSIT[(move_type, home)][2])
+        for right, move_type in enumerate((MoveTypes.KING_CASTLE, MoveTypes.QUEEN_CASTLE))
+    ]
+    targets: list[int] = king_step.targets
+
+    def generate(game: Game, start: Square, piece: Piece, proto: bool) -> list[Move]:
+        board = game.board
+        occupied = board.occupied
+        move_list = [Move(MoveTypes.MOVE, start, piece, index) for index in iter_bits(targets[start] & ~occupied)]
+        move_list.extend(Move(MoveTypes.CAPTURE, start, piece, index) for index in iter_bits(targets[start] & board.occupancy[enemy]))
+        if start == home:
+            for move_type, right, rook, empty, end in castles:
+                if game.castling[right] and board.bitboards[rook_slot] & rook and not occupied & empty:
+                    move_list.append(Move(move_type, start, piece, end))
+        return move_list if proto else [game.make_move(move) for move in move_list]
+
+    return generate
+
+def specialize_pawn(move_gen: MoveGenerator, side: PieceSide) -> Callable[[Game, Square, Piece, bool], list[Move]]:
+    """Builds the move function of the pawns of one side: pushes, double pushes, captures, promotions and en passant in a single pass."""
+    from engine.move import Move
+
+    forward: int = 8 if side == PieceSide.LIGHT else -8
+    double_rank: int = 1 if side == PieceSide.LIGHT else 6
+    last_rank: int = 6 if side == PieceSide.LIGHT else 1
+    enemy: int = side.other().value
+    captures: list[int] = pawn_captures[side].targets
+
+    def generate(game: Game, start: Square, piece: Piece, proto: bool) -> list[Move]:
+        board = game.board
+        occupied = board.occupied
+        single = start + forward
+        targets = captures[start] & board.occupancy[enemy]
+        move_list: list[Move] = []
+        if start >> 3 == last_rank:
+            for index in iter_bits(targets | (SQUARE_MASKS[single] & ~occupied)):
+                move_list.extend(Move(MoveTypes.PROMOTION, start, piece, index, promotion_piece=promotion) for promotion in PROMOTION_TYPES)
+        else:
+            if not occupied & SQUARE_MASKS[single]:
+                move_list.append(Move(MoveTypes.MOVE, start, piece, single))
+                if start >> 3 == double_rank and not occupied & SQUARE_MASKS[single + forward]:
+                    move_list.append(Move(MoveTypes.MOVE, start, piece, single + forward))
+            move_list.extend(Move(MoveTypes.CAPTURE, start, piece, index) for index in iter_bits(targets))
+            if game.en_passant is not None and captures[start] & SQUARE_MASKS[game.en_passant]:
+                move_list.append(Move(MoveTypes.EN_PASSANT, start, piece, game.en_passant))
+        return move_list if proto else [game.make_move(move) for move in move_list]
+
+    return generate
+
+king_step = MoveGenerator.vector_move(list(product(range(-1,2), range(-1,2))), 1)
 king = MoveGenerator.complex_move({
-    MoveGenerator.vector_move(list(product(range(-1,2), range(-1,2))), 1): lambda game, pos: True,
-    MoveGenerator.special_move((2,0), MoveTypes.KING_CASTLE, False, annex=disable_castling): lambda game, pos: (game.board[pos].side == PieceSide.LIGHT and game.castling[0]) or (game.board[pos].side == PieceSide.DARK and game.castling[2]),
-    MoveGenerator.special_move((-3,0), MoveTypes.QUEEN_CASTLE, False, annex=disable_castling): lambda game, pos: (game.board[pos].side == PieceSide.LIGHT and game.castling[1]) or (game.board[pos].side == PieceSide.DARK and game.castling[3])
-})
+    king_step: lambda game, pos: True,
+    MoveGenerator.special_move((2,0), MoveTypes.KING_CASTLE, False): lambda game, pos: (game.board[pos].side == PieceSide.LIGHT and game.castling[0]) or (game.board[pos].side == PieceSide.DARK and game.castling[2]),
+    MoveGenerator.special_move((-2,0), MoveTypes.QUEEN_CASTLE, False): lambda game, pos: (game.board[pos].side == PieceSide.LIGHT and game.castling[1]) or (game.board[pos].side == PieceSide.DARK and game.castling[3])
+}, specializer=specialize_king)
 queen = MoveGenerator.vector_move(list(product(range(-1,2), range(-1,2))), 8)
 # [(1, 0), (-1, 0), (0, 1), (0, -1)]
 rook = MoveGenerator.vector_move(mini_chain([[(x, 0), (0, x)] for x in (-1,1)]), 8)
 bishop = MoveGenerator.vector_move(mini_chain([[(x, x), (x, -x)] for x in (-1,1)]), 8)
 knight = MoveGenerator.jump_move(list(zip((-1,1,2,2,1,-1,-2,-2), (2,2,1,-1,-2,-2,-1,1))), True)
 
+pawn_captures = {
+    PieceSide.LIGHT: MoveGenerator.jump_move([(x,1) for x in (-1,1)], True, True),
+    PieceSide.DARK: MoveGenerator.jump_move([(x,-1) for x in (-1,1)], True, True),
+}
+
 pawn_move_dict = {
-    MoveGenerator.jump_move([(0,1)], False): lambda game, pos: game.board[pos].side == PieceSide.LIGHT and int(pos[1]) != 7,
-    MoveGenerator.jump_move([(0,-1)], False): lambda game, pos: game.board[pos].side == PieceSide.DARK and int(pos[1]) != 2,
-    MoveGenerator.special_move((0,1), MoveTypes.PROMOTION, False) : lambda game, pos: game.board[pos].side == PieceSide.LIGHT and int(pos[1]) == 7,
-    MoveGenerator.special_move((0,-1), MoveTypes.PROMOTION, False) : lambda game, pos: game.board[pos].side == PieceSide.DARK and int(pos[1]) == 2,
-    MoveGenerator.jump_move([(0,2)], False): lambda game, pos: game.board[pos].side == PieceSide.LIGHT and int(pos[1]) == 2,
-    MoveGenerator.jump_move([(0,-2)], False): lambda game, pos: game.board[pos].side == PieceSide.DARK and int(pos[1]) == 7,
+    MoveGenerator.jump_move([(0,1)], False): lambda game, pos: game.board[pos].side == PieceSide.LIGHT and square_rank(pos) != 6,
+    MoveGenerator.jump_move([(0,-1)], False): lambda game, pos: game.board[pos].side == PieceSide.DARK and square_rank(pos) != 1,
+    MoveGenerator.special_move((0,1), MoveTypes.PROMOTION, False) : lambda game, pos: game.board[pos].side == PieceSide.LIGHT and square_rank(pos) == 6,
+    MoveGenerator.special_move((0,-1), MoveTypes.PROMOTION, False) : lambda game, pos: game.board[pos].side == PieceSide.DARK and square_rank(pos) == 1,
+    MoveGenerator.jump_move([(0,2)], False): lambda game, pos: game.board[pos].side == PieceSide.LIGHT and square_rank(pos) == 1 and game.board[pos + 8].type is None,
+    MoveGenerator.jump_move([(0,-2)], False): lambda game, pos: game.board[pos].side == PieceSide.DARK and square_rank(pos) == 6 and game.board[pos - 8].type is None,
+    pawn_captures[PieceSide.LIGHT]: lambda game, pos: game.board[pos].side == PieceSide.LIGHT and square_rank(pos) != 6,
+    pawn_captures[PieceSide.DARK]: lambda game, pos: game.board[pos].side == PieceSide.DARK and square_rank(pos) != 1,
 }
-pawn_move_dict.update({
-    MoveGenerator.jump_move([(x,1)], True, True): lambda game, pos: game.board[pos].side == PieceSide.LIGHT for x in (-1,1)
-})
 
 pawn_move_dict.update ({
-    MoveGenerator.special_move((x,1), MoveTypes.PROMOTION, True, only_capture=True): lambda game, pos: game.board[pos].side == PieceSide.LIGHT and int(pos[1]) == 7 and game.board[chr(ord(pos[0])+x)+str(int(pos[1])+1)].side == PieceSide.DARK for x in (-1,1)
-})
-
-pawn_move_dict.update({
-    MoveGenerator.jump_move([(x,-1)], True, True): lambda game, pos: game.board[pos].side == PieceSide.DARK for x in (-1,1)
+    MoveGenerator.special_move((x,1), MoveTypes.PROMOTION, True, only_capture=True): lambda game, pos, x=x: game.board[pos].side == PieceSide.LIGHT and square_rank(pos) == 6 and offset_square(pos, x, 1) >= 0 for x in (-1,1)
 })
 
 pawn_move_dict.update ({
-    MoveGenerator.special_move((x,-1), MoveTypes.PROMOTION, True, only_capture=True): lambda game, pos: game.board[pos].side == PieceSide.DARK and int(pos[1]) == 2 and game.board[chr(ord(pos[0])+x)+str(int(pos[1])-1)].side == PieceSide.LIGHT for x in (-1,1)
+    MoveGenerator.special_move((x,-1), MoveTypes.PROMOTION, True, only_capture=True): lambda game, pos, x=x: game.board[pos].side == PieceSide.DARK and square_rank(pos) == 1 and offset_square(pos, x, -1) >= 0 for x in (-1,1)
 })
 
 pawn_move_dict.update({
-    MoveGenerator.special_move((x,1), MoveTypes.EN_PASSANT, True, annex=remove_pawn): lambda game, pos: game.board[pos].side == PieceSide.LIGHT for x in (-1,1)
+    MoveGenerator.special_move((x,1), MoveTypes.EN_PASSANT, True): lambda game, pos: game.board[pos].side == PieceSide.LIGHT for x in (-1,1)
 })
 
 pawn_move_dict.update({
-    MoveGenerator.special_move((x,-1), MoveTypes.EN_PASSANT, True, annex=remove_pawn): lambda game, pos: game.board[pos].side == PieceSide.DARK for x in (-1,1)
+    MoveGenerator.special_move((x,-1), MoveTypes.EN_PASSANT, True): lambda game, pos: game.board[pos].side == PieceSide.DARK for x in (-1,1)
 })
 
-pawn = MoveGenerator.complex_move(pawn_move_dict)
+pawn = MoveGenerator.complex_move(pawn_move_dict, specializer=specialize_pawn)
+
+for move_gen in (king, queen, rook, bishop, knight, pawn, *pawn_captures.values()):
+    move_gen.compile()
 
 class PieceTypes(Enum):
     """The different classe of pieces common to both sides"""
@@ -98,28 +161,55 @@ def letter2type(letter: str) -> Optional[PieceTypes]:
             if type.value.letter == actual:
                 return type
 
+PROMOTION_TYPES: tuple[PieceTypes, ...] = (PieceTypes.QUEEN, PieceTypes.BISHOP, PieceTypes.ROOK, PieceTypes.KNIGHT)
+
 class Piece:
+    """
+    What stands on a square: one of the six types for either side, or nothing.
+    There are only 13 of them and each is created once, `Piece(type, side)` hands back the shared instance, so pieces are compared with `is`.
+    They are immutable, and `slot` is the index of the bitboard holding the piece (-1 for an empty square).
+    """
+
+    __slots__ = ('type', 'side', 'slot')
+    _interned: dict[tuple[PieceTypes, PieceSide], Piece] = {}
+
+    def __new__(cls, piece_type: PieceTypes, piece_side: PieceSide) -> Piece:
+        try:
+            return cls._interned[(piece_type, piece_side)]
+        except KeyError:
+            raise ValueError(f"There is no {piece_side.name} {piece_type.name} piece") from None
+
+    @classmethod
+    def intern(cls, piece_type: PieceTypes, piece_side: PieceSide) -> Piece:
+        """Creates the shared instance of a piece. Only called while the module loads."""
+        piece = object.__new__(cls)
+        object.__setattr__(piece, 'type', piece_type.value)
+        object.__setattr__(piece, 'side', piece_side)
+        object.__setattr__(piece, 'slot', -1 if piece_type.value is None else PIECE_SLOTS[(piece_type.value.letter, piece_side)])
+        cls._interned[(piece_type, piece_side)] = piece
+        return piece
+
+    def __setattr__(self, name: str, value) -> None:
+        raise AttributeError("Pieces are immutable")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError("Pieces are immutable")
+
+    def __reduce__(self):
+        return Piece.from_slot, (self.slot,)
 
-    def __init__(self, piece_type: PieceTypes, piece_side: PieceSide):
-        self.type: PieceType = piece_type.value
-        self.side: PieceSide = piece_side
+    @staticmethod
+    def from_slot(slot: int) -> Piece:
+        """Returns the piece held by a bitboard, the empty piece for -1."""
+        return EMPTY_PIECE if slot < 0 else PIECES[slot]
 
     @staticmethod
     def empty():
-        return Piece(PieceTypes.EMPTY, PieceSide.EMPTY)
+        return EMPTY_PIECE
     
     @staticmethod
     def is_empty(piece: Piece | None):
-        return piece == None or (piece.type == PieceTypes.EMPTY and piece.side == PieceSide.EMPTY)
-    
-    def __eq__(self, other: Piece) -> bool:
-        if self.type is None or other.type is None: 
-            return (self.type == other.type and self.side == other.side)
-        else:
-            return (self.type.letter == other.type.letter and self.side == other.side)
-    
-    def __ne__(self, other: Piece) -> bool:
-        return not self.__eq__(other)
+        return piece is None or piece is EMPTY_PIECE
 
     def __str__(self) -> str:
         if self.side and self.type:
@@ -128,4 +218,8 @@ class Piece:
             return "EMPTY"
 
     def __repr__(self) -> str:
-        return self.__str__()
\ No newline at end of file
+        return self.__str__()
+
+EMPTY_PIECE: Piece = Piece.intern(PieceTypes.EMPTY, PieceSide.EMPTY)
+# Every other piece, indexed by the bitboard that holds it.
+PIECES: list[Piece] = [Piece.intern(letter2type(letter), side) for side in (PieceSide.DARK, PieceSide.LIGHT) for letter in PIECE_LETTERS]
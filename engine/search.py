@@ -0,0 +1,407 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+from collections import namedtuple
+import time
+
+from loguru import logger
+
+if TYPE_CHECKING:
+    from typing import Callable
+    from threading import Event
+    from engine.bitbase import Bitbases
+    from engine.book import PolyglotBook
+    from engine.simul_game import Game
+
+from engine.consts import BITBASE_DRAW, BITBASE_LOSS, BITBASE_PIECES, BITBASE_WIN, PieceSide
+from engine.eval import evaluate, mop_up
+from engine.move import Move
+from engine.ordering import MoveOrdering
+from engine.transposition import BOUND_EXACT, BOUND_LOWER, BOUND_UPPER, TranspositionTable
+
+# Scores are in centipawns from the point of view of the side to move. A mate found `n` plies from the root scores `MATE_SCORE - n`.
+MATE_SCORE: int = 100000
+# Score of a position the bitbases say is won, on top of its evaluation so that the search still makes progress towards the mate.
+KNOWN_WIN: int = 20000
+INFINITY: int = 1000000
+MAX_PLY: int = 64
+DEFAULT_DEPTH: int = 4
+# Most nodes searched between two looks at the clock and the stop flag. Under a time limit the clock is looked at
+# about every `CHECK_SECONDS` instead, as many nodes as the search has been getting through in that time.
+CHECK_EVERY: int = 256
+CHECK_SECONDS: float = 0.002
+
+# Time allocation from a clock, in seconds. Without a moves-to-go count the rest of the game is assumed to take this many moves.
+DEFAULT_MOVES_TO_GO: int = 30
+# Kept back from every budget for the time spent outside the search, sending the move or the clock ticking before it starts.
+MOVE_OVERHEAD: float = 0.05
+# A search may use this many times its share when an iteration runs long, but never more than this part of the clock.
+HARD_TIME_FACTOR: float = 4.0
+HARD_TIME_SHARE: float = 0.5
+# An iteration usually takes several times the one before it, so none is started once this part of the soft budget is gone.
+SOFT_TIME_RATIO: float = 0.5
+
+# Why a search stopped: it ran every iteration asked for, found a forced mate (or was checkmated), had no move without being in check,
+# or was cut short by a limit or the stop flag.
+STOP_DEPTH: str = 'depth'
+STOP_MATE: str = 'mate'
+STOP_STALEMATE: str = 'stalemate'
+STOP_NODES: str = 'nodes'
+STOP_TIME: str = 'time'
+STOP_FLAG: str = 'stop'
+# Not searched at all, the move came from the opening book.
+STOP_BOOK: str = 'book'
+
+SearchResult = namedtuple('SearchResult', ['move', 'score', 'depth', 'nodes', 'seconds', 'nps', 'pv', 'table', 'reason', 'budget'])
+# Progress of a search, handed to its listener after every completed iteration.
+SearchInfo = namedtuple('SearchInfo', ['depth', 'score', 'nodes', 'seconds', 'nps', 'pv'])
+
+
+class SearchStopped(Exception):
+    """Raised inside the tree walk when a node or time limit is reached."""
+    pass
+
+def is_mate_score(score: int) -> bool:
+    """Returns `True` if a score stands for a forced mate, for either side."""
+    return abs(score) >= MATE_SCORE - MAX_PLY
+
+def score_to_table(score: int, ply: int) -> int:
+    """Makes a mate score relative to the position it is stored for rather than to the root."""
+    if is_mate_score(score):
+        return score + ply if score > 0 else score - ply
+    return score
+
+def score_from_table(score: int, ply: int) -> int:
+    """Makes a stored mate score relative to the root again."""
+    if is_mate_score(score):
+        return score - ply if score > 0 else score + ply
+    return score
+
+def allocate_time(time_left: float, increment: float = 0.0, moves_to_go: int | None = None) -> tuple[float, float]:
+    """
+    Splits a clock into the time to spend on the next move, returned as a soft budget, after which no new iteration is started,
+    and a hard one, at which the search is stopped wherever it is.
+
+    Parameters:
+    - `time_left`: Seconds left on the clock of the side to move.
+    - `increment`: Seconds added to the clock after every move.
+    - `moves_to_go`: Moves left until the next time control, the clock has to last the whole game when not given.
+    """
+
+    usable = max(0.0, time_left - MOVE_OVERHEAD)
+    moves = moves_to_go if moves_to_go else DEFAULT_MOVES_TO_GO
+    soft = usable / moves + increment * 0.75
+    hard = min(soft * HARD_TIME_FACTOR, usable * HARD_TIME_SHARE if moves > 1 else usable)
+    return min(soft, hard), hard
+
+class Search(object):
+    """
+    Negamax alpha-beta search of a game, deepened one ply at a time until a limit is reached.
+    At the horizon a quiescence search plays out captures and promotions so that leaves are only scored once they are quiet.
+    The game is walked in place with `push_code`/`pop_code` and left as it was found.
+    """
+
+    def __init__(self, game: Game, max_nodes: int | None = None, movetime: float | None = None, table: TranspositionTable | None = None,
+                 soft_time: float | None = None, stop: Event | None = None, listener: Callable[[SearchInfo], None] | None = None,
+                 bitbases: Bitbases | None = None, ordering: MoveOrdering | None = None):
+        # Time limits count from here, setting up the table and the move ordering included.
+        self.start: float = time.perf_counter()
+        self.game: Game = game
+        self.table: TranspositionTable = TranspositionTable() if table is None else table
+        self.max_nodes: int | None = max_nodes
+        self.movetime: float | None = movetime
+        self.soft_time: float | None = soft_time
+        self.stop: Event | None = stop
+        self.listener: Callable[[SearchInfo], None] | None = listener
+        self.bitbases: Bitbases | None = bitbases if bitbases else None
+        self.reason: str = STOP_DEPTH
+        self.nodes: int = 0
+        # The first node looks at the limits, which sets how often to look after that.
+        self.next_check: int = 1
+        self.deadline: float | None = None
+        self.root_ply: int = len(game.moves)
+        self.pv: list[list[int]] = [[] for _ in range(MAX_PLY + 1)]
+        self.ordering: MoveOrdering = MoveOrdering(MAX_PLY) if ordering is None else ordering
+        # Depth, best move, score and principal variation of every iteration that completed, and whether a limit cut the last one short.
+        self.iterations: list[tuple[int, int, int, list[int]]] = []
+        self.stopped: bool = False
+
+    def evaluate(self) -> int:
+        """Static evaluation of the current position for the side to move, settled by the bitbases when they know it."""
+        score = evaluate(self.game)
+        # Counting the pieces is far cheaper than a probe, which only ever answers once few enough are left.
+        if self.bitbases is not None and self.game.board.occupied.bit_count() <= BITBASE_PIECES:
+            result = self.bitbases.probe(self.game)
+            if result == BITBASE_WIN:
+                return KNOWN_WIN + score + mop_up(self.game, self.game.side)
+            if result == BITBASE_LOSS:
+                return -KNOWN_WIN + score - mop_up(self.game, self.game.side.other())
+            if result == BITBASE_DRAW:
+                return 0
+        return score
+
+    def check_limits(self) -> None:
+        """Stops the search once it has used up its nodes or its time or it is asked to stop, otherwise sets when to look again."""
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            self.reason = STOP_NODES
+            raise SearchStopped()
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            self.reason = STOP_TIME
+            raise SearchStopped()
+        if self.stop is not None and self.stop.is_set():
+            self.reason = STOP_FLAG
+            raise SearchStopped()
+        interval = CHECK_EVERY
+        if self.deadline is not None:
+            elapsed = time.perf_counter() - self.start
+            if elapsed > 0:
+                interval = max(1, min(CHECK_EVERY, int(self.nodes / elapsed * CHECK_SECONDS)))
+        self.next_check = self.nodes + interval
+        if self.max_nodes is not None:
+            self.next_check = min(self.next_check, self.max_nodes)
+
+    def negamax(self, depth: int, alpha: int, beta: int, ply: int) -> int:
+        """
+        Returns the score of the current position searched `depth` plies deep, exact when it falls strictly between `alpha` and `beta`.
+        The best line found is left in `pv[ply]`.
+
+        Parameters:
+        - `depth`: Remaining plies to search.
+        - `alpha`: Score the side to move is already guaranteed.
+        - `beta`: Score the opponent is already guaranteed, anything at or above it is refuted.
+        - `ply`: Distance from the root.
+        """
+
+        if depth <= 0:
+            return self.quiescence(alpha, beta, ply)
+
+        game = self.game
+        self.nodes += 1
+        if self.nodes >= self.next_check:
+            self.check_limits()
+        self.pv[ply] = []
+
+        if game.half_moves >= 100 or game.key_counts[game.key] > 1:
+            return 0
+        if ply >= MAX_PLY:
+            return self.evaluate()
+        # Drawn endings are cut off at once. Won ones are still searched, only the search can find the mate.
+        if self.bitbases is not None and game.board.occupied.bit_count() <= BITBASE_PIECES and self.bitbases.probe(game) == BITBASE_DRAW:
+            return 0
+
+        key = game.key
+        entry = self.table.probe(key)
+        table_move = 0
+        if entry is not None:
+            table_move = entry.move
+            if entry.depth >= depth:
+                score = score_from_table(entry.score, ply)
+                if entry.bound == BOUND_EXACT or (entry.bound == BOUND_LOWER and score >= beta) or (entry.bound == BOUND_UPPER and score <= alpha):
+                    if table_move:
+                        self.pv[ply] = [table_move]
+                    return score
+
+        legality = game.legality()
+        original_alpha = alpha
+        best = -INFINITY
+        best_code = 0
+        for code in self.ordering.moves(game, ply, table_move, legality):
+            game.push_code(code)
+            score = -self.negamax(depth - 1, -beta, -alpha, ply + 1)
+            game.pop_code()
+            if score > best:
+                best = score
+                best_code = code
+                if score > alpha:
+                    alpha = score
+                    self.pv[ply] = [code] + self.pv[ply + 1]
+                    if alpha >= beta:
+                        self.ordering.cutoff(game, ply, code, depth)
+                        break
+        if not best_code:
+            return -MATE_SCORE + ply if legality[1] else 0
+
+        bound = BOUND_LOWER if best >= beta else BOUND_EXACT if best > original_alpha else BOUND_UPPER
+        self.table.store(key, depth, bound, score_to_table(best, ply), best_code)
+        return best
+
+    def quiescence(self, alpha: int, beta: int, ply: int) -> int:
+        """
+        Returns the score of the current position once the captures and promotions worth playing have been played out.
+        The side to move may stand pat on the static evaluation instead of capturing, except in check, where every evasion is searched.
+        Captures that static exchange evaluation says lose material are skipped.
+
+        Parameters:
+        - `alpha`: Score the side to move is already guaranteed.
+        - `beta`: Score the opponent is already guaranteed, anything at or above it is refuted.
+        - `ply`: Distance from the root.
+        """
+
+        game = self.game
+        self.nodes += 1
+        if self.nodes >= self.next_check:
+            self.check_limits()
+        self.pv[ply] = []
+
+        if ply >= MAX_PLY:
+            return self.evaluate()
+
+        legality = game.legality()
+        ordering = self.ordering
+        if legality[1]:
+            best = -INFINITY
+            codes = ordering.moves(game, ply, 0, legality)
+        else:
+            best = self.evaluate()
+            if best >= beta:
+                return best
+            alpha = max(alpha, best)
+            codes = (code for code in ordering.captures(game, ply, legality) if not ordering.is_losing(game, code))
+
+        for code in codes:
+            game.push_code(code)
+            score = -self.quiescence(-beta, -alpha, ply + 1)
+            game.pop_code()
+            if score > best:
+                best = score
+                if score > alpha:
+                    alpha = score
+                    self.pv[ply] = [code] + self.pv[ply + 1]
+                    if alpha >= beta:
+                        break
+        if best == -INFINITY:
+            return -MATE_SCORE + ply
+        return best
+
+    def search_root(self, depth: int, root_moves: list[int]) -> tuple[int, int]:
+        """
+        Searches every root move to `depth` plies and returns the best one with its score.
+        `root_moves` is reordered so that the best move is tried first at the next depth.
+        """
+
+        game = self.game
+        self.nodes += 1
+        alpha, beta = -INFINITY, INFINITY
+        best_code = root_moves[0]
+        for code in root_moves:
+            game.push_code(code)
+            score = -self.negamax(depth - 1, -beta, -alpha, 1)
+            game.pop_code()
+            if score > alpha:
+                alpha = score
+                best_code = code
+                self.pv[0] = [code] + self.pv[1]
+        root_moves.remove(best_code)
+        root_moves.insert(0, best_code)
+        self.table.store(game.key, depth, BOUND_EXACT, score_to_table(alpha, 0), best_code)
+        return best_code, alpha
+
+    def iterate(self, max_depth: int, root_moves: list[int] | None = None) -> SearchResult:
+        """
+        Runs iterative deepening up to `max_depth` plies or until a limit stops it.
+        The result is that of the deepest iteration that completed, or the best move so far when not even the first did.
+        No iteration is started past half the soft time budget.
+
+        Parameters:
+        - `max_depth`: Deepest iteration to run.
+        - `root_moves`: Packed legal moves to choose from, every legal move when not given.
+        """
+
+        game = self.game
+        self.deadline = None if self.movetime is None else self.start + self.movetime
+        self.table.new_search()
+        legality = game.legality()
+        root_moves = list(self.ordering.moves(game, 0, 0, legality)) if root_moves is None else list(root_moves)
+        if not root_moves:
+            self.reason = STOP_MATE if legality[1] else STOP_STALEMATE
+            return SearchResult(None, -MATE_SCORE if legality[1] else 0, 0, 0, 0.0, 0.0, [], self.table.stats(), self.reason, self.movetime)
+
+        best_code, best_score, best_pv, completed = root_moves[0], 0, [root_moves[0]], 0
+        for depth in range(1, max_depth + 1):
+            if depth > 1:
+                self.ordering.age()
+            try:
+                code, score = self.search_root(depth, root_moves)
+            except SearchStopped:
+                self.stopped = True
+                while len(game.moves) > self.root_ply:
+                    game.pop_code()
+                if completed == 0 and self.pv[0]:
+                    best_pv = list(self.pv[0])
+                    best_code = best_pv[0]
+                break
+            best_code, best_score, best_pv, completed = code, score, list(self.pv[0]), depth
+            self.iterations.append((depth, code, score, best_pv))
+            seconds = time.perf_counter() - self.start
+            line = self.line(best_pv)
+            logger.debug(f"depth {depth} score {score} nodes {self.nodes} nps {self.nodes / seconds if seconds > 0 else 0:.0f} table hits {self.table.hit_rate():.1%} pv {' '.join(line)}")
+            if self.listener is not None:
+                self.listener(SearchInfo(depth, score, self.nodes, seconds, self.nodes / seconds if seconds > 0 else 0.0, line))
+            if is_mate_score(score) and MATE_SCORE - abs(score) <= depth:
+                self.reason = STOP_MATE
+                break
+            if depth < max_depth:
+                if self.stop is not None and self.stop.is_set():
+                    self.reason = STOP_FLAG
+                    break
+                if self.soft_time is not None and seconds >= self.soft_time * SOFT_TIME_RATIO:
+                    self.reason = STOP_TIME
+                    break
+
+        seconds = time.perf_counter() - self.start
+        move = Move.unpack(best_code, game.board).bind(game)
+        logger.debug(f"stopped by {self.reason} after {seconds:.3f}s of {self.movetime if self.movetime is not None else 'unlimited'}, depth {completed} nodes {self.nodes}")
+        return SearchResult(move, best_score, completed, self.nodes, seconds, self.nodes / seconds if seconds > 0 else 0.0, self.line(best_pv), self.table.stats(), self.reason, self.movetime)
+
+    def line(self, codes: list[int]) -> list[str]:
+        """Writes a line of packed moves from the current position in coordinate notation."""
+        game = self.game
+        moves: list[str] = []
+        for code in codes:
+            moves.append(Move.unpack(code, game.board).uci())
+            game.push_code(code)
+        for _ in codes:
+            game.pop_code()
+        return moves
+
+
+def best_move(game: Game, depth: int | None = None, nodes: int | None = None, movetime: float | None = None, table: TranspositionTable | None = None,
+              wtime: float | None = None, btime: float | None = None, winc: float = 0.0, binc: float = 0.0, movestogo: int | None = None,
+              stop: Event | None = None, listener: Callable[[SearchInfo], None] | None = None, book: PolyglotBook | None = None,
+              bitbases: Bitbases | None = None, ordering: MoveOrdering | None = None) -> SearchResult:
+    """
+    Searches a game for the best move of the side to move. The game is left in the position it was given in.
+    Without any limit the search goes `DEFAULT_DEPTH` plies deep, with only node, time or clock limits or a stop flag it deepens until one is reached.
+    Returns the move (`None` when there is no legal move), its score, the depth completed, the nodes searched, the time taken,
+    the nodes per second, the principal variation in coordinate notation, the statistics of the transposition table,
+    what stopped the search (one of the `STOP_` constants) and the hard time budget it had, `None` when it had none.
+    A move from the book comes back with depth and nodes 0 and no table statistics when no table was given.
+
+    Parameters:
+    - `game`: The game to search.
+    - `depth`: Deepest iteration to run.
+    - `nodes`: Number of nodes after which the search stops.
+    - `movetime`: Seconds to spend on the move, the search is stopped when they are up.
+    - `table`: Transposition table to use and keep filling, pass the same one across moves of a game. A fresh one is made when not given.
+    - `wtime`, `btime`: Seconds left on the light and dark clocks, the budget of the side to move is set by `allocate_time`.
+    - `winc`, `binc`: Seconds added to the light and dark clocks after every move.
+    - `movestogo`: Moves left until the next time control.
+    - `stop`: Flag (a `threading.Event` or `multiprocessing.Event`) that stops the search once set, from another thread or process.
+    - `listener`: Called with the `SearchInfo` of every iteration as it completes, to show progress.
+    - `book`: Opening book looked in first, a book move is returned at once without searching.
+    - `bitbases`: Endgame bitbases probed in the search and the evaluation.
+    - `ordering`: Killers and history to use and keep, pass the same one across moves of a game and `clear` it for a new game. A fresh one is made when not given.
+    """
+
+    if book is not None:
+        move = book.choose(game)
+        if move is not None:
+            return SearchResult(move, 0, 0, 0, 0.0, 0.0, [move.uci()], None if table is None else table.stats(), STOP_BOOK, movetime)
+
+    soft_time = None
+    clock = wtime if game.side == PieceSide.LIGHT else btime
+    if clock is not None:
+        soft_time, hard_time = allocate_time(clock, winc if game.side == PieceSide.LIGHT else binc, movestogo)
+        movetime = hard_time if movetime is None else min(movetime, hard_time)
+    if depth is None:
+        depth = DEFAULT_DEPTH if nodes is None and movetime is None and stop is None else MAX_PLY
+    return Search(game, nodes, movetime, table, soft_time, stop, listener, bitbases, ordering).iterate(min(depth, MAX_PLY))
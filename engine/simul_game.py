@@ -1,9 +1,8 @@
 from __future__ import annotations
-from functools import partial
 from typing import TYPE_CHECKING, Generator, Optional
 from itertools import compress
+from array import array
 import re
-from copy import deepcopy
 
 from loguru import logger
 
@@ -11,27 +10,246 @@ if TYPE_CHECKING:
     pass
 
 from engine.consts import MoveKind, MoveTypes, PieceSide
+from engine.bitboard import PIECE_LETTERS, SQUARE_INDICES, SQUARE_MASKS, SQUARE_NAMES, FULL_BB, Square, offset_square, PAWN_SLOT, KNIGHT_SLOT, BISHOP_SLOT, ROOK_SLOT, QUEEN_SLOT, KING_SLOT, iter_bits, lsb
 from engine.board import Board
-from engine.piece import Piece, letter2type, PieceTypes
-from engine.move import Move
+from engine.zobrist import CASTLING_KEYS, PIECE_KEYS, SIDE_KEY, en_passant_key, zobrist_key
+from engine.piece import EMPTY_PIECE, CASTLING_EMPTY, CASTLING_ROOK_MOVES, CASTLING_RIGHTS_SQUARES, CASTLING_SQUARES, CASTLING_TRANSIT, PROMOTION_TYPES, Piece, letter2type, PieceTypes, bishop, king_step, knight, pawn_captures, queen, rook
+from engine.move import ALL_MOVES, QUIET_MOVES, TACTICAL_MOVES, CAPTURE_FLAG, EN_PASSANT_FLAG, FLAG_SHIFT, KING_CASTLE_FLAG, NULL_MOVE, PROMOTION_FLAG, QUEEN_CASTLE_FLAG, QUIET_FLAG, SQUARE_MASK, TO_SHIFT, Move, move_buffer
 from engine.exceptions import InvalidFENStringException, InvalidPGNStringException
 from engine.move_gen import MoveGenerator
+from engine.transposition import TranspositionTable
+from engine.eval import ENDGAME_TABLE, MIDGAME_TABLE, PHASE_TABLE, SEE_VALUES, evaluate, score_board
 
-from misc.utils import board_iterator, is_valid_square, sign
+FEN_PATTERN: re.Pattern[str] = re.compile(r'\s*^(((?:[rnbqkpRNBQKP1-8]+\/){7})[rnbqkpRNBQKP1-8]+)\s([b|w])\s(-|[KQkq]{1,4})\s(-|[a-h][1-8])\s(\d+\s\d+)$')
+# A move in SAN: castling, or an optional piece letter, the origin's file and rank when needed to tell pieces apart,
+# the destination and the promotion piece, then an optional check marker and annotation suffix.
+SAN_PATTERN: re.Pattern[str] = re.compile(r'^(?:(?P<castle>O-O(?:-O)?|0-0(?:-0)?)|(?P<piece>[NBRQK])?(?P<file>[a-h])?(?P<rank>[1-8])?(?P<capture>x)?(?P<square>[a-h][1-8])(?:=?(?P<promotion>[QBRN]))?)[+#]?[?!]*$')
+SAN_RESULTS: tuple[str, ...] = ('1-0', '0-1', '1/2-1/2', '*')
+# Promotion flag of each SAN promotion letter.
+PROMOTION_FLAGS: dict[str, int] = {piece_type.value.letter.upper(): PROMOTION_FLAG + index for index, piece_type in enumerate(PROMOTION_TYPES)}
+
+# Castling moves of each side, indexed by `PieceSide.value`: the right in the `KQkq` tuple, the flag, the king's home square,
+# the rook that must be there, the squares that must be empty, the squares the king crosses and the king's destination.
+CASTLES: list[list[tuple[int, int, int, int, int, tuple[int, int], int]]] = [
+    [
+        (rights + right, move_type.value, home, SQUARE_MASKS[CASTLING_ROOK_MOVES[move_type][home][0]], CASTLING_EMPTY[(move_type, home)], CASTLING_TRANSIT[(move_type, home)][1:], CASTLING_TRANSIT[(move_type, home)][2])
+        for right, move_type in enumerate((MoveTypes.KING_CASTLE, MoveTypes.QUEEN_CASTLE))
+    ]
+    for home, rights in ((SQUARE_INDICES['e8'], 2), (SQUARE_INDICES['e1'], 0))
+]
 
 class Game(object):
     """Holds all the data and the actions relating the progress of the game."""
 
-    def __init__(self, board: Board, side: PieceSide, castling: tuple[bool, bool, bool, bool], en_passant: str | None, half_moves: int, num_moves: int, moves: list[Move]):
+    def __init__(self, board: Board, side: PieceSide, castling: tuple[bool, bool, bool, bool], en_passant: Square | None, half_moves: int, num_moves: int, moves: list[Move]):
        self.board: Board = board
        self.side: PieceSide = side
        self.castling: tuple[bool, bool, bool, bool] = castling
-       self.en_passant: str | None = en_passant
+       self.en_passant: Square | None = en_passant
        self.half_moves: int = half_moves
        self.num_moves: int = num_moves
-       self.moves = moves
+       self.moves: array = array('H', (move.pack() for move in moves))
        self.materials: list[list[Piece]] = [[], []]
        self.winner: PieceSide = PieceSide.EMPTY
+       self.undo_stack: list[tuple] = []
+       self.buffers: list[array] = []
+       self.key: int = zobrist_key(self)
+       self.key_history: list[int] = [self.key]
+       self.key_counts: dict[int, int] = {self.key: 1}
+       self.midgame, self.endgame, self.phase = score_board(board)
+
+    def attackers_to(self, index: int, side: PieceSide, occupied: int | None = None) -> int:
+        """
+        Returns the bitboard of every piece of `side` attacking a square.
+
+        Parameters:
+        - `index`: The square being attacked.
+        - `side`: The side whose pieces are attacking.
+        - `occupied`: Occupancy that blocks sliding pieces, the board's own when not given.
+        """
+
+        bitboards = self.board.bitboards
+        base = side.value * 6
+        if occupied is None:
+            occupied = self.board.occupied
+        attackers = pawn_captures[side.other()].targets[index] & bitboards[base + PAWN_SLOT]
+        attackers |= knight.targets[index] & bitboards[base + KNIGHT_SLOT]
+        attackers |= king_step.targets[index] & bitboards[base + KING_SLOT]
+        queens = bitboards[base + QUEEN_SLOT]
+        rooks = bitboards[base + ROOK_SLOT] | queens
+        if rooks:
+            attackers |= rook.attacks(index, occupied) & rooks
+        bishops = bitboards[base + BISHOP_SLOT] | queens
+        if bishops:
+            attackers |= bishop.attacks(index, occupied) & bishops
+        return attackers
+
+    def in_check(self, side: PieceSide | None = None) -> bool:
+        """
+        Returns `True` if the king of `side` (the side to move by default) is attacked.
+        """
+
+        side = self.side if side is None else side
+        king = self.board.bitboards[side.value * 6 + KING_SLOT]
+        return bool(king) and bool(self.attackers_to(lsb(king), side.other()))
+
+    def legality(self, side: PieceSide | None = None) -> tuple[int, int, int, dict[int, int]]:
+        """
+        Finds, once per position, everything needed to tell legal moves of `side` apart from pseudo-legal ones.
+        Returns the king's square, the bitboard of pieces giving check, the squares a non-king move must land on to answer the check
+        and the pinned pieces mapped to the line they are allowed to move along.
+        """
+
+        side = self.side if side is None else side
+        board = self.board
+        enemy = side.other()
+        kings = board.bitboards[side.value * 6 + KING_SLOT]
+        if not kings:
+            return -1, 0, FULL_BB, {}
+        king = lsb(kings)
+        own = board.occupancy[side.value]
+        base = enemy.value * 6
+        checkers = 0
+        check_mask = 0
+        pins: dict[int, int] = {}
+
+        queens = board.bitboards[base + QUEEN_SLOT]
+        orthogonal_sliders = board.bitboards[base + ROOK_SLOT] | queens
+        diagonal_sliders = board.bitboards[base + BISHOP_SLOT] | queens
+        occupied = board.occupied
+        for (d_file, d_rank), rays, positive in zip(queen.directions, queen.rays, queen.ray_positive):
+            sliders = orthogonal_sliders if d_file == 0 or d_rank == 0 else diagonal_sliders
+            if not sliders:
+                continue
+            ray = rays[king]
+            blockers = ray & occupied
+            if not blockers:
+                continue
+            blocker = (blockers & -blockers).bit_length() - 1 if positive else blockers.bit_length() - 1
+            if sliders & SQUARE_MASKS[blocker]:
+                checkers |= SQUARE_MASKS[blocker]
+                check_mask |= ray & ~rays[blocker]
+            elif own & SQUARE_MASKS[blocker]:
+                blockers = rays[blocker] & occupied
+                if blockers:
+                    pinner = (blockers & -blockers).bit_length() - 1 if positive else blockers.bit_length() - 1
+                    if sliders & SQUARE_MASKS[pinner]:
+                        pins[blocker] = ray & ~rays[pinner]
+
+        leapers = self.attackers_to(king, enemy) & ~checkers & ~(board.bitboards[base + ROOK_SLOT] | board.bitboards[base + BISHOP_SLOT] | board.bitboards[base + QUEEN_SLOT])
+        checkers |= leapers
+        check_mask |= leapers
+
+        if not checkers:
+            check_mask = FULL_BB
+        elif checkers & (checkers - 1):
+            check_mask = 0
+        return king, checkers, check_mask, pins
+
+    def is_legal(self, move: Move, legality: tuple[int, int, int, dict[int, int]] | None = None) -> bool:
+        """
+        Returns `True` if a pseudo-legal move does not leave its own king attacked.
+
+        Parameters:
+        - `move`: The pseudo-legal move to test.
+        - `legality`: The result of `legality` for the position, computed when not given.
+        """
+
+        return self.is_legal_code(move.pack(), legality)
+
+    def is_legal_code(self, code: int, legality: tuple[int, int, int, dict[int, int]] | None = None) -> bool:
+        """
+        Returns `True` if a packed pseudo-legal move does not leave its own king attacked.
+
+        Parameters:
+        - `code`: The packed pseudo-legal move to test.
+        - `legality`: The result of `legality` for the side moving, computed when not given.
+        """
+
+        start: int = code & SQUARE_MASK
+        end: int = code >> TO_SHIFT & SQUARE_MASK
+        flag: int = code >> FLAG_SHIFT
+        side = self.board.pieces[start].side
+        if legality is None:
+            legality = self.legality(side)
+        king, checkers, check_mask, pins = legality
+        if king < 0:
+            return True
+        enemy = side.other()
+
+        if start == king:
+            if flag == KING_CASTLE_FLAG or flag == QUEEN_CASTLE_FLAG:
+                return not checkers and not any(self.attackers_to(index, enemy) for index in CASTLING_TRANSIT[(MoveTypes(flag), start)])
+            return not self.attackers_to(end, enemy, self.board.occupied & ~SQUARE_MASKS[start])
+
+        if flag == EN_PASSANT_FLAG:
+            captured = SQUARE_MASKS[(start & ~7) | (end & 7)]
+            occupied = (self.board.occupied & ~SQUARE_MASKS[start] & ~captured) | SQUARE_MASKS[end]
+            return not self.attackers_to(king, enemy, occupied) & ~captured
+
+        if not check_mask & SQUARE_MASKS[end]:
+            return False
+        pin = pins.get(start)
+        return pin is None or bool(pin & SQUARE_MASKS[end])
+
+    def is_pseudo_legal_code(self, code: int) -> bool:
+        """
+        Returns `True` if a packed move is one `generate_codes` could produce in this position before the king's safety is looked at:
+        a piece of the side to move, its flag matching what it does, and a destination it can reach.
+        Meant for moves that come from elsewhere (the transposition table, killers), which may belong to another position.
+
+        Parameters:
+        - `code`: The packed move to test.
+        """
+
+        board = self.board
+        bitboards = board.bitboards
+        start: int = code & SQUARE_MASK
+        end: int = code >> TO_SHIFT & SQUARE_MASK
+        flag: int = code >> FLAG_SHIFT
+        piece = board.pieces[start]
+        if piece.slot < 0 or piece.side != self.side or start == end:
+            return False
+        if QUEEN_CASTLE_FLAG < flag < PROMOTION_FLAG or flag >= PROMOTION_FLAG + len(PROMOTION_TYPES):
+            return False
+        us = self.side.value
+        base = us * 6
+        offset = piece.slot - base
+        end_mask = SQUARE_MASKS[end]
+        occupied = board.occupied
+        if board.occupancy[us] & end_mask:
+            return False
+        capture = bool(board.occupancy[self.side.other().value] & end_mask)
+
+        if flag == KING_CASTLE_FLAG or flag == QUEEN_CASTLE_FLAG:
+            return offset == KING_SLOT and any(
+                castle_flag == flag and self.castling[right] and start == home and end == castle_end and bitboards[base + ROOK_SLOT] & rook_mask and not occupied & empty
+                for right, castle_flag, home, rook_mask, empty, transit, castle_end in CASTLES[us]
+            )
+
+        if offset == PAWN_SLOT:
+            forward = 8 if self.side == PieceSide.LIGHT else -8
+            if flag == EN_PASSANT_FLAG:
+                return end == self.en_passant and bool(pawn_captures[self.side].targets[start] & end_mask)
+            if (flag >= PROMOTION_FLAG) != (end >> 3 == (7 if forward > 0 else 0)):
+                return False
+            if capture:
+                return (flag == CAPTURE_FLAG or flag >= PROMOTION_FLAG) and bool(pawn_captures[self.side].targets[start] & end_mask)
+            if flag != QUIET_FLAG and flag < PROMOTION_FLAG:
+                return False
+            if end == start + forward:
+                return True
+            return end == start + 2 * forward and start >> 3 == (1 if forward > 0 else 6) and not occupied & SQUARE_MASKS[start + forward]
+
+        if flag != (CAPTURE_FLAG if capture else QUIET_FLAG):
+            return False
+        if offset == KING_SLOT:
+            targets = king_step.targets[start]
+        elif offset == KNIGHT_SLOT:
+            targets = knight.targets[start]
+        else:
+            targets = (bishop if offset == BISHOP_SLOT else rook if offset == ROOK_SLOT else queen).attacks(start, occupied)
+        return bool(targets & end_mask)
 
     def can_reveal_check(self, move_given: Move) -> bool:
         """
@@ -41,26 +259,11 @@ class Game(object):
         - `move_given`: the move which is to be checked.
         """
 
-        game_copy: Game = deepcopy(self)
-        game_copy.perfom_move(move_given)
-        iter_obj: Generator[str, None, None] = board_iterator()
-        other_king = Piece(piece_type=PieceTypes.KING, piece_side=game_copy.side.other())
-        cur_pos: str = next(iter_obj)
+        self.push(move_given)
         try:
-            while True:
-                if game_copy.board[cur_pos].side == game_copy.side:
-                    move_list = list(filter(partial(lambda move, game: move.move_type == MoveTypes.CAPTURE, game=game_copy), game_copy.get_all_moves(cur_pos, proto=True, simulation_illegal=True)))
-                    if move_list:
-                        #[self.logger.debug(f"{move_temp} kills {game_copy.board[move_temp.end]} {other_king.side} {other_king.type}") for move_temp in move_list]
-                        king_kills = list(filter(partial(lambda move, game: game.board[move.end] == other_king, game=game_copy), move_list))
-                        if len(king_kills) > 0:
-                            #self.logger.debug("Illegal!")
-                            return True
-                        #else:
-                        #    self.logger.debug(f"I hereby confirm that none of {move_list} can kill the king")
-                cur_pos = next(iter_obj)
-        except StopIteration:
-            return False
+            return self.in_check(move_given.piece.side)
+        finally:
+            self.pop()
 
     def does_check(self, move: Move) -> bool:
         """
@@ -70,22 +273,11 @@ class Game(object):
         - `move`: The move to check.
         """
         
-        logger.debug(f"Checking if {move} checks")
-        game_copy: Game = deepcopy(self)
-        game_copy.perfom_move(move)
-        iter_obj: Generator[str, None, None] = board_iterator()
-        cur_pos: str = next(iter_obj)
+        self.push(move)
         try:
-            while True:
-                if game_copy.board[cur_pos].side == move.piece.side:
-                    all_moves = game_copy.get_all_moves(cur_pos, proto=True)
-                    move_list = list(filter(lambda move: move.move_type == MoveTypes.CAPTURE, all_moves))
-                    king_kills = list(filter(partial(lambda move, game: game.board[move.end] == Piece(PieceTypes.KING, move.piece.side.other()), game=game_copy), move_list))
-                    if len(king_kills) > 0:
-                        return True
-                cur_pos = next(iter_obj)
-        except StopIteration:
-            return False
+            return self.in_check(move.piece.side.other())
+        finally:
+            self.pop()
 
     def does_mate(self, move: Move):
         """
@@ -95,28 +287,25 @@ class Game(object):
         - `move`: The move to check.
         """
         
-        logger.debug(f"Only checking if {move} can mate")
-        if not self.does_check:
+        if not self.does_check(move):
             return False
-        game_copy: Game = deepcopy(self)
-        game_copy.perfom_move(move)
-        moves = game_copy.get_every_move()
-        logger.debug(moves)
-        return (len(moves) == 0)
+        self.push(move)
+        try:
+            return len(self.get_every_move(proto=True)) == 0
+        finally:
+            self.pop()
     
     def make_move(self, move: Move) -> Move:
         """
-        Formats and returns a non prototype move to include whether the move performs a check or a mate.
+        Formats and returns a non prototype move. The move is bound to the current position and works out whether it performs a check or a mate only when asked.
 
         Paramters:
         - `move`: The move to add information to.
         """
         
-        move.is_checking = self.does_check(move)
-        move.is_mating = self.does_mate(move)
-        return move
+        return move.bind(self)
 
-    def handle_vector_moves(self, move_gen: MoveGenerator, pos: str, piece: Piece, proto:bool=False) -> list[Move]:
+    def handle_vector_moves(self, move_gen: MoveGenerator, pos: Square, piece: Piece, proto:bool=False) -> list[Move]:
         """
         Generates all possible moves from a vector type move generator object.
         
@@ -129,21 +318,16 @@ class Game(object):
         
         move_list: list[Move] = []
         make_move = self.make_move if not proto else lambda x: x
-        for vector in move_gen.vectors:
-            c=1
-            cur_pos: str = chr(ord(pos[0]) + vector[0]) + str(int(pos[1]) + vector[1])
-            while is_valid_square(cur_pos) and self.board[cur_pos] == Piece.empty() and c <= move_gen.limit:
-                move = make_move(Move(MoveTypes.MOVE, pos, piece, cur_pos))
-                move_list.append(move)
-                cur_pos = chr(ord(cur_pos[0]) + vector[0]) + str(int(cur_pos[1]) + vector[1])
-                c+=1
-
-            if is_valid_square(cur_pos) and c<= move_gen.limit and piece.side.other() == self.board[cur_pos].side:
-                move_list.append(make_move(Move(MoveTypes.CAPTURE, pos, piece, cur_pos)))
+        occupied: int = self.board.occupied
+        attacks: int = move_gen.attacks(pos, occupied)
+        for index in iter_bits(attacks & ~occupied):
+            move_list.append(make_move(Move(MoveTypes.MOVE, pos, piece, index)))
+        for index in iter_bits(attacks & self.board.occupancy[piece.side.other().value]):
+            move_list.append(make_move(Move(MoveTypes.CAPTURE, pos, piece, index)))
 
         return move_list 
 
-    def handle_jump_moves(self, move_gen: MoveGenerator, pos: str, piece: Piece, proto:bool=False) -> list[Move]:
+    def handle_jump_moves(self, move_gen: MoveGenerator, pos: Square, piece: Piece, proto:bool=False) -> list[Move]:
         """
         Generates all possible moves from a jump type move generator object.
         
@@ -156,17 +340,17 @@ class Game(object):
 
         move_list: list[Move] = []
         make_move = self.make_move if not proto else lambda x: x
-        for offset in move_gen.offsets:
-            cur_pos: str = chr(ord(pos[0]) + offset[0]) + str(int(pos[1]) + offset[1])
-            if is_valid_square(cur_pos):
-                if self.board[cur_pos] == Piece.empty() and not move_gen.only_capture:
-                    move_list.append(make_move(Move(MoveTypes.MOVE, pos, piece, cur_pos)))
-                elif self.board[cur_pos].side == piece.side.other() and move_gen.can_capture:
-                    move_list.append(make_move(Move(MoveTypes.CAPTURE, pos, piece, cur_pos)))
+        targets: int = move_gen.targets[pos]
+        if not move_gen.only_capture:
+            for index in iter_bits(targets & ~self.board.occupied):
+                move_list.append(make_move(Move(MoveTypes.MOVE, pos, piece, index)))
+        if move_gen.can_capture:
+            for index in iter_bits(targets & self.board.occupancy[piece.side.other().value]):
+                move_list.append(make_move(Move(MoveTypes.CAPTURE, pos, piece, index)))
 
         return move_list
 
-    def handle_special_moves(self, move_gen: MoveGenerator, pos: str, piece: Piece, proto:bool=False) -> list[Move]:
+    def handle_special_moves(self, move_gen: MoveGenerator, pos: Square, piece: Piece, proto:bool=False) -> list[Move]:
         """
         Generates all possible moves from a special type move generator object.
         
@@ -177,24 +361,32 @@ class Game(object):
         - `proto`: A boolean value linked to whether this move is for simulation or for actual play.
         """
 
-        cur_pos: str = chr(ord(pos[0]) + move_gen.offset[0]) + str(int(pos[1]) + move_gen.offset[1])
+        cur_pos: Square = offset_square(pos, *move_gen.offset)
+        if cur_pos < 0:
+            return []
         make_move = self.make_move if not proto else lambda x: x
         match move_gen.move_type:
             case MoveTypes.PROMOTION:
-                if self.board[cur_pos] != Piece.empty():
-                    if self.board[cur_pos].side == piece.side.other() and move_gen.can_capture:
-                        return [make_move(Move(move_gen.move_type, pos, piece, cur_pos, promotion_piece=x)) for x in (PieceTypes.QUEEN, PieceTypes.BISHOP, PieceTypes.ROOK, PieceTypes.KNIGHT)]
+                if self.board.pieces[cur_pos] is not EMPTY_PIECE:
+                    if self.board.pieces[cur_pos].side == piece.side.other() and move_gen.can_capture:
+                        return [make_move(Move(move_gen.move_type, pos, piece, cur_pos, promotion_piece=x)) for x in PROMOTION_TYPES]
                 elif not move_gen.only_capture:
-                    return [make_move(Move(move_gen.move_type, pos, piece, cur_pos, promotion_piece=x)) for x in (PieceTypes.QUEEN, PieceTypes.BISHOP, PieceTypes.ROOK, PieceTypes.KNIGHT)]
+                    return [make_move(Move(move_gen.move_type, pos, piece, cur_pos, promotion_piece=x)) for x in PROMOTION_TYPES]
 
             case MoveTypes.EN_PASSANT:
                 if cur_pos == self.en_passant:
-                    return [make_move(Move(move_gen.move_type, pos, piece, cur_pos, annex=move_gen.annex))]
+                    return [make_move(Move(move_gen.move_type, pos, piece, cur_pos))]
+
+            case MoveTypes.KING_CASTLE | MoveTypes.QUEEN_CASTLE:
+                rook_move = CASTLING_ROOK_MOVES[move_gen.move_type].get(pos)
+                if rook_move is not None and self.board.bitboards[piece.side.value * 6 + ROOK_SLOT] & SQUARE_MASKS[rook_move[0]] and not self.board.occupied & CASTLING_EMPTY[(move_gen.move_type, pos)]:
+                    return [make_move(Move(move_gen.move_type, pos, piece, cur_pos))]
         return []
 
-    def handle_complex_moves(self, move_gen: MoveGenerator, pos: str, piece: Piece, proto:bool=False) -> list[Move]:
+    def handle_complex_moves(self, move_gen: MoveGenerator, pos: Square, piece: Piece, proto:bool=False) -> list[Move]:
         """
         Generates all possible moves from a complex type move generator object.
+        When the generator has a specialized function for the piece's side, it produces every move at once instead of evaluating each condition.
         
         Parameters:
         - `move_gen`: The vector_type move_generator.
@@ -203,6 +395,10 @@ class Game(object):
         - `proto`: A boolean value linked to whether this move is for simulation or for actual play.
         """
 
+        generate = move_gen.specialize(piece.side)
+        if generate is not None:
+            return generate(self, pos, piece, proto)
+
         move_list: list[Move] = []
         #self.logger.debug(pos)
         #self.logger.debug([x[1](self, pos) for x in move_gen.moves_conds.items()])
@@ -220,9 +416,10 @@ class Game(object):
 
         return move_list
 
-    def handle_move(self, move_gen: MoveGenerator, pos: str, piece: Piece, proto:bool=False) -> list[Move]:
+    def handle_move(self, move_gen: MoveGenerator, pos: Square, piece: Piece, proto:bool=False) -> list[Move]:
         """
         General purpose move generation from a move_generator. Use this when unsure of move generator kind.
+        Vector and jump generators are read from their per-square tables, compiled on first use if needed.
 
         Parameters:
         - `move_gen`: The move generator from which to generate moves from.
@@ -232,6 +429,8 @@ class Game(object):
         
         """
 
+        if not move_gen.compiled:
+            move_gen.compile()
         match move_gen.move_kind:
             case MoveKind.VECTOR:
                 move_list = self.handle_vector_moves(move_gen, pos, piece, proto)
@@ -243,90 +442,429 @@ class Game(object):
                 move_list = self.handle_special_moves(move_gen, pos, piece, proto)
         return move_list
 
-    def get_all_moves(self, pos: str, proto:bool=False, simulation_illegal: bool = False) -> list[Move]:
+    def get_all_moves(self, pos: Square | str, proto:bool=False, simulation_illegal: bool = False) -> list[Move]:
         """
         Get all possible moves for a piece in a game that may or may not be legal based on arguments passed.
 
         Parameters:
-        - `pos`: The position of the piece whose moves you want.
+        - `pos`: The position of the piece whose moves you want, as an index or in algebraic notation.
         - `proto`: Is it to be used in simulation?
         - `simulation_illegal`: Is it to be used for checking whether a move is illegal?
         """
         
-        piece: Piece = self.board[pos]
-        move_list = self.handle_move(piece.type.move_gen, pos, piece, proto)
+        pos = Board.index_of(pos)
+        piece: Piece = self.board.pieces[pos]
+        move_list = self.handle_move(piece.type.move_gen, pos, piece, proto=True)
 
         if not simulation_illegal:
-            move_list = list(filter(partial(lambda move, game: not game.can_reveal_check(move), game=self), move_list))
-        #move_list = list(filter(partial(lambda move, game: game.board[move.end].side != move.piece.side, game=self), move_list))
+            legality = self.legality(piece.side)
+            move_list = [move for move in move_list if self.is_legal(move, legality)]
+        if not proto:
+            move_list = [self.make_move(move) for move in move_list]
         return move_list
 
-    def get_every_move(self, proto: bool = False) -> list[Move]:
+    def generate_codes(self, buffer: array, legality: tuple[int, int, int, dict[int, int]] | None = None, kinds: int = ALL_MOVES) -> int:
+        """
+        Writes the packed legal moves of the side to move into a buffer and returns how many there are.
+        Checkers and pins are found once for the position, so every move is accepted or rejected without being played.
+
+        Parameters:
+        - `buffer`: Where the moves are written from the start, at least `MAX_MOVES` long (see `move_buffer`).
+        - `legality`: The result of `legality` for the position, computed when not given.
+        - `kinds`: `TACTICAL_MOVES` for captures and promotions, `QUIET_MOVES` for everything else, or both.
+        """
+
+        board = self.board
+        bitboards = board.bitboards
+        side = self.side
+        us = side.value
+        base = us * 6
+        enemy = side.other()
+        own = board.occupancy[us]
+        theirs = board.occupancy[enemy.value]
+        occupied = board.occupied
+        tactical = bool(kinds & TACTICAL_MOVES)
+        quiet = bool(kinds & QUIET_MOVES)
+        capture_mask = theirs if tactical else 0
+        quiet_mask = ~occupied if quiet else 0
+        if legality is None:
+            legality = self.legality()
+        king, checkers, check_mask, pins = legality
+        count = 0
+
+        if king >= 0:
+            without_king = occupied & ~SQUARE_MASKS[king]
+            targets = king_step.targets[king]
+            for index in iter_bits(targets & capture_mask):
+                if not self.attackers_to(index, enemy, without_king):
+                    buffer[count] = king | index << TO_SHIFT | CAPTURE_FLAG << FLAG_SHIFT
+                    count += 1
+            for index in iter_bits(targets & quiet_mask):
+                if not self.attackers_to(index, enemy, without_king):
+                    buffer[count] = king | index << TO_SHIFT
+                    count += 1
+            if checkers & (checkers - 1):
+                return count
+            if quiet and not checkers:
+                for right, flag, home, rook_mask, empty, transit, end in CASTLES[us]:
+                    if self.castling[right] and king == home and bitboards[base + ROOK_SLOT] & rook_mask and not occupied & empty:
+                        if not any(self.attackers_to(index, enemy) for index in transit):
+                            buffer[count] = king | end << TO_SHIFT | flag << FLAG_SHIFT
+                            count += 1
+
+        for slot, move_gen in ((KNIGHT_SLOT, knight), (BISHOP_SLOT, bishop), (ROOK_SLOT, rook), (QUEEN_SLOT, queen)):
+            for start in iter_bits(bitboards[base + slot]):
+                targets = move_gen.attacks(start, occupied) & check_mask
+                if start in pins:
+                    targets &= pins[start]
+                for index in iter_bits(targets & capture_mask):
+                    buffer[count] = start | index << TO_SHIFT | CAPTURE_FLAG << FLAG_SHIFT
+                    count += 1
+                for index in iter_bits(targets & quiet_mask):
+                    buffer[count] = start | index << TO_SHIFT
+                    count += 1
+
+        pawns = bitboards[base + PAWN_SLOT]
+        if pawns:
+            forward = 8 if side == PieceSide.LIGHT else -8
+            double_rank = 1 if side == PieceSide.LIGHT else 6
+            last_rank = 6 if side == PieceSide.LIGHT else 1
+            captures = pawn_captures[side].targets
+            en_passant = -1 if self.en_passant is None or not tactical else self.en_passant
+            for start in iter_bits(pawns):
+                allowed = check_mask & pins[start] if start in pins else check_mask
+                single = start + forward
+                pushes = SQUARE_MASKS[single] & ~occupied
+                if start >> 3 == last_rank:
+                    if tactical:
+                        for index in iter_bits((captures[start] & theirs | pushes) & allowed):
+                            code = start | index << TO_SHIFT
+                            for promotion in range(PROMOTION_FLAG, PROMOTION_FLAG + 4):
+                                buffer[count] = code | promotion << FLAG_SHIFT
+                                count += 1
+                    continue
+                if pushes and quiet:
+                    if allowed & pushes:
+                        buffer[count] = start | single << TO_SHIFT
+                        count += 1
+                    if start >> 3 == double_rank and allowed & ~occupied & SQUARE_MASKS[single + forward]:
+                        buffer[count] = start | (single + forward) << TO_SHIFT
+                        count += 1
+                for index in iter_bits(captures[start] & capture_mask & allowed):
+                    buffer[count] = start | index << TO_SHIFT | CAPTURE_FLAG << FLAG_SHIFT
+                    count += 1
+                if en_passant >= 0 and captures[start] & SQUARE_MASKS[en_passant]:
+                    code = start | en_passant << TO_SHIFT | EN_PASSANT_FLAG << FLAG_SHIFT
+                    if self.is_legal_code(code, legality):
+                        buffer[count] = code
+                        count += 1
+        return count
+
+    def get_every_move(self, proto: bool = False, table: TranspositionTable | None = None) -> list[Move]:
         """
         Gets all moves possible on the board that isn't illegal.
+        The moves are generated packed and only turned into `Move` objects here.
 
         Parameters:
         - `proto`: Is it to be used for simulation?
+        - `table`: A transposition table filled by a search, the best move it knows for the position is put first.
         """
         
-        move_list: list[Move] = []
-        iter_obj = board_iterator()
-        cur_pos = next(iter_obj)
-        logger.debug("Entering")
-        try:
-            while True:
-                if self.board[cur_pos].side == self.side:
-                    move_list.extend(self.get_all_moves(cur_pos, proto=True))
-                cur_pos = next(iter_obj)
-        except StopIteration:
-            logger.debug("Exiting")
-            return move_list            
+        buffer = move_buffer()
+        codes = buffer[:self.generate_codes(buffer)]
+        if table is not None:
+            entry = table.probe(self.key)
+            if entry is not None and entry.move in codes:
+                codes.remove(entry.move)
+                codes.insert(0, entry.move)
+        move_list = [Move.unpack(code, self.board) for code in codes]
+        if not proto:
+            for move in move_list:
+                move.bind(self)
+        return move_list
+
+    def evaluate(self) -> int:
+        """
+        Returns the static evaluation of the position in centipawns for the side to move, kept up to date by every move.
+        """
+
+        return evaluate(self)
+
+    def see(self, move: Move) -> int:
+        """
+        Returns the static exchange evaluation of a move: the material the moving side wins, in centipawns,
+        once both sides have recaptured on the destination square for as long as it pays them.
+        Negative for a capture that loses material, such as a queen taking a defended pawn.
+        """
+
+        return self.see_code(move.pack())
+
+    def see_code(self, code: int) -> int:
+        """
+        Static exchange evaluation of a packed move, see `see`.
+        Recaptures are taken from the attackers of the square, least valuable first, and pieces behind the ones that have
+        captured (x-rays) join in as the occupancy empties. Pins and promotions during the exchange are not looked at.
+        """
+
+        start: int = code & SQUARE_MASK
+        end: int = code >> TO_SHIFT & SQUARE_MASK
+        flag: int = code >> FLAG_SHIFT
+        board = self.board
+        bitboards = board.bitboards
+        piece = board.pieces[start]
+        side = piece.side
+        occupied = board.occupied & ~SQUARE_MASKS[start]
+
+        if flag == EN_PASSANT_FLAG:
+            gain = [SEE_VALUES[PAWN_SLOT]]
+            occupied &= ~SQUARE_MASKS[(start & ~7) | (end & 7)]
+        else:
+            captured = board.pieces[end]
+            gain = [SEE_VALUES[captured.slot % 6] if captured.slot >= 0 else 0]
+        on_square = SEE_VALUES[piece.slot % 6]
+        if flag >= PROMOTION_FLAG:
+            on_square = SEE_VALUES[PIECE_LETTERS.index(PROMOTION_TYPES[flag - PROMOTION_FLAG].value.letter)]
+            gain[0] += on_square - SEE_VALUES[PAWN_SLOT]
+
+        attackers = (self.attackers_to(end, PieceSide.LIGHT, occupied) | self.attackers_to(end, PieceSide.DARK, occupied)) & occupied
+        side = side.other()
+        while True:
+            own = attackers & board.occupancy[side.value]
+            if not own:
+                break
+            base = side.value * 6
+            for offset in range(6):
+                candidates = own & bitboards[base + offset]
+                if candidates:
+                    break
+            # Neither side can do better by taking, the exchange stops before this capture.
+            if max(-gain[-1], on_square - gain[-1]) < 0:
+                break
+            gain.append(on_square - gain[-1])
+            occupied &= ~(candidates & -candidates)
+            attackers = (self.attackers_to(end, PieceSide.LIGHT, occupied) | self.attackers_to(end, PieceSide.DARK, occupied)) & occupied
+            on_square = SEE_VALUES[offset]
+            side = side.other()
+
+        while len(gain) > 1:
+            last = gain.pop()
+            gain[-1] = -max(-gain[-1], last)
+        return gain[0]
+
+    def repetition_count(self) -> int:
+        """
+        Returns how many times the current position has occurred in the game, itself included.
+        """
+
+        return self.key_counts.get(self.key, 0)
+
+    def is_repetition(self, count: int = 3) -> bool:
+        """
+        Returns `True` if the current position has occurred at least `count` times, threefold repetition by default.
+        """
+
+        return self.key_counts.get(self.key, 0) >= count
+
+    def is_fifty_moves(self) -> bool:
+        """
+        Returns `True` once fifty moves per side have passed without a pawn move or a capture.
+        """
+
+        return self.half_moves >= 100
+
+    def move_buffer(self, ply: int) -> array:
+        """Returns the move buffer kept for a ply of a tree walk, allocating it on first use so that walks reuse them."""
+        while len(self.buffers) <= ply:
+            self.buffers.append(move_buffer())
+        return self.buffers[ply]
+
+    def perft(self, depth: int, ply: int = 0, table: TranspositionTable | None = None) -> int:
+        """
+        Counts the leaf nodes of the legal move tree down to `depth` plies, the standard check of a move generator.
+
+        Parameters:
+        - `depth`: Number of plies to expand.
+        - `ply`: Distance from the root of the walk, selects the move buffer to use.
+        - `table`: Transposition table remembering the count of every subtree, so that transpositions are counted once.
+        """
+
+        if depth <= 0:
+            return 1
+        if table is not None:
+            nodes = table.probe_nodes(self.key, depth)
+            if nodes is not None:
+                return nodes
+        buffer = self.move_buffer(ply)
+        count = self.generate_codes(buffer)
+        if depth == 1:
+            if table is not None:
+                table.store_nodes(self.key, depth, count)
+            return count
+        nodes = 0
+        for code in buffer[:count]:
+            self.push_code(code)
+            nodes += self.perft(depth - 1, ply + 1, table)
+            self.pop_code()
+        if table is not None:
+            table.store_nodes(self.key, depth, nodes)
+        return nodes
+
+    def divide(self, depth: int, table: TranspositionTable | None = None) -> dict[str, int]:
+        """
+        Splits the perft count of `depth` by root move, keyed by the move in coordinate notation.
+
+        Parameters:
+        - `depth`: Number of plies to expand, counting the root move.
+        - `table`: Transposition table to count with, see `perft`.
+        """
+
+        counts: dict[str, int] = {}
+        for move in self.get_every_move(proto=True):
+            self.push_code(move.pack())
+            counts[move.uci()] = self.perft(depth - 1, 1, table)
+            self.pop_code()
+        return counts
 
     def perfom_move(self, move: Move):
         """
         Simulate the movement of a piece according to the type of piece and type of move and store it's data.
+        The move is recorded on the undo stack so that it can be taken back with `pop`.
 
         Parameters:
         - `move`: The move that it should perform.
         """
         
-        logger.debug(f"Performing {move} for simulation")
-        match move.move_type:
-            case MoveTypes.MOVE | MoveTypes.EN_PASSANT:
-                self.board[move.start] = Piece.empty()
-                self.board[move.end] = move.piece
-            case MoveTypes.CAPTURE:
-                piece: Piece = self.board[move.end]
-                self.board[move.start] = Piece.empty()
-                self.board[move.end] = move.piece
-                self.materials[move.piece.side.value].append(piece)
-            case MoveTypes.KING_CASTLE | MoveTypes.QUEEN_CASTLE:
-                pos_rook_2_move: str = chr(ord(move.start[0]) + 3 - 7 * (move.move_type.value - MoveTypes.KING_CASTLE.value)) + move.start[1]
-                self.board[move.start] = Piece.empty()
-                self.board[move.end] = move.piece
-                rook: Piece = self.board[pos_rook_2_move]
-                self.board[pos_rook_2_move] = Piece.empty()
-                self.board[chr(ord(move.end[0]) + sign(ord('e') - ord(move.end[0])))+move.end[1]] = rook
-                self.castling = self.castling[ :3 - move.piece.side.value * 2 + (move.move_type.value - MoveTypes.KING_CASTLE.value)]+(False,) + self.castling[4 - move.piece.side.value * 2 + (move.move_type.value - MoveTypes.KING_CASTLE.value):]
-            case MoveTypes.PROMOTION:
-                self.board[move.start] = Piece.empty()
-                if not self.board[move.end] == Piece.empty():
-                    self.materials[move.piece.side.value].append(self.board[move.end])
-                self.board[move.end] = Piece(move.promotion_piece, move.piece.side)
-        
-        if move.piece.side == PieceSide.DARK:
-            self.num_moves += 1
-        
-        if move.piece.type == PieceTypes.PAWN:
-            self.half_moves = 0
-        else:
-            self.half_moves += 1
-        
-        if move.move_type != MoveTypes.GAME_OVER:
-            self.side = PieceSide((self.side.value + 1) % 2)
-        
-        if move.annex:
-            move.annex(self, move.start, move.end)
+        self.push(move)
+
+    def push(self, move: Move) -> None:
+        """
+        Applies a move in place, remembering everything needed to revert it with `pop`.
+
+        Parameters:
+        - `move`: The move to apply.
+        """
+
+        self.push_code(move.pack())
+
+    def push_code(self, code: int) -> None:
+        """
+        Applies a packed move in place, remembering everything needed to revert it with `pop_code`.
+
+        Parameters:
+        - `code`: The packed move to apply, see `engine.move.pack_move`.
+        """
+
+        board = self.board
+        start: int = code & SQUARE_MASK
+        end: int = code >> TO_SHIFT & SQUARE_MASK
+        flag: int = code >> FLAG_SHIFT
+        piece: Piece = board.pieces[start]
+        captured: Piece = EMPTY_PIECE
+        captured_at: int = end
+        undo = (code, piece, self.castling, self.en_passant, self.half_moves, self.num_moves, self.side, self.winner, self.key, self.midgame, self.endgame, self.phase)
+        key: int = self.key
+
+        if code != NULL_MOVE:
+            slot = piece.slot
+            board.remove_piece(start)
+            key ^= PIECE_KEYS[slot][start]
+            midgame = self.midgame - MIDGAME_TABLE[slot][start]
+            endgame = self.endgame - ENDGAME_TABLE[slot][start]
+            if flag >= PROMOTION_FLAG:
+                captured = board.remove_piece(end)
+                promoted = Piece(PROMOTION_TYPES[flag - PROMOTION_FLAG], piece.side)
+                board.put_piece(end, promoted)
+                key ^= PIECE_KEYS[promoted.slot][end]
+                midgame += MIDGAME_TABLE[promoted.slot][end]
+                endgame += ENDGAME_TABLE[promoted.slot][end]
+                self.phase += PHASE_TABLE[promoted.slot]
+            elif flag == EN_PASSANT_FLAG:
+                captured_at = (start & ~7) | (end & 7)
+                captured = board.remove_piece(captured_at)
+                board.put_piece(end, piece)
+                key ^= PIECE_KEYS[slot][end]
+                midgame += MIDGAME_TABLE[slot][end]
+                endgame += ENDGAME_TABLE[slot][end]
+            elif flag == KING_CASTLE_FLAG or flag == QUEEN_CASTLE_FLAG:
+                rook_start, rook_end = CASTLING_ROOK_MOVES[MoveTypes(flag)][start]
+                rook = board.remove_piece(rook_start)
+                board.put_piece(end, piece)
+                board.put_piece(rook_end, rook)
+                key ^= PIECE_KEYS[slot][end] ^ PIECE_KEYS[rook.slot][rook_start] ^ PIECE_KEYS[rook.slot][rook_end]
+                midgame += MIDGAME_TABLE[slot][end] + MIDGAME_TABLE[rook.slot][rook_end] - MIDGAME_TABLE[rook.slot][rook_start]
+                endgame += ENDGAME_TABLE[slot][end] + ENDGAME_TABLE[rook.slot][rook_end] - ENDGAME_TABLE[rook.slot][rook_start]
+            else:
+                captured = board.remove_piece(end)
+                board.put_piece(end, piece)
+                key ^= PIECE_KEYS[slot][end]
+                midgame += MIDGAME_TABLE[slot][end]
+                endgame += ENDGAME_TABLE[slot][end]
+
+            if captured is not EMPTY_PIECE:
+                self.materials[piece.side.value].append(captured)
+                key ^= PIECE_KEYS[captured.slot][captured_at]
+                midgame -= MIDGAME_TABLE[captured.slot][captured_at]
+                endgame -= ENDGAME_TABLE[captured.slot][captured_at]
+                self.phase -= PHASE_TABLE[captured.slot]
+            self.midgame = midgame
+            self.endgame = endgame
+
+            if any(self.castling) and (start in CASTLING_SQUARES or end in CASTLING_SQUARES):
+                key ^= CASTLING_KEYS[self.castling]
+                self.castling = tuple(right and start not in squares and end not in squares for right, squares in zip(self.castling, CASTLING_RIGHTS_SQUARES))
+                key ^= CASTLING_KEYS[self.castling]
+
+            is_pawn = slot % 6 == PAWN_SLOT
+            key ^= en_passant_key(self.en_passant)
+            self.en_passant = (start + end) // 2 if is_pawn and abs(end - start) == 16 else None
+            key ^= en_passant_key(self.en_passant) ^ SIDE_KEY
+
+            if is_pawn or captured is not EMPTY_PIECE:
+                self.half_moves = 0
+            else:
+                self.half_moves += 1
+
+            if piece.side == PieceSide.DARK:
+                self.num_moves += 1
+
+            self.side = self.side.other()
+
+        self.undo_stack.append(undo + (captured, captured_at))
+        self.moves.append(code)
+        self.key = key
+        self.key_history.append(key)
+        self.key_counts[key] = self.key_counts.get(key, 0) + 1
+
+    def pop(self) -> Move:
+        """
+        Reverts the last move applied with `push` or `perfom_move` and returns it.
+        """
+
+        return Move.unpack(self.pop_code(), self.board)
+
+    def pop_code(self) -> int:
+        """
+        Reverts the last move applied and returns its packed code.
+        """
+
+        code, piece, self.castling, self.en_passant, self.half_moves, self.num_moves, self.side, self.winner, self.key, self.midgame, self.endgame, self.phase, captured, captured_at = self.undo_stack.pop()
+        self.moves.pop()
+        self.key_counts[self.key_history.pop()] -= 1
+
+        if code != NULL_MOVE:
+            board = self.board
+            start: int = code & SQUARE_MASK
+            end: int = code >> TO_SHIFT & SQUARE_MASK
+            flag: int = code >> FLAG_SHIFT
+            board.remove_piece(end)
+            board.put_piece(start, piece)
+            if flag == KING_CASTLE_FLAG or flag == QUEEN_CASTLE_FLAG:
+                rook_start, rook_end = CASTLING_ROOK_MOVES[MoveTypes(flag)][start]
+                board.put_piece(rook_start, board.remove_piece(rook_end))
+            if captured is not EMPTY_PIECE:
+                board.put_piece(captured_at, captured)
+                self.materials[piece.side.value].pop()
+        return code
 
     @staticmethod
     def fromFEN(FEN: str) -> Game:
@@ -339,40 +877,27 @@ class Game(object):
         
         board: Board = Board.empty()
 
-        FENreg: re.Pattern[str] = re.compile(r'\s*^(((?:[rnbqkpRNBQKP1-8]+\/){7})[rnbqkpRNBQKP1-8]+)\s([b|w])\s([K|Q|k|q]{1,4})\s(-|[a-h][1-8])\s(\d+\s\d+)$')
-
-        if FENreg.match(FEN) is None:
+        if FEN_PATTERN.match(FEN) is None:
             raise InvalidFENStringException()
 
         parts: list[str] = FEN.split()
 
-        def next_pos(cur_pos = None) -> str:
-            if cur_pos is None:
-                return 'a8'
-            if int(cur_pos[1]) >= 1:
-                if cur_pos[0] == 'h':
-                    cur_pos = 'a' + str(int(cur_pos[1])-1)
-                else:
-                    cur_pos = chr(ord(cur_pos[0])+1) + cur_pos[1]
-            return cur_pos
-        
-        pos = None
-
+        # Ranks are listed from the eighth down, each from the a-file.
+        pos: Square = SQUARE_INDICES['a8']
         for letter in parts[0]:
-            if letter.isalpha():
-                pos = next_pos(pos)
-                board[pos] = Piece((PieceTypes)(letter2type(letter)), PieceSide(int(letter.isupper())))
-
+            if letter == '/':
+                pos -= 16
             elif letter.isdigit():
-                num = int(letter)
-                while num > 0:
-                    pos = next_pos(pos)
-                    num -= 1
+                pos += int(letter)
+            else:
+                if not 0 <= pos < 64:
+                    raise InvalidFENStringException()
+                board.put_piece(pos, Piece((PieceTypes)(letter2type(letter)), PieceSide(int(letter.isupper()))))
+                pos += 1
 
-        
         side = PieceSide(int(parts[1] == 'w'))
         castling = tuple(i in parts[2] for i in 'KQkq')
-        en_passant = None if parts[3] == "-" else parts[3]
+        en_passant = None if parts[3] == "-" else SQUARE_INDICES[parts[3]]
         half_moves = int(parts[4])
         moves = int(parts[5])
 
@@ -383,112 +908,119 @@ class Game(object):
         Converts the data of the game into FEN string to be used for storage.
         """
         
-        FEN = ""
-        empty_counter = 0
-        in_line = 0
-        
-        def mark_dirty():
-            nonlocal in_line, FEN
-            if in_line == 8:
-                FEN+="/"
-                in_line = 0
-
-        def next_pos(cur_pos = None) -> str:
-            if cur_pos is None:
-                return 'a8'
-            if int(cur_pos[1]) >= 1:
-                if cur_pos[0] == 'h':
-                    cur_pos = 'a' + str(int(cur_pos[1])-1)
-                else:
-                    cur_pos = chr(ord(cur_pos[0])+1) + cur_pos[1]
-            return cur_pos
-        
-        pos = next_pos()
-        while pos != next_pos(pos):
-            mark_dirty()
-            piece = self.board[pos]
-            if empty_counter == 8:
-                in_line += empty_counter
-                FEN += str(empty_counter)
-                empty_counter = 0
-                mark_dirty()
-            if piece == Piece.empty():
-                pos = next_pos(pos)
-                empty_counter += 1
-                continue
-            elif empty_counter > 0:
-                in_line += empty_counter
-                FEN += str(empty_counter)
-                empty_counter = 0
-                mark_dirty()
-            FEN += str(piece.type.letter if not piece.side.value else piece.type.letter.upper())
-            in_line += 1
-            pos = next_pos(pos)
+        rows: list[str] = []
+        for rank in range(7, -1, -1):
+            row = ""
+            empty_counter = 0
+            for piece in self.board.pieces[rank * 8:rank * 8 + 8]:
+                if piece is EMPTY_PIECE:
+                    empty_counter += 1
+                    continue
+                if empty_counter > 0:
+                    row += str(empty_counter)
+                    empty_counter = 0
+                row += piece.type.letter.upper() if piece.side.value else piece.type.letter
+            if empty_counter > 0:
+                row += str(empty_counter)
+            rows.append(row)
+        FEN = "/".join(rows)
         quasi_castle = ''.join(compress(list('KQkq'), self.castling))
-        FEN += f" {'w' if self.side.value else 'b' } {quasi_castle if quasi_castle else '-'} {self.en_passant if self.en_passant else '-'} {self.half_moves} {self.num_moves}"
+        FEN += f" {'w' if self.side.value else 'b' } {quasi_castle if quasi_castle else '-'} {'-' if self.en_passant is None else SQUARE_NAMES[self.en_passant]} {self.half_moves} {self.num_moves}"
         return FEN
 
     def PGN2Move(self: Game, PGN: str) -> Optional[Move]:
         """
         Convert a PGN to a form of data usable by the game object.
-        """ 
-        
-        norm_move: re.Pattern[str] = re.compile(r'(?P<Piece>[RNBKQ])?(?P<File>[a-h])?(?P<Rank>[1-8])?(?P<Capture>[x])?(?P<Position>[a-h][1-8])(?P<KingDanger>[+#])?') 
-        score_end: re.Pattern[str] = re.compile(r'(?P<White>[0-1])-(?P<Black>[0-1])')
+        Returns `None` for a result token (`1-0`, `0-1`, `1/2-1/2`, `*`), raises `InvalidPGNStringException` when the move cannot be played.
+        """
+
+        code = self.san_to_code(PGN)
+        return None if code is None else Move.unpack(code, self.board)
 
-        finding: re.Match | None = norm_move.match(PGN)
+    def san_to_code(self, PGN: str) -> int | None:
+        """
+        Resolves a move in SAN to the packed legal move it stands for, `None` for a result token.
+        The moving piece is found by looking back from the destination square along the ways a piece of that type reaches it,
+        so only the few pieces that could make the move have their legality checked.
+
+        Parameters:
+        - `PGN`: The move, e.g. `Nbd7`, `exd6`, `e8=Q+` or `O-O-O#`, annotation suffixes (`!`, `?!`...) allowed.
+        """
+
+        finding = SAN_PATTERN.match(PGN.strip())
         if finding is None:
-            if PGN =='O-O':
-                match self.side:
-                    case PieceSide.LIGHT:
-                        return Move(MoveTypes.KING_CASTLE, 'e1', Piece(PieceTypes.KING, PieceSide.LIGHT), 'g1')
-                    case PieceSide.DARK:
-                        return Move(MoveTypes.KING_CASTLE, 'e8', Piece(PieceTypes.KING, PieceSide.DARK), 'g8')
-            elif PGN == 'O-O-O':
-                match self.side:
-                    case PieceSide.LIGHT:
-                        return Move(MoveTypes.QUEEN_CASTLE, 'e1', Piece(PieceTypes.KING, PieceSide.LIGHT), 'b1')
-                    case PieceSide.DARK:
-                        return Move(MoveTypes.QUEEN_CASTLE, 'e8', Piece(PieceTypes.KING, PieceSide.DARK), 'b8')
-            elif score_end.match(PGN):
+            if PGN.strip() in SAN_RESULTS:
                 return None
+            raise InvalidPGNStringException('Unknown format.')
+
+        board = self.board
+        bitboards = board.bitboards
+        us = self.side.value
+        base = us * 6
+        legality = self.legality()
+
+        if finding['castle']:
+            flag = QUEEN_CASTLE_FLAG if finding['castle'].count('-') == 2 else KING_CASTLE_FLAG
+            for right, castle_flag, home, rook_mask, empty, transit, end in CASTLES[us]:
+                if castle_flag == flag and self.castling[right] and bitboards[base + KING_SLOT] & SQUARE_MASKS[home] and bitboards[base + ROOK_SLOT] & rook_mask and not board.occupied & empty:
+                    code = home | end << TO_SHIFT | flag << FLAG_SHIFT
+                    if self.is_legal_code(code, legality):
+                        return code
+            raise InvalidPGNStringException('Illegal move.')
+
+        end = SQUARE_INDICES[finding['square']]
+        if board.occupancy[us] & SQUARE_MASKS[end]:
+            raise InvalidPGNStringException('Illegal move.')
+        target = board.pieces[end]
+        letter = finding['piece']
+        promotion = finding['promotion']
+        if letter is None:
+            pawns = bitboards[base + PAWN_SLOT]
+            forward = 8 if self.side == PieceSide.LIGHT else -8
+            if finding['capture'] or (finding['file'] is not None and 'abcdefgh'.index(finding['file']) != end & 7):
+                if target.slot >= 0:
+                    flag = CAPTURE_FLAG
+                elif end == self.en_passant:
+                    flag = EN_PASSANT_FLAG
+                else:
+                    raise InvalidPGNStringException('Illegal move.')
+                candidates = pawn_captures[self.side.other()].targets[end] & pawns
             else:
-                raise InvalidPGNStringException('Unknown format.')
+                if target.slot >= 0:
+                    raise InvalidPGNStringException('Illegal move.')
+                flag = QUIET_FLAG
+                single = end - forward
+                candidates = pawns & SQUARE_MASKS[single] if 0 <= single < 64 else 0
+                if not candidates and 0 <= single - forward < 64 and end >> 3 == (3 if forward > 0 else 4) and not board.occupied & SQUARE_MASKS[single]:
+                    candidates = pawns & SQUARE_MASKS[single - forward]
+            if end >> 3 == (7 if forward > 0 else 0):
+                if promotion is None:
+                    raise InvalidPGNStringException('Missing promotion piece.')
+                flag = PROMOTION_FLAGS[promotion]
+            elif promotion is not None:
+                raise InvalidPGNStringException('Illegal move.')
         else:
-            move_dict = finding.groupdict()
-            if move_dict['Piece']:
-                piece = (PieceTypes)(letter2type(move_dict['Piece']))
+            if promotion is not None:
+                raise InvalidPGNStringException('Illegal move.')
+            slot = PIECE_LETTERS.index(letter.lower())
+            flag = CAPTURE_FLAG if target.slot >= 0 else QUIET_FLAG
+            if slot == KNIGHT_SLOT:
+                reach = knight.targets[end]
+            elif slot == KING_SLOT:
+                reach = king_step.targets[end]
             else:
-                piece = PieceTypes.PAWN
-
-            logger.debug(piece)
-
-            pos = move_dict['Position']
-
-            pos_gen = board_iterator()
-            cur_pos = next(pos_gen)
-            possible_pieces = []
-            try:
-                while True:
-                    if self.board[cur_pos] == Piece(piece, self.side):
-                        move_list = self.get_all_moves(cur_pos)
-                        if pos in map(lambda x: x.end, move_list):
-                            possible_pieces.append(cur_pos)
-                    cur_pos = next(pos_gen)
-            except StopIteration:
-                if len(possible_pieces) == 0:
-                    raise InvalidPGNStringException('Invalid move.')
-                elif len(possible_pieces) == 1:
-                    return Move(MoveTypes.CAPTURE if move_dict['Capture'] else MoveTypes.MOVE, possible_pieces[0], Piece(piece, self.side), pos)
-                elif len(possible_pieces) > 1:
-                    m_poss_pieces = []
-                    to_scan = ''.join([move_dict[x] if move_dict[x] else '' for x in ('File', 'Rank')])
-                    for place in possible_pieces:
-                        if to_scan in place:
-                            m_poss_pieces.append(place)
-
-                    if len(m_poss_pieces) > 1 or len(m_poss_pieces) == 0:
-                        raise InvalidPGNStringException('Not enough information')
-                    
-                    start ,= m_poss_pieces
-                    return Move(MoveTypes.CAPTURE if move_dict['Capture'] else MoveTypes.MOVE, start, Piece(piece, self.side), pos)
\ No newline at end of file
+                # Sliding moves are symmetric: whatever the destination sees along the piece's lines can move to it.
+                reach = (bishop if slot == BISHOP_SLOT else rook if slot == ROOK_SLOT else queen).attacks(end, board.occupied)
+            candidates = reach & bitboards[base + slot]
+
+        file = -1 if finding['file'] is None else 'abcdefgh'.index(finding['file'])
+        rank = -1 if finding['rank'] is None else int(finding['rank']) - 1
+        codes = [
+            start | end << TO_SHIFT | flag << FLAG_SHIFT for start in iter_bits(candidates)
+            if file in (-1, start & 7) and rank in (-1, start >> 3) and self.is_legal_code(start | end << TO_SHIFT | flag << FLAG_SHIFT, legality)
+        ]
+        if not codes:
+            raise InvalidPGNStringException('Illegal move.')
+        if len(codes) > 1:
+            raise InvalidPGNStringException('Not enough information')
+        return codes[0]
@@ -0,0 +1,291 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+from collections import namedtuple
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from array import array
+
+if TYPE_CHECKING:
+    pass
+
+# Every entry is two 64-bit words: the position key and its data. The data packs, from the low bits up,
+# the best move (16 bits), the score offset by 2**31 (32 bits), the depth (8 bits), the bound (2 bits) and the generation (6 bits).
+# Entries that count nodes instead (hashed perft) keep the count in the low 48 bits.
+ENTRY_BYTES: int = 16
+BUCKET_SIZE: int = 2
+MOVE_MASK: int = 0xFFFF
+SCORE_SHIFT: int = 16
+SCORE_OFFSET: int = 1 << 31
+SCORE_MASK: int = (1 << 32) - 1
+PAYLOAD_MASK: int = (1 << 48) - 1
+DEPTH_SHIFT: int = 48
+DEPTH_MASK: int = 0xFF
+BOUND_SHIFT: int = 56
+GENERATION_SHIFT: int = 58
+GENERATIONS: int = 64
+
+# An empty entry has no bound.
+BOUND_NONE: int = 0
+BOUND_EXACT: int = 1
+BOUND_LOWER: int = 2
+BOUND_UPPER: int = 3
+
+DEFAULT_MEGABYTES: int = 16
+# Buckets looked at to estimate how full the table is.
+FILL_SAMPLE: int = 1000
+
+# A shared table starts with two header words, the generation and the number of buckets, followed by the keys then the data.
+HEADER_WORDS: int = 2
+
+TTEntry = namedtuple('TTEntry', ['move', 'score', 'depth', 'bound'])
+TTStats = namedtuple('TTStats', ['entries', 'probes', 'hits', 'hit_rate', 'stores', 'fill'])
+
+
+def bucket_count(megabytes: float) -> int:
+    """Number of buckets that fit in `megabytes`, rounded down to a power of two so that a key finds its bucket with a mask."""
+    buckets = max(1, int(megabytes * 1024 * 1024) // (ENTRY_BYTES * BUCKET_SIZE))
+    return 1 << (buckets.bit_length() - 1)
+
+def attach_memory(name: str) -> SharedMemory:
+    """
+    Opens an existing shared memory block without handing it to this process's resource tracker.
+    Tracked blocks are unlinked when the process that opened them exits, which would pull the table from under every other process.
+    """
+
+    try:
+        return SharedMemory(name, track=False)
+    except TypeError:
+        # Before Python 3.13 there is no way to opt out, registration is skipped for the duration of the call instead.
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return SharedMemory(name)
+        finally:
+            resource_tracker.register = register
+
+
+class TranspositionTable(object):
+    """
+    Fixed size table of searched positions keyed by their Zobrist key.
+    Buckets hold two entries: the first is only replaced by a search at least as deep or by an entry from an older search,
+    the second takes whatever the first refuses. `new_search` starts a generation, which ages everything stored before it.
+    """
+
+    def __init__(self, megabytes: float = DEFAULT_MEGABYTES):
+        buckets = bucket_count(megabytes)
+        self.mask: int = buckets - 1
+        self.keys: array = array('Q', bytes(8 * BUCKET_SIZE * buckets))
+        self.data: array = array('Q', bytes(8 * BUCKET_SIZE * buckets))
+        self.generation: int = 0
+        self.probes: int = 0
+        self.hits: int = 0
+        self.stores: int = 0
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def clear(self) -> None:
+        """Empties the table and resets its statistics."""
+        size = len(self.keys)
+        self.keys = array('Q', bytes(8 * size))
+        self.data = array('Q', bytes(8 * size))
+        self.generation = 0
+        self.probes = self.hits = self.stores = 0
+
+    def new_search(self) -> None:
+        """Starts a new generation, entries stored before it become the first to be replaced."""
+        self.generation = (self.generation + 1) % GENERATIONS
+
+    def index(self, key: int) -> int:
+        """Index of the first entry of the bucket a key belongs to."""
+        return (key & self.mask) * BUCKET_SIZE
+
+    def probe_data(self, key: int) -> int:
+        """Returns the raw data stored for a key, 0 when it is not in the table."""
+        self.probes += 1
+        index = self.index(key)
+        keys = self.keys
+        for slot in range(index, index + BUCKET_SIZE):
+            if keys[slot] == key:
+                data = self.data[slot]
+                if data:
+                    self.hits += 1
+                    return data
+        return 0
+
+    def store_data(self, key: int, depth: int, data: int) -> None:
+        """
+        Stores raw data for a key, following the replacement policy of the table.
+
+        Parameters:
+        - `key`: Zobrist key of the position.
+        - `depth`: Depth the data is worth, used to pick the entry to replace.
+        - `data`: The packed entry, generation excluded.
+        """
+
+        self.stores += 1
+        index = self.index(key)
+        keys = self.keys
+        entries = self.data
+        data |= self.generation << GENERATION_SHIFT
+        preferred = entries[index]
+        if keys[index] == key or not preferred or preferred >> GENERATION_SHIFT != self.generation or depth >= preferred >> DEPTH_SHIFT & DEPTH_MASK:
+            keys[index] = key
+            entries[index] = data
+        else:
+            keys[index + 1] = key
+            entries[index + 1] = data
+
+    def probe(self, key: int) -> TTEntry | None:
+        """Returns the move, score, depth and bound stored for a position, `None` when it is not in the table."""
+        data = self.probe_data(key)
+        if not data:
+            return None
+        return TTEntry(data & MOVE_MASK, (data >> SCORE_SHIFT & SCORE_MASK) - SCORE_OFFSET, data >> DEPTH_SHIFT & DEPTH_MASK, data >> BOUND_SHIFT & 3)
+
+    def store(self, key: int, depth: int, bound: int, score: int, move: int) -> None:
+        """
+        Stores the result of searching a position.
+
+        Parameters:
+        - `key`: Zobrist key of the position.
+        - `depth`: Remaining depth the position was searched to.
+        - `bound`: Whether `score` is exact, a lower bound or an upper bound.
+        - `score`: The score found.
+        - `move`: Packed best move, 0 when there is none.
+        """
+
+        self.store_data(key, depth, move | (score + SCORE_OFFSET) << SCORE_SHIFT | min(depth, DEPTH_MASK) << DEPTH_SHIFT | bound << BOUND_SHIFT)
+
+    def probe_nodes(self, key: int, depth: int) -> int | None:
+        """Returns the perft count stored for a position at a depth, `None` when there is none."""
+        data = self.probe_data(key ^ depth)
+        if not data or data >> DEPTH_SHIFT & DEPTH_MASK != depth:
+            return None
+        return data & PAYLOAD_MASK
+
+    def store_nodes(self, key: int, depth: int, nodes: int) -> None:
+        """Stores the perft count of a position at a depth."""
+        self.store_data(key ^ depth, depth, nodes & PAYLOAD_MASK | depth << DEPTH_SHIFT | BOUND_EXACT << BOUND_SHIFT)
+
+    def hit_rate(self) -> float:
+        """Share of probes that found their position."""
+        return self.hits / self.probes if self.probes else 0.0
+
+    def fill(self) -> float:
+        """Estimated share of the table used by the current search, from the first buckets."""
+        sample = min(FILL_SAMPLE, self.mask + 1) * BUCKET_SIZE
+        used = sum(1 for data in self.data[:sample] if data and data >> GENERATION_SHIFT == self.generation)
+        return used / sample
+
+    def stats(self) -> TTStats:
+        """Returns the size of the table in entries, its probe, hit and store counts, the hit rate and the fill estimate."""
+        return TTStats(len(self.keys), self.probes, self.hits, self.hit_rate(), self.stores, self.fill())
+
+
+class SharedTranspositionTable(TranspositionTable):
+    """
+    Transposition table held in a `multiprocessing.shared_memory` block, which any process on the host can attach to by name.
+    Entries are written without locks: the key word holds the key XORed with the data, so an entry torn by two processes writing
+    at once no longer matches its key and reads as a miss instead of handing back another position's data.
+    Only the process that created the table starts new generations, the others read the generation from the block.
+    Probe and store statistics are counted per process.
+    """
+
+    def __init__(self, megabytes: float = DEFAULT_MEGABYTES, name: str | None = None, create: bool = True):
+        if create:
+            buckets = bucket_count(megabytes)
+            self.memory: SharedMemory = SharedMemory(name, create=True, size=8 * (HEADER_WORDS + 2 * BUCKET_SIZE * buckets))
+        else:
+            self.memory = attach_memory(name)
+        self.owner: bool = create
+        self.words = self.memory.buf.cast('Q')
+        self.header = self.words[:HEADER_WORDS]
+        if create:
+            self.header[0] = 0
+            self.header[1] = buckets
+        buckets = self.header[1]
+        size = BUCKET_SIZE * buckets
+        self.mask = buckets - 1
+        self.keys = self.words[HEADER_WORDS:HEADER_WORDS + size]
+        self.data = self.words[HEADER_WORDS + size:HEADER_WORDS + 2 * size]
+        self.probes = self.hits = self.stores = 0
+
+    @classmethod
+    def attach(cls, name: str) -> SharedTranspositionTable:
+        """Opens the table another process created under `name`."""
+        return cls(name=name, create=False)
+
+    def __reduce__(self):
+        # Sent to another process by name, it attaches to the same block rather than copying it.
+        return (SharedTranspositionTable.attach, (self.name,))
+
+    def __enter__(self) -> SharedTranspositionTable:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+        if self.owner:
+            self.unlink()
+
+    @property
+    def name(self) -> str:
+        """Name other processes attach to the table by."""
+        return self.memory.name
+
+    @property
+    def generation(self) -> int:
+        return self.header[0]
+
+    def close(self) -> None:
+        """Detaches this process from the table, which is no longer usable here."""
+        for view in (self.keys, self.data, self.header, self.words):
+            view.release()
+        self.memory.close()
+
+    def unlink(self) -> None:
+        """Frees the shared block once every process has closed it, called by the creator."""
+        self.memory.unlink()
+
+    def clear(self) -> None:
+        """Empties the table for every process attached to it and resets this process's statistics."""
+        size = len(self.keys)
+        for index in range(size):
+            self.keys[index] = 0
+            self.data[index] = 0
+        self.header[0] = 0
+        self.probes = self.hits = self.stores = 0
+
+    def new_search(self) -> None:
+        """Starts a new generation when called by the creator of the table, does nothing elsewhere."""
+        if self.owner:
+            self.header[0] = (self.header[0] + 1) % GENERATIONS
+
+    def probe_data(self, key: int) -> int:
+        """Returns the raw data stored for a key, 0 when it is not in the table or its entry was torn by a concurrent write."""
+        self.probes += 1
+        index = self.index(key)
+        keys = self.keys
+        entries = self.data
+        for slot in range(index, index + BUCKET_SIZE):
+            data = entries[slot]
+            if data and keys[slot] ^ data == key:
+                self.hits += 1
+                return data
+        return 0
+
+    def store_data(self, key: int, depth: int, data: int) -> None:
+        """Stores raw data for a key like `TranspositionTable.store_data`, with the key word checksummed against the data."""
+        self.stores += 1
+        index = self.index(key)
+        keys = self.keys
+        entries = self.data
+        generation = self.header[0]
+        data |= generation << GENERATION_SHIFT
+        preferred = entries[index]
+        if keys[index] ^ preferred == key or not preferred or preferred >> GENERATION_SHIFT != generation or depth >= preferred >> DEPTH_SHIFT & DEPTH_MASK:
+            slot = index
+        else:
+            slot = index + 1
+        entries[slot] = data
+        keys[slot] = key ^ data
@@ -0,0 +1,206 @@
+from __future__ import annotations
+from collections import namedtuple
+import multiprocessing
+import queue
+import threading
+
+from engine.bitbase import Bitbases
+from engine.book import PolyglotBook
+from engine.exceptions import InvalidPGNStringException
+from engine.move import Move
+from engine.ordering import MoveOrdering
+from engine.parallel import decode_position, encode_position
+from engine.search import MAX_PLY, SearchInfo, best_move
+from engine.simul_game import Game
+from engine.transposition import TranspositionTable
+
+# Requests handled by the worker. Positions travel as `encode_position` tuples and moves as packed integers, never as `Game` or `Move`.
+SEARCH_REQUEST: str = 'search'
+MOVE_REQUEST: str = 'move'
+MOVES_REQUEST: str = 'moves'
+NEW_GAME_REQUEST: str = 'new game'
+# Requests answered on their own thread as soon as they arrive, without waiting for a search to end.
+QUICK_REQUESTS: frozenset[str] = frozenset((MOVE_REQUEST, MOVES_REQUEST))
+
+# Messages sent back: progress of a search, the answer to a request, or the error it raised.
+INFO_MESSAGE: str = 'info'
+RESULT_MESSAGE: str = 'result'
+ERROR_MESSAGE: str = 'error'
+
+EngineRequest = namedtuple('EngineRequest', ['id', 'kind', 'FEN', 'keys', 'arguments'])
+EngineMessage = namedtuple('EngineMessage', ['id', 'kind', 'payload'])
+
+
+def list_moves(game: Game, table: TranspositionTable) -> list[str]:
+    """
+    Lists the legal moves of a game in coordinate notation. The best move the transposition table knows for the position,
+    when there is one, comes first so that it can be offered as a hint.
+    """
+
+    entry = table.probe(game.key)
+    hint = entry.move if entry is not None else 0
+    return [move.uci() for move in sorted(game.get_every_move(proto=True), key=lambda move: move.pack() != hint)]
+
+def quick_main(requests: multiprocessing.Queue, results: multiprocessing.Queue, table: TranspositionTable) -> None:
+    """
+    Answers move validations and legal move listings until it receives `None`. Runs on a thread of the worker process
+    beside the searches, which it only shares the transposition table with, and only to read it.
+    """
+
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+        try:
+            game = decode_position(request.FEN, request.keys)
+            if request.kind == MOVE_REQUEST:
+                move = game.PGN2Move(request.arguments['PGN'])
+                if move is None:
+                    raise InvalidPGNStringException('Not a move.')
+                payload = move.pack()
+            elif request.kind == MOVES_REQUEST:
+                payload = list_moves(game, table)
+            else:
+                raise ValueError(f'Unknown request {request.kind}')
+        except Exception as e:
+            results.put(EngineMessage(request.id, ERROR_MESSAGE, f'{type(e).__name__}: {e}'))
+        else:
+            results.put(EngineMessage(request.id, RESULT_MESSAGE, payload))
+
+def worker_main(requests: multiprocessing.Queue, quick_requests: multiprocessing.Queue, results: multiprocessing.Queue, stop: multiprocessing.Event,
+                cancelled: multiprocessing.Value, book_path: str | None = None) -> None:
+    """
+    Body of the worker process: answers searches and new games one at a time until it receives `None`,
+    while a thread answers the requests of `quick_requests` (see `quick_main`).
+    A search answers with its `SearchResult`, the move in it packed, a move in SAN with the packed move
+    and a listing with the legal moves in coordinate notation (see `list_moves`). The transposition table and the killers and history
+    of the move ordering are kept from one search to the next until a new game is announced,
+    and searches play from the opening book at `book_path` while it has moves and probe whatever bitbases have been generated.
+    The stop flag is only cleared here, as a search is taken off the queue, and set again straight away when that search
+    was cancelled before it started (its id is at most `cancelled`), so that no later request can undo an earlier cancel.
+    """
+
+    table = TranspositionTable()
+    ordering = MoveOrdering(MAX_PLY)
+    book = PolyglotBook(book_path) if book_path else None
+    bitbases = Bitbases()
+    threading.Thread(target=quick_main, args=(quick_requests, results, table), daemon=True).start()
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+        try:
+            game = decode_position(request.FEN, request.keys)
+            if request.kind == SEARCH_REQUEST:
+                stop.clear()
+                if request.id <= cancelled.value:
+                    stop.set()
+                listener = lambda info, id=request.id: results.put(EngineMessage(id, INFO_MESSAGE, info))
+                result = best_move(game, table=table, stop=stop, listener=listener, book=book, bitbases=bitbases, ordering=ordering, **request.arguments)
+                payload = result._replace(move=result.move.pack() if result.move is not None else None)
+            elif request.kind == NEW_GAME_REQUEST:
+                table.clear()
+                ordering.clear()
+                payload = None
+            else:
+                raise ValueError(f'Unknown request {request.kind}')
+        except Exception as e:
+            results.put(EngineMessage(request.id, ERROR_MESSAGE, f'{type(e).__name__}: {e}'))
+        else:
+            results.put(EngineMessage(request.id, RESULT_MESSAGE, payload))
+
+
+class EngineWorker(object):
+    """
+    Runs engine work (searches, move validation, legal move listings) in a background process so that the caller never waits on it.
+    Searches take their move from the Polyglot book at `book_path`, when given, as long as it has one.
+    Every request returns an id at once, its progress and answer arrive later as `EngineMessage`s collected with `poll`,
+    which does not block and is meant to be called once per frame. Searches and new games are answered in the order they were made,
+    move validations and legal move listings as soon as they arrive, even while a search runs.
+    """
+
+    def __init__(self, book_path: str | None = None):
+        # Spawned rather than forked, so that the worker does not inherit the window and display of the process using it.
+        context = multiprocessing.get_context('spawn')
+        self.requests: multiprocessing.Queue = context.Queue()
+        self.quick_requests: multiprocessing.Queue = context.Queue()
+        self.results: multiprocessing.Queue = context.Queue()
+        self.stop: multiprocessing.Event = context.Event()
+        # Id of the last request made before the latest `cancel`, searches up to it are not to run.
+        self.cancelled: multiprocessing.Value = context.Value('q', 0)
+        self.process = context.Process(target=worker_main, args=(self.requests, self.quick_requests, self.results, self.stop, self.cancelled, book_path), daemon=True)
+        self.process.start()
+        self.next_id: int = 0
+        self.pending: dict[int, str] = {}
+
+    def __enter__(self) -> EngineWorker:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def request(self, game: Game, kind: str, **arguments) -> int:
+        """Sends a request about the current position of a game and returns its id."""
+        self.next_id += 1
+        FEN, keys = encode_position(game)
+        requests = self.quick_requests if kind in QUICK_REQUESTS else self.requests
+        requests.put(EngineRequest(self.next_id, kind, FEN, keys, arguments))
+        self.pending[self.next_id] = kind
+        return self.next_id
+
+    def search(self, game: Game, **limits) -> int:
+        """
+        Starts a search of a game for the best move, taking the limits of `engine.search.best_move` (depth, nodes, movetime, wtime...).
+        Progress arrives as `SearchInfo` messages, the answer as a `SearchResult` whose move is packed, see `unpack_move`.
+        """
+
+        return self.request(game, SEARCH_REQUEST, **limits)
+
+    def validate(self, game: Game, PGN: str) -> int:
+        """Asks for a move in SAN to be resolved in the current position of a game, the answer is the packed move."""
+        return self.request(game, MOVE_REQUEST, PGN=PGN)
+
+    def legal_moves(self, game: Game) -> int:
+        """Asks for the legal moves of the current position of a game, the answer lists them in coordinate notation, the best move the engine knows first."""
+        return self.request(game, MOVES_REQUEST)
+
+    def new_game(self, game: Game) -> int:
+        """Tells the worker that a new game starts from the position of `game`, so that it forgets what it learned searching the last one."""
+        return self.request(game, NEW_GAME_REQUEST)
+
+    def cancel(self) -> None:
+        """Stops the running search and any search still queued, each of which still answers with the best move it has found."""
+        # The id is written before the flag is set, the worker clears the flag before reading the id: whichever way the two interleave, the cancel holds.
+        self.cancelled.value = self.next_id
+        self.stop.set()
+
+    def busy(self) -> bool:
+        """Returns `True` while some request has not been answered."""
+        return bool(self.pending)
+
+    def poll(self) -> list[EngineMessage]:
+        """Returns every message that arrived since the last call, without waiting."""
+        messages: list[EngineMessage] = []
+        while True:
+            try:
+                message = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if message.kind != INFO_MESSAGE:
+                self.pending.pop(message.id, None)
+            messages.append(message)
+        return messages
+
+    def close(self) -> None:
+        """Stops the running search and the worker process."""
+        self.stop.set()
+        self.quick_requests.put(None)
+        self.requests.put(None)
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.terminate()
+
+
+def unpack_move(game: Game, code: int) -> Move:
+    """Turns a packed move from the worker back into a `Move` of a game, which must still be in the position the request was made from."""
+    return Move.unpack(code, game.board).bind(game)
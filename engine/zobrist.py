@@ -0,0 +1,45 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+from functools import reduce
+from itertools import compress, product
+from operator import xor
+import random
+
+if TYPE_CHECKING:
+    from engine.simul_game import Game
+
+from engine.bitboard import Square, iter_bits
+from engine.consts import PieceSide
+
+# Seeded so that keys, and anything stored under them, are identical across runs and processes.
+_generator = random.Random(0x5A0B215)
+
+PIECE_KEYS: list[list[int]] = [[_generator.getrandbits(64) for _ in range(64)] for _ in range(12)]
+# Mixed in when the dark side is to move.
+SIDE_KEY: int = _generator.getrandbits(64)
+_CASTLING_RIGHT_KEYS: list[int] = [_generator.getrandbits(64) for _ in range(4)]
+# Key of every value the `KQkq` castling tuple can take.
+CASTLING_KEYS: dict[tuple[bool, ...], int] = {rights: reduce(xor, compress(_CASTLING_RIGHT_KEYS, rights), 0) for rights in product((False, True), repeat=4)}
+# Indexed by the file of the en-passant square.
+EN_PASSANT_KEYS: list[int] = [_generator.getrandbits(64) for _ in range(8)]
+
+
+def en_passant_key(en_passant: Square | None) -> int:
+    """Key contribution of an en-passant square, nothing when there is none."""
+    return 0 if en_passant is None else EN_PASSANT_KEYS[en_passant & 7]
+
+def zobrist_key(game: Game) -> int:
+    """
+    Computes the 64-bit key of a position from scratch. `Game` keeps its own key up to date move by move, this is for setting it up and checking it.
+
+    Parameters:
+    - `game`: The game whose current position is hashed.
+    """
+
+    key = 0
+    for slot, bitboard in enumerate(game.board.bitboards):
+        for index in iter_bits(bitboard):
+            key ^= PIECE_KEYS[slot][index]
+    if game.side == PieceSide.DARK:
+        key ^= SIDE_KEY
+    return key ^ CASTLING_KEYS[tuple(game.castling)] ^ en_passant_key(game.en_passant)
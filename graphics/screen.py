@@ -5,7 +5,9 @@ from abc import ABC, abstractmethod
 if TYPE_CHECKING:
     from graphics.graphics import PygameAbstraction
     from graphics.graphics import Surface
-    from data.game import GameInstance
+    from data.game import GameInstance, PendingRequest
+    from engine.move import Move
+    from engine.worker import EngineMessage
     import pygame
 
 from data.constants import BLACK
@@ -28,3 +30,7 @@ class Screen(ABC):
     @abstractmethod
     def render(self, game_inst: GameInstance) -> None:
         pass
+
+    def handle_engine(self, request: PendingRequest, message: EngineMessage, played: Move | None, game_inst: GameInstance) -> None:
+        """Called with every message of the engine worker while the screen is on top, with the move it made the game play if any"""
+        pass
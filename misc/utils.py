@@ -19,10 +19,11 @@ def mini_chain(l: list) -> list:
     """Compacts a list of lists to a single list. In other words, makes a list of lists into a flat list"""
     return list(chain(*l))
 
+SQUARE_PATTERN: re.Pattern[str] = re.compile('^([a-h])([1-8])$')
+
 def is_valid_square(pos: str) -> bool:
     """Checks if a given file and rank actually exist on a chess board."""
-    prog: re.Pattern[str] = re.compile('^([a-h])([1-8])$')
-    return bool(prog.match(pos))
+    return bool(SQUARE_PATTERN.match(pos))
 
 sign = lambda x: (int)(math.copysign(1, x))
 
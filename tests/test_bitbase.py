@@ -0,0 +1,62 @@
+import multiprocessing
+
+import pytest
+
+from engine.bitbase import PROMOTIONS, SIGNATURES, Bitbases, bitbase_path, generate
+from engine.consts import BITBASE_DRAW, BITBASE_LOSS, BITBASE_WIN
+from engine.simul_game import Game
+
+
+@pytest.fixture(scope='module')
+def bitbases(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('bitbases')
+    built: dict[str, bytes] = {}
+    with multiprocessing.get_context().Pool(2) as pool:
+        for name in SIGNATURES:
+            built[name] = generate(name, pool, {promotion: built[promotion] for promotion in PROMOTIONS if promotion in built})
+            with open(bitbase_path(str(directory), name), 'wb') as file:
+                file.write(built[name])
+    with Bitbases(str(directory)) as bitbases:
+        yield bitbases
+
+
+@pytest.mark.parametrize('FEN, result', [
+    ('7k/8/8/8/8/8/8/KQ6 w - - 0 1', BITBASE_WIN),
+    ('7k/8/8/8/8/8/8/KQ6 b - - 0 1', BITBASE_LOSS),
+    # The bare king takes the undefended queen.
+    ('K7/8/8/8/8/8/1Qk5/8 b - - 0 1', BITBASE_DRAW),
+    ('4k3/8/8/8/8/8/8/R3K3 b - - 0 1', BITBASE_LOSS),
+    ('K7/8/8/8/8/8/1Rk5/8 b - - 0 1', BITBASE_DRAW),
+    # The king in front of its pawn on the sixth rank wins whoever moves, a rook pawn with the other king in the corner does not.
+    ('4k3/8/4K3/4P3/8/8/8/8 w - - 0 1', BITBASE_WIN),
+    ('4k3/8/4K3/4P3/8/8/8/8 b - - 0 1', BITBASE_LOSS),
+    ('k7/8/8/8/8/8/P7/K7 w - - 0 1', BITBASE_DRAW),
+    # With the king one rank in front of its blocked pawn, the opposition decides.
+    ('8/4k3/8/4K3/4P3/8/8/8 b - - 0 1', BITBASE_LOSS),
+    ('8/4k3/8/4K3/4P3/8/8/8 w - - 0 1', BITBASE_DRAW),
+    ('4k3/8/8/4K3/4P3/8/8/8 b - - 0 1', BITBASE_DRAW),
+])
+def test_probe(bitbases: Bitbases, FEN: str, result: int):
+    assert bitbases.probe(Game.fromFEN(FEN)) == result
+
+
+def mirror(FEN: str) -> str:
+    """The same position with the colours swapped and the board turned upside down."""
+    placement, side, *rest = FEN.split()
+    return ' '.join(['/'.join(reversed(placement.swapcase().split('/'))), 'b' if side == 'w' else 'w', *rest])
+
+
+@pytest.mark.parametrize('FEN', [
+    '7k/8/8/8/8/8/8/KQ6 w - - 0 1', '4k3/8/8/8/8/8/8/R3K3 b - - 0 1', 'K7/8/8/8/8/8/1Rk5/8 b - - 0 1',
+    '4k3/8/4K3/4P3/8/8/8/8 w - - 0 1', '8/4k3/8/4K3/4P3/8/8/8 b - - 0 1', '8/4k3/8/4K3/4P3/8/8/8 w - - 0 1', 'k7/8/8/8/8/8/P7/K7 w - - 0 1',
+])
+def test_probe_dark_strong_side(bitbases: Bitbases, FEN: str):
+    # A dark strong side is looked up in the mirror, so the mirrored position has the same result for the side to move.
+    assert bitbases.probe(Game.fromFEN(mirror(FEN))) == bitbases.probe(Game.fromFEN(FEN))
+
+
+@pytest.mark.parametrize('FEN', [
+    'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1', '7k/8/8/8/8/8/8/KB6 w - - 0 1', '7k/8/8/8/8/8/8/K7 w - - 0 1',
+])
+def test_probe_other_material(bitbases: Bitbases, FEN: str):
+    assert bitbases.probe(Game.fromFEN(FEN)) is None
@@ -0,0 +1,45 @@
+import pytest
+
+from engine.book import ENTRY_FORMAT, PolyglotBook, polyglot_key, polyglot_move
+from engine.simul_game import Game
+
+# Reference keys from the Polyglot book format specification.
+POLYGLOT_KEYS: list[tuple[str, int]] = [
+    ('rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1', 0x463b96181691fc9c),
+    ('rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1', 0x823c9b50fd114196),
+    ('rnbqkbnr/ppp1pppp/8/3p4/4P3/8/PPPP1PPP/RNBQKBNR w KQkq d6 0 2', 0x0756b94461c50fb0),
+    ('rnbqkbnr/ppp1pppp/8/3pP3/8/8/PPPP1PPP/RNBQKBNR b KQkq - 0 2', 0x662fafb965db29d4),
+    ('rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3', 0x22a48b5a8e47ff78),
+    ('rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPPKPPP/RNBQ1BNR b kq - 0 3', 0x652a607ca3f242c1),
+    ('rnbq1bnr/ppp1pkpp/8/3pPp2/8/8/PPPPKPPP/RNBQ1BNR w - - 0 4', 0x00fdd303c946bdd9),
+    ('rnbqkbnr/p1pppppp/8/8/PpP4P/8/1P1PPPP1/RNBQKBNR b KQkq c3 0 3', 0x3c8123ea7b067637),
+    ('rnbqkbnr/p1pppppp/8/8/P6P/R1p5/1P1PPPP1/1NBQKBNR b Kkq - 0 4', 0x5c3f9b829b279560),
+]
+
+
+@pytest.mark.parametrize('FEN, key', POLYGLOT_KEYS)
+def test_polyglot_key(FEN: str, key: int):
+    assert polyglot_key(Game.fromFEN(FEN)) == key
+
+
+def test_polyglot_key_after_moves():
+    game = Game.fromFEN(POLYGLOT_KEYS[0][0])
+    for SAN in ('e4', 'd5', 'e5', 'f5', 'Ke2', 'Kf7'):
+        game.push(game.PGN2Move(SAN))
+    assert polyglot_key(game) == POLYGLOT_KEYS[6][1]
+
+
+def test_book_entries(tmp_path):
+    game = Game.fromFEN(POLYGLOT_KEYS[0][0])
+    key = polyglot_key(game)
+    e4 = game.PGN2Move('e4').pack()
+    d4 = game.PGN2Move('d4').pack()
+    # Entries are sorted by key, the start position between a smaller and a larger one. The last move is illegal and skipped.
+    rows = [(key - 1, 0, 1, 0), (key, polyglot_move(e4), 10, 0), (key, polyglot_move(d4), 5, 0), (key, 0, 7, 0), (key + 1, 0, 1, 0)]
+    path = tmp_path / 'book.bin'
+    path.write_bytes(b''.join(ENTRY_FORMAT.pack(*row) for row in rows))
+    with PolyglotBook(str(path)) as book:
+        entries = book.entries(game)
+        assert [(entry.move.pack(), entry.weight) for entry in entries] == [(e4, 10), (d4, 5)]
+        assert book.best(game).pack() == e4
+        assert book.entries(Game.fromFEN(POLYGLOT_KEYS[1][0])) == []
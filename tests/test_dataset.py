@@ -0,0 +1,53 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from engine.dataset import FEATURES, PLANES, decode_batch, encode_FENs, features
+from engine.exceptions import InvalidFENStringException
+from engine.perft import PERFT_SUITE
+from engine.simul_game import Game
+
+FENS: list[str] = [position.FEN for position in PERFT_SUITE] + ['rnbqkbnr/ppp1pppp/8/3pP3/8/8/PPPP1PPP/RNBQKBNR w KQkq d6 0 3']
+
+
+def test_round_trip():
+    batches = list(encode_FENs(FENS, chunk_size=8))
+    assert [len(batch.side) for batch in batches] == [8, 8, len(FENS) - 16]
+    assert [FEN for batch in batches for FEN in decode_batch(batch)] == FENS
+
+
+def test_planes_match_board():
+    batch = next(encode_FENs(FENS))
+    assert batch.planes.shape == (len(FENS), PLANES, 8, 8)
+    for index, FEN in enumerate(FENS):
+        pieces = Game.fromFEN(FEN).board.pieces
+        for square in range(64):
+            column = batch.planes[index, :, square >> 3, square & 7]
+            slot = pieces[square].slot
+            assert column.sum() == (slot >= 0) and (slot < 0 or column[slot] == 1)
+
+
+def test_features():
+    batch = next(encode_FENs(FENS[-2:]))
+    columns = features(batch)
+    assert columns.shape == (2, FEATURES)
+    assert columns[1].tolist() == [1, 1, 1, 1, 1, 0, 0, 0, 1, 0, 0, 0, 0]
+    assert columns[0, 5:].sum() == 0
+
+
+def test_missing_counters_and_blank_lines():
+    batch, = encode_FENs(['', '8/8/8/8/8/8/8/K6k b - -', '  \n'])
+    assert decode_batch(batch) == ['8/8/8/8/8/8/8/K6k b - - 0 1']
+
+
+@pytest.mark.parametrize('FEN', ['8/8/8/8/8/8/8/K6kk w - - 0 1', '8/8/8/8/8/8/K6k w - - 0 1', 'not a position'])
+def test_invalid(FEN: str):
+    with pytest.raises(InvalidFENStringException):
+        list(encode_FENs([FEN]))
+
+
+def test_overlapping_pieces():
+    batch = next(encode_FENs(FENS[:1]))
+    batch.planes[0, 0, 0, 0] = 1
+    with pytest.raises(ValueError):
+        decode_batch(batch)
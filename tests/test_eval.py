@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+from engine.eval import evaluate, score_board
+from engine.move import move_buffer
+from engine.simul_game import Game
+
+# Castling both ways, en passant and promotions with and without a capture.
+FENS: list[str] = [
+    'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1',
+    'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+    'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1',
+    'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8',
+]
+PLIES: int = 40
+
+
+def totals(game: Game) -> tuple[int, int, int]:
+    return game.midgame, game.endgame, game.phase
+
+
+@pytest.mark.parametrize('FEN', FENS)
+@pytest.mark.parametrize('seed', range(3))
+def test_incremental_eval(FEN: str, seed: int):
+    generator = random.Random(seed)
+    game = Game.fromFEN(FEN)
+    buffer = move_buffer()
+    line: list[tuple[int, int, int]] = []
+    for _ in range(PLIES):
+        assert totals(game) == score_board(game.board)
+        count = game.generate_codes(buffer)
+        if not count:
+            break
+        for code in buffer[:count]:
+            before = totals(game)
+            game.push_code(code)
+            assert totals(game) == score_board(game.board), code
+            game.pop_code()
+            assert totals(game) == before, code
+        line.append(totals(game))
+        game.push_code(buffer[generator.randrange(count)])
+
+    while line:
+        game.pop_code()
+        assert totals(game) == line.pop() == score_board(game.board)
+
+
+def test_evaluate_symmetry():
+    # The start position is level, and the same position with colours swapped scores the same for the side to move.
+    assert evaluate(Game.fromFEN(FENS[0])) == 0
+    assert evaluate(Game.fromFEN('rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1')) == \
+        evaluate(Game.fromFEN('rnbqkbnr/pppp1ppp/8/4p3/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'))
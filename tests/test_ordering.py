@@ -0,0 +1,27 @@
+from engine.ordering import MoveOrdering
+from engine.search import MAX_PLY, best_move
+from engine.simul_game import Game
+
+FEN: str = 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1'
+
+
+def test_table_move_first():
+    game = Game.fromFEN(FEN)
+    ordering = MoveOrdering(1)
+    quiet = game.PGN2Move('a3').pack()
+    moves = list(ordering.moves(game, 0, quiet))
+    assert moves[0] == quiet and moves.count(quiet) == 1 and len(moves) == 48
+    # A move that is not legal here is dropped rather than tried.
+    assert list(ordering.moves(game, 0, Game.fromFEN(FEN).PGN2Move('a3').pack() ^ 1)) == list(ordering.moves(game, 0))
+
+
+def test_history_kept_across_moves():
+    game = Game.fromFEN('rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1')
+    ordering = MoveOrdering(MAX_PLY)
+    best_move(game, depth=3, ordering=ordering)
+    history = [list(side) for side in ordering.history]
+    assert any(any(side) for side in history)
+    ordering.age()
+    assert [list(side) for side in ordering.history] == [[score >> 1 for score in side] for side in history]
+    ordering.clear()
+    assert not any(any(side) for side in ordering.history) and not any(any(killers) for killers in ordering.killers)
@@ -0,0 +1,18 @@
+import pytest
+
+from engine.perft import PERFT_SUITE, run_perft
+
+# Deepest depth run for every suite position, enough to reach castling, en passant and promotions while staying quick.
+MAX_DEPTH: int = 3
+
+CASES = [(position.name, position.FEN, depth, nodes) for position in PERFT_SUITE for depth, nodes in position.nodes.items() if depth <= MAX_DEPTH]
+
+
+@pytest.mark.parametrize('name, FEN, depth, nodes', CASES, ids=[f'{case[0]}-{case[2]}' for case in CASES])
+def test_perft_suite(name: str, FEN: str, depth: int, nodes: int):
+    assert run_perft(FEN, depth, name).nodes == nodes
+
+
+def test_perft_hashed():
+    position = PERFT_SUITE[1]
+    assert run_perft(position.FEN, MAX_DEPTH, position.name, hash_megabytes=1).nodes == position.nodes[MAX_DEPTH]
@@ -0,0 +1,42 @@
+from engine.pgn import parse_movetext, read_games
+
+# A short game with castling giving check, en passant, a promotion and disambiguation, then a game without tags.
+GAMES: str = '''[Event "Test"]
+[White "A \\"quoted\\" name"]
+[Black "B"]
+[Result "1-0"]
+[FEN "r3k3/1P6/8/3pP3/8/8/8/R3K2R w KQq d6 0 1"]
+
+{Opening comment} 1. exd6 $1 (1. b8=Q+ Kf7) 1... Kd7 2. b8=N+! {spans
+two lines} Kxd6 3. O-O-O+ Kc7 ; rest of line
+4. Rd7+ Kxb8 5. Rhd1 Kc8 6. R1d2 1-0
+
+1. d4 d5 2. Nf3 Nf6 3. Nbd2 *
+'''
+
+
+def test_read_games():
+    first, second = read_games(GAMES.splitlines(keepends=True))
+    assert first.tags['White'] == 'A "quoted" name'
+    assert first.comments == ['Opening comment']
+    assert first.result == '1-0'
+    assert first.mainline() == ['exd6', 'Kd7', 'b8=N+', 'Kxd6', 'O-O-O+', 'Kc7', 'Rd7+', 'Kxb8', 'Rhd1', 'Kc8', 'R1d2']
+    assert first.moves[0].nags == [1] and [move.san for move in first.moves[0].variations[0]] == ['b8=Q+', 'Kf7']
+    assert first.moves[2].nags == [1] and first.moves[2].comments == ['spans\ntwo lines']
+    assert first.moves[5].comments == ['rest of line']
+    assert second.tags == {} and second.result == '*' and len(second.moves) == 5
+
+
+def test_replay():
+    _, second = read_games(GAMES.splitlines(keepends=True))
+    assert second.replay().conv2FEN() == 'rnbqkb1r/ppp1pppp/5n2/3p4/3P4/5N2/PPPNPPPP/R1BQKB1R b KQkq - 3 3'
+
+
+def test_parse_nested_variations():
+    moves, comments, result = parse_movetext('1. e4 (1. d4 d5 (1... Nf6 2. c4)) e5 1/2-1/2')
+    assert [move.san for move in moves] == ['e4', 'e5']
+    variation = moves[0].variations[0]
+    assert [move.san for move in variation] == ['d4', 'd5']
+    assert [move.san for move in variation[1].variations[0]] == ['Nf6', 'c4']
+    assert comments == [] and result == '1/2-1/2'
+
@@ -0,0 +1,43 @@
+import pytest
+
+from engine.bitboard import SQUARE_MASKS, piece_slot
+from engine.simul_game import Game
+
+# Castling both ways, en passant, promotions with and without a capture, and pinned pieces.
+FENS: list[str] = [
+    'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1',
+    'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+    'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1',
+    'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8',
+    'rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3',
+]
+
+
+def snapshot(game: Game) -> tuple:
+    board = game.board
+    return game.conv2FEN(), [(piece.type, piece.side) for piece in board.pieces], list(board.bitboards), list(board.occupancy), board.occupied
+
+def assert_consistent(game: Game) -> None:
+    board = game.board
+    for index, piece in enumerate(board.pieces):
+        slot = piece_slot(piece)
+        mask = SQUARE_MASKS[index]
+        assert bool(board.occupied & mask) == (slot >= 0)
+        assert slot < 0 or (board.bitboards[slot] & mask and board.occupancy[piece.side.value] & mask)
+
+
+@pytest.mark.parametrize('FEN', FENS)
+def test_push_pop_round_trip(FEN: str):
+    game = Game.fromFEN(FEN)
+    before = snapshot(game)
+    for move in game.get_every_move():
+        game.push(move)
+        assert_consistent(game)
+        after = snapshot(game)
+        for reply in game.get_every_move():
+            game.push(reply)
+            assert_consistent(game)
+            game.pop()
+            assert snapshot(game) == after, (str(move), str(reply))
+        game.pop()
+        assert snapshot(game) == before, str(move)
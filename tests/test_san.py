@@ -0,0 +1,42 @@
+import pytest
+
+from engine.exceptions import InvalidPGNStringException
+from engine.pgn import START_FEN, read_games
+from engine.simul_game import Game
+
+# Castling with the light king, an en-passant capture on d6 and a pawn that promotes on b8 or captures onto a8.
+FEN: str = 'r3k3/1P6/8/3pP3/8/8/8/R3K2R w KQq d6 0 1'
+
+
+@pytest.mark.parametrize('SAN, uci', [
+    ('O-O', 'e1g1'), ('O-O-O+', 'e1c1'), ('0-0', 'e1g1'), ('exd6', 'e5d6'), ('b8=Q', 'b7b8q'), ('b8N+', 'b7b8n'),
+    ('bxa8=R', 'b7a8r'), ('Rd1', 'a1d1'), ('Rf1', 'h1f1'), ('Rxa8+', 'a1a8'), ('Rh8+', 'h1h8'), ('Ke2!?', 'e1e2'),
+])
+def test_san(SAN: str, uci: str):
+    assert Game.fromFEN(FEN).PGN2Move(SAN).uci() == uci
+
+
+@pytest.mark.parametrize('SAN', ['Rb2', 'b8', 'e6=Q', 'O-O-O-O', 'Nf3', 'exf6', 'Kd1d2'])
+def test_san_rejected(SAN: str):
+    with pytest.raises(InvalidPGNStringException):
+        Game.fromFEN(FEN).PGN2Move(SAN)
+
+
+def test_san_disambiguation():
+    game = Game.fromFEN('4k3/8/8/8/8/8/8/1N2KN2 w - - 0 1')
+    with pytest.raises(InvalidPGNStringException):
+        game.PGN2Move('Nd2')
+    assert game.PGN2Move('Nbd2').uci() == 'b1d2'
+    assert game.PGN2Move('Nfd2').uci() == 'f1d2'
+
+
+def test_san_result():
+    assert Game.fromFEN(START_FEN).PGN2Move('1-0') is None
+
+
+def test_replay_san():
+    game, = read_games(f'''[FEN "{FEN}"]
+
+1. exd6 Kd7 2. b8=N+ Kxd6 3. O-O-O+ Kc7 4. Rd7+ Kxb8 5. Rhd1 Kc8 6. R1d2 1-0
+'''.splitlines(keepends=True))
+    assert game.replay().conv2FEN() == 'r1k5/3R4/8/8/8/8/3R4/2K5 b - - 3 6'
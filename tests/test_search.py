@@ -0,0 +1,70 @@
+import threading
+
+import pytest
+
+from engine.search import (HARD_TIME_FACTOR, MATE_SCORE, MOVE_OVERHEAD, STOP_DEPTH, STOP_FLAG, STOP_MATE, STOP_NODES, STOP_STALEMATE,
+                           STOP_TIME, allocate_time, best_move)
+from engine.simul_game import Game
+
+START: str = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+KIWIPETE: str = 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1'
+# Allowed past a hard time limit, for the work after the last look at the clock and a busy machine.
+TIME_SLACK: float = 0.05
+
+
+def test_allocate_time():
+    soft, hard = allocate_time(60.0)
+    assert soft == pytest.approx((60.0 - MOVE_OVERHEAD) / 30) and hard == pytest.approx(soft * HARD_TIME_FACTOR)
+    # The increment is mostly spent, the last move before the time control may take the whole clock.
+    assert allocate_time(60.0, 2.0)[0] == pytest.approx(soft + 1.5)
+    assert allocate_time(10.0, moves_to_go=1) == pytest.approx((10.0 - MOVE_OVERHEAD, 10.0 - MOVE_OVERHEAD))
+    # Short of time the hard limit never takes more than half the clock, and an empty clock leaves nothing.
+    soft, hard = allocate_time(1.0, 5.0)
+    assert hard == pytest.approx((1.0 - MOVE_OVERHEAD) / 2) and soft <= hard
+    assert allocate_time(0.01) == (0.0, 0.0)
+
+
+def test_depth_and_mate():
+    result = best_move(Game.fromFEN(START), depth=2)
+    assert result.reason == STOP_DEPTH and result.depth == 2 and result.move is not None
+    result = best_move(Game.fromFEN('6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1'), depth=4)
+    assert result.move.uci() == 'a1a8' and result.score == MATE_SCORE - 1 and result.reason == STOP_MATE
+
+
+@pytest.mark.parametrize('FEN, reason, score', [
+    ('R5k1/5ppp/8/8/8/8/8/6K1 b - - 1 1', STOP_MATE, -MATE_SCORE),
+    ('7k/5Q2/6K1/8/8/8/8/8 b - - 0 1', STOP_STALEMATE, 0),
+])
+def test_no_legal_move(FEN: str, reason: str, score: int):
+    result = best_move(Game.fromFEN(FEN), depth=3)
+    assert result.move is None and result.reason == reason and result.score == score
+
+
+def test_node_limit():
+    result = best_move(Game.fromFEN(KIWIPETE), nodes=500)
+    assert result.reason == STOP_NODES and result.nodes <= 500 and result.move is not None
+
+
+@pytest.mark.parametrize('movetime', [0.05, 0.2])
+def test_movetime(movetime: float):
+    game = Game.fromFEN(KIWIPETE)
+    FEN = game.conv2FEN()
+    result = best_move(game, movetime=movetime)
+    assert result.reason == STOP_TIME and result.move is not None
+    assert result.seconds <= movetime + TIME_SLACK
+    assert game.conv2FEN() == FEN
+
+
+def test_stop_flag():
+    stop = threading.Event()
+    stop.set()
+    # Stopped before the first iteration completes, the search still answers with a legal move.
+    result = best_move(Game.fromFEN(START), stop=stop)
+    assert result.reason == STOP_FLAG and result.depth == 0 and result.move is not None
+
+    stop.clear()
+    timer = threading.Timer(0.1, stop.set)
+    timer.start()
+    result = best_move(Game.fromFEN(START), stop=stop)
+    timer.join()
+    assert result.reason == STOP_FLAG and result.depth >= 1 and result.seconds <= 0.1 + TIME_SLACK
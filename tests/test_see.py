@@ -0,0 +1,29 @@
+import pytest
+
+from engine.simul_game import Game
+
+
+@pytest.mark.parametrize('FEN, SAN, value', [
+    # An undefended pawn.
+    ('1k1r4/1pp4p/p7/4p3/8/P5P1/1PP4P/2K1R3 w - - 0 1', 'Rxe5', 100),
+    # A pawn defended by the bishop and the rook behind the knight: the knight is lost for it.
+    ('1k1r3q/1ppn3p/p4b2/4p3/8/P2N2P1/1PP1R1BP/2K1Q3 w - - 0 1', 'Nxe5', -220),
+    # A queen taking a pawn defended by a pawn.
+    ('4k3/8/3p4/4p3/8/8/8/4QK2 w - - 0 1', 'Qxe5', -800),
+    # The queen behind the rook retakes once the rook has gone, the exchange wins the pawn.
+    ('4r1k1/8/8/4p3/8/8/4R3/4Q1K1 w - - 0 1', 'Rxe5', 100),
+    # Without the queen the rook is lost for the pawn.
+    ('4r1k1/8/8/4p3/8/8/4R3/6K1 w - - 0 1', 'Rxe5', -400),
+    # The pawn taken en passant is not on the destination square.
+    ('4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1', 'exd6', 100),
+    ('4k3/2p5/8/3pP3/8/8/8/4K3 w - d6 0 1', 'exd6', 0),
+    # A quiet move onto a square a pawn takes, and onto one nothing attacks.
+    ('4k3/8/8/3p4/8/8/1N6/4K3 w - - 0 1', 'Nc4', -320),
+    ('4k3/8/8/3p4/8/8/1N6/4K3 w - - 0 1', 'Nd3', 0),
+    # A promotion gains the new piece less the pawn, and loses it again if it is taken.
+    ('4k3/P7/8/8/8/8/8/4K3 w - - 0 1', 'a8=Q', 800),
+    ('1r2k3/P7/8/8/8/8/8/4K3 w - - 0 1', 'a8=Q', -100),
+])
+def test_see(FEN: str, SAN: str, value: int):
+    game = Game.fromFEN(FEN)
+    assert game.see(game.PGN2Move(SAN)) == value
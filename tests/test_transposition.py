@@ -0,0 +1,72 @@
+
+from engine.simul_game import Game
+from engine.transposition import BOUND_EXACT, BOUND_LOWER, BOUND_UPPER, SharedTranspositionTable, TranspositionTable, TTEntry
+from engine.worker import list_moves
+
+# Keys that all fall in the first bucket of any table smaller than 2**40 buckets.
+KEYS: list[int] = [n << 40 for n in range(1, 5)]
+
+
+def test_store_probe():
+    table = TranspositionTable(1)
+    table.store(0x1234, 7, BOUND_LOWER, -321, 0x0F1C)
+    assert table.probe(0x1234) == TTEntry(0x0F1C, -321, 7, BOUND_LOWER)
+    assert table.probe(0x4321) is None
+    assert (table.stats().probes, table.stats().hits, table.stats().stores) == (2, 1, 1)
+    table.store(0x1234, 3, BOUND_UPPER, 50, 0)
+    assert table.probe(0x1234) == TTEntry(0, 50, 3, BOUND_UPPER)
+
+
+def test_bucket_replacement():
+    table = TranspositionTable(1)
+    first, second, third, fourth = KEYS
+    table.store(first, 5, BOUND_EXACT, 1, 0)
+    # The deeper entry keeps its place, shallower ones take turns in the other.
+    table.store(second, 3, BOUND_EXACT, 2, 0)
+    assert table.probe(first).score == 1 and table.probe(second).score == 2
+    table.store(third, 2, BOUND_EXACT, 3, 0)
+    assert table.probe(first).score == 1 and table.probe(second) is None and table.probe(third).score == 3
+    table.store(fourth, 6, BOUND_EXACT, 4, 0)
+    assert table.probe(first) is None and table.probe(fourth).score == 4
+
+
+def test_generation_aging():
+    table = TranspositionTable(1)
+    first, second = KEYS[:2]
+    table.store(first, 9, BOUND_EXACT, 1, 0)
+    assert table.fill() > 0
+    table.new_search()
+    assert table.fill() == 0
+    # An entry from an older search gives way even to a shallower one.
+    table.store(second, 1, BOUND_EXACT, 2, 0)
+    assert table.probe(first) is None and table.probe(second).score == 2
+
+
+def test_shared_table():
+    with SharedTranspositionTable(1) as table:
+        table.store(KEYS[0], 4, BOUND_EXACT, 10, 0x0F1C)
+        other = SharedTranspositionTable.attach(table.name)
+        assert other.probe(KEYS[0]) == TTEntry(0x0F1C, 10, 4, BOUND_EXACT)
+        other.close()
+        table.store(KEYS[1], 2, BOUND_EXACT, 20, 0)
+        assert table.probe(KEYS[1]).score == 20
+
+
+def test_shared_table_torn_entry():
+    with SharedTranspositionTable(1) as table:
+        table.store(KEYS[0], 4, BOUND_EXACT, 10, 0x0F1C)
+        index = table.index(KEYS[0])
+        assert table.keys[index] == KEYS[0] ^ table.data[index]
+        # Another process's data landing in the entry without its key word no longer matches the key.
+        table.data[index] ^= 1 << 20
+        assert table.probe(KEYS[0]) is None
+
+
+def test_list_moves_hint():
+    game = Game.fromFEN('rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1')
+    table = TranspositionTable(1)
+    moves = list_moves(game, table)
+    assert len(moves) == 20 and moves[0] != 'e2e4'
+    table.store(game.key, 1, BOUND_EXACT, 0, game.PGN2Move('e4').pack())
+    hinted = list_moves(game, table)
+    assert hinted[0] == 'e2e4' and sorted(hinted) == sorted(moves)
@@ -0,0 +1,61 @@
+import time
+
+import pytest
+
+from engine.search import STOP_FLAG
+from engine.simul_game import Game
+from engine.worker import ERROR_MESSAGE, INFO_MESSAGE, RESULT_MESSAGE, EngineWorker, unpack_move
+
+START: str = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+# Longest wait for an answer, starting the worker process included.
+TIMEOUT: float = 30.0
+
+
+def wait(worker: EngineWorker, id: int, timeout: float = TIMEOUT) -> list:
+    """Polls the worker like a frame loop until request `id` is answered and returns every message that arrived meanwhile."""
+    messages = []
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        messages += worker.poll()
+        if any(message.id == id and message.kind != INFO_MESSAGE for message in messages):
+            return messages
+        time.sleep(0.005)
+    pytest.fail(f'request {id} was not answered')
+
+
+@pytest.fixture(scope='module')
+def worker():
+    with EngineWorker() as worker:
+        yield worker
+
+
+def test_validate_during_search(worker: EngineWorker):
+    game = Game.fromFEN(START)
+    wait(worker, worker.legal_moves(game))
+
+    search = worker.search(game, movetime=TIMEOUT)
+    start = time.perf_counter()
+    # The move typed while the engine thinks is answered without waiting for the search.
+    validate = worker.validate(game, 'Nf3')
+    messages = wait(worker, validate)
+    assert time.perf_counter() - start < 1.0
+    answer, = [message for message in messages if message.id == validate]
+    assert answer.kind == RESULT_MESSAGE and unpack_move(game, answer.payload).uci() == 'g1f3'
+    assert worker.busy()
+
+    bad = worker.validate(game, 'Nf4')
+    answer, = [message for message in wait(worker, bad) if message.id == bad]
+    assert answer.kind == ERROR_MESSAGE
+
+    worker.cancel()
+    answer, = [message for message in wait(worker, search) if message.id == search and message.kind != INFO_MESSAGE]
+    assert answer.kind == RESULT_MESSAGE and answer.payload.reason == STOP_FLAG
+    assert unpack_move(game, answer.payload.move).uci() in [move.uci() for move in game.get_every_move()]
+    assert not worker.busy()
+
+
+def test_search_after_cancel(worker: EngineWorker):
+    game = Game.fromFEN(START)
+    search = worker.search(game, depth=2)
+    answer, = [message for message in wait(worker, search) if message.id == search and message.kind != INFO_MESSAGE]
+    assert answer.kind == RESULT_MESSAGE and answer.payload.depth == 2
@@ -0,0 +1,59 @@
+import random
+
+import pytest
+
+from engine.move import move_buffer
+from engine.simul_game import Game
+from engine.zobrist import zobrist_key
+
+# Castling both ways, en passant and promotions with and without a capture.
+FENS: list[str] = [
+    'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+    'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1',
+    'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8',
+    'rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3',
+]
+PLIES: int = 40
+
+
+@pytest.mark.parametrize('FEN', FENS)
+@pytest.mark.parametrize('seed', range(3))
+def test_incremental_key(FEN: str, seed: int):
+    generator = random.Random(seed)
+    game = Game.fromFEN(FEN)
+    buffer = move_buffer()
+    keys: list[int] = []
+    for _ in range(PLIES):
+        assert game.key == zobrist_key(game)
+        count = game.generate_codes(buffer)
+        if not count:
+            break
+        # Every move of the position is tried once, which reaches castling, en passant and promotions whenever they are legal.
+        for code in buffer[:count]:
+            key = game.key
+            game.push_code(code)
+            assert game.key == zobrist_key(game), code
+            game.pop_code()
+            assert game.key == key, code
+        keys.append(game.key)
+        game.push_code(buffer[generator.randrange(count)])
+
+    while keys:
+        game.pop_code()
+        assert game.key == keys.pop() == zobrist_key(game)
+
+
+def test_repetition_count():
+    game = Game.fromFEN('rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1')
+    for _ in range(2):
+        for SAN in ('Nf3', 'Nf6', 'Ng1', 'Ng8'):
+            assert not game.is_repetition()
+            game.push(game.PGN2Move(SAN))
+    assert game.repetition_count() == 3 and game.is_repetition()
+    game.pop()
+    assert game.repetition_count() == 2 and not game.is_repetition()
+    # The same pieces on the same squares with the castling rights gone is a different position.
+    game.push(game.PGN2Move('Ng8'))
+    for SAN in ('Nf3', 'Nf6', 'Rg1', 'Rg8', 'Rh1', 'Rh8', 'Ng1', 'Ng8'):
+        game.push(game.PGN2Move(SAN))
+    assert game.repetition_count() == 1